@@ -1,73 +1,106 @@
 #main.py
+import atexit
+import logging
 import argparse
-import os
-import shutil
-import pandas as pd
 
-from src.scripts import clear_sql_db, connect_or_create_sql_db
-from src.utils import extract_and_normalize, path_helpers
-from src.sql_interface import run_interactive_research_assistant, insert_balance_sheet
+from src.scripts import clear_document_db, clear_sql_db, connect_or_create_document_db, connect_or_create_sql_db
+from src.utils import extract_and_normalize
+from src.sql_interface import run_interactive_research_assistant
+from src.utils import telemetry
 
-PDF_STORE_DIR = "data/pdfs"
-
-# deletes and recreates the PDF storage directory
-def clear_pdf_store() -> None:
-    if os.path.exists(PDF_STORE_DIR):
-        shutil.rmtree(PDF_STORE_DIR)
-    os.makedirs(PDF_STORE_DIR, exist_ok=True)
+log = logging.getLogger("main")
 
 # main orchestration logic for downloading, parsing, and storing balance sheets
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--clear_sql_database", action="store_true", help="Clear the SQL database before starting")
-    parser.add_argument("--clear_doc_store", action="store_true", help="Clear the PDF document store before starting")
+    parser.add_argument("--clear_doc_store", action="store_true", help="Clear the document store and ingest manifest before starting")
     parser.add_argument("--ticker", type=str, default="AAPL", help="Company ticker symbol")
+    parser.add_argument("--tickers", type=str, default=None, help="Comma-separated tickers to ingest as one pipelined batch (overrides --ticker)")
+    parser.add_argument("--tickers_file", type=str, default=None, help="File with one ticker per line to ingest as one pipelined batch")
+    parser.add_argument("--download_workers", type=int, default=4, help="Concurrent filing downloads in batch mode")
+    parser.add_argument("--no_resume", action="store_true", help="In batch mode, redo tickers an earlier run of the same batch already finished")
     parser.add_argument("--years_back", type=int, default=5, help="How many years back to fetch filings")
     parser.add_argument("--make_csv", action="store_true", help="Flag to store csv in home directory")
+    parser.add_argument("--export_dir", type=str, default=None, help="Export the balance sheet facts to this directory as files partitioned by company and year, appending only rows added since the last export")
+    parser.add_argument("--export_format", choices=["parquet", "arrow"], default="parquet", help="File format for --export_dir")
+    parser.add_argument("--full_export", action="store_true", help="With --export_dir, rewrite every partition instead of appending new rows")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes used to parse filings in parallel")
+    parser.add_argument("--engine", choices=extract_and_normalize.ENGINES, default="pdf", help="Extract balance sheets from the rendered PDF or straight from the filing HTML")
+    parser.add_argument("--archive_pdf", action="store_true", help="With --engine=html, also render each filing to PDF for archival")
+    parser.add_argument("--xbrl", action="store_true", help="Load balance sheets from SEC XBRL companyfacts instead of scraping 10-K filings")
+    parser.add_argument("--companyfacts", type=str, default=None, help="Load balance sheets offline from a companyfacts.zip bulk file, a CIK##########.json, or a directory of them")
+    parser.add_argument("--clear_vector_db", action="store_true", help="Clear the filing text vector index before starting")
+    parser.add_argument("--build_vector_index", action="store_true", help="Embed the text of newly stored filings for qualitative questions (python -m src.vector_RAG)")
+    parser.add_argument("--skip_ingest", action="store_true", help="Go straight to the question prompt without fetching or parsing filings")
+    parser.add_argument("--log_level", default="INFO", help="Logging level (DEBUG also logs every timing span)")
+    parser.add_argument("--log_json", action="store_true", help="Write logs as one json object per line")
+    parser.add_argument("--telemetry_report", type=str, default=None, help="Write per-stage timings and counters for this run to this json file on exit")
     args = parser.parse_args()
 
+    telemetry.configure_logging(args.log_level, args.log_json)
+    if args.telemetry_report:
+        # written on exit so the questions asked in the REPL are included
+        atexit.register(telemetry.write_report, args.telemetry_report)
 
 
     conn = connect_or_create_sql_db.connect_or_create_sql_db()
-    if args.clear_sql_database:
-        print(" Clearing SQL database...")
-        clear_sql_db.clear_sql_database(conn, True)
-        print(" SQL database cleared.")
-    
-    
     if args.clear_doc_store:
-        print(" Clearing PDF document store...")
-        clear_pdf_store()
-        print(" PDF store cleared.")
+        log.info("Clearing document store...")
+        clear_document_db.clear_doc_store(connect_or_create_document_db.DOC_STORE_DIR, True)
+        log.info("Document store cleared.")
+    store = connect_or_create_document_db.connect_or_create_doc_store()
 
-    filing_urls = extract_and_normalize.get_10k_filing_urls(args.ticker.upper(), args.years_back)
-    pdfs = extract_and_normalize.save_10k_htmls_as_pdfs(filing_urls)
-
-    for pdf_path in pdfs:
-        print(f"\n Processing: {pdf_path}")
-        df = extract_and_normalize.parse_balance_sheet_from_pdf(pdf_path)
+    if args.clear_sql_database:
+        log.info("Clearing SQL database...")
+        clear_sql_db.clear_sql_database(conn, True)
+        # nothing stored is in the database any more, so every filing has to be parsed again
+        store.reset_parse_status()
+        log.info("SQL database cleared.")
 
-        # Handle balance sheet parsing failure
-        if df is None or df.empty:
-            print("Skipping insert: Empty or invalid balance sheet.")
-            continue
+    tickers = args.tickers.split(",") if args.tickers else []
+    if args.tickers_file:
+        from src.ingest import read_tickers_file
+        tickers += read_tickers_file(args.tickers_file)
 
-        # Attempt to extract date from filename
-        as_of_date = extract_and_normalize.extract_as_of_date_from_filename(pdf_path, args.ticker.upper())
-        if not as_of_date:
-            print(f"Skipping file due to missing as_of_date: {pdf_path}")
-            continue
+    if not args.skip_ingest:
+        # the ingest stack (pandas, the pdf and http libraries) is only loaded when something is ingested
+        from src import ingest
+        if args.companyfacts:
+            summary = ingest.ingest_companyfacts_path(args.companyfacts, conn, tickers or None, args.years_back, args.workers)
+            log.info(f"Companyfacts ingest summary: {summary}")
+        elif args.xbrl:
+            summary = ingest.ingest_companyfacts(tickers or [args.ticker], conn, args.years_back)
+            log.info(f"XBRL ingest summary: {summary}")
+        elif tickers:
+            summaries = ingest.ingest_tickers(tickers, args.years_back, conn, store, args.engine, args.workers, args.download_workers,
+                                              archive_pdf=args.archive_pdf, resume=not args.no_resume)
+            log.info(f"Batch ingest summary for {len(summaries)} tickers:")
+            for ticker, summary in summaries.items():
+                log.info(f"  {ticker}: {summary}")
+        else:
+            summary = ingest.ingest_ticker(args.ticker, args.years_back, conn, store, args.engine, args.workers, args.archive_pdf)
+            log.info(f"Ingest summary for {args.ticker.upper()}: {summary}")
+        log.info(f"Ingest timings:\n{telemetry.format_report()}")
 
-        # Proceed with normalization and insert
-        df = extract_and_normalize.normalize_balance_sheet(df, args.ticker.upper(), as_of_date, "balance_sheet")
-        print(f"\nCleaned Balance Sheet: {os.path.basename(pdf_path)}")
-        print(df)
-        insert_balance_sheet(df, conn)
+    if args.clear_vector_db:
+        from src.scripts import clear_vector_db
+        clear_vector_db.clear_vector_db(should_clear=True)
+    if args.build_vector_index:
+        from src import vector_RAG
+        embedder = vector_RAG.get_embedder()
+        vector_store = vector_RAG.open_vector_store(embedder)
+        added = vector_RAG.index_filings(store, vector_store, embedder, None if tickers else args.ticker)
+        log.info(f"Vector index: {added} new chunks, {vector_store.count} total.")
+        vector_store.close()
 
     if args.make_csv:
-        df = pd.read_sql("SELECT * FROM balance_sheet", conn)
-        df.to_csv("sqlite_export_balance_sheet.csv", index=False)
-        print("CSV file created in home directory.")
+        from src.utils.columnar_export import export_csv
+        rows = export_csv(conn, "sqlite_export_balance_sheet.csv")
+        log.info(f"CSV file with {rows} rows created in home directory.")
+    if args.export_dir:
+        from src.utils.columnar_export import export_balance_sheet
+        export_balance_sheet(args.export_dir, fmt=args.export_format, incremental=not args.full_export)
     run_interactive_research_assistant(conn)
 
 
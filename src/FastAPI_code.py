@@ -1,3 +1,267 @@
-#To Do:
-#put the logic for FastAPI here
-#make openAI instance for FastAPI
\ No newline at end of file
+#src/FastAPI_code.py
+#run with: uvicorn src.FastAPI_code:app --host 0.0.0.0 --port 8000
+import os
+import uuid
+import time
+import logging
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from src.scripts.connect_or_create_document_db import connect_or_create_doc_store
+from src.scripts.connect_or_create_sql_db import DB_PATH, connect_or_create_sql_db, get_data_version
+from src.sql_interface import (
+    BALANCE_SHEET_SCHEMA, MODEL, build_answer_messages, build_sql_messages, clean_generated_sql,
+    execute_sql_query_cached, format_direct_answer, get_answer_cache, get_sql_cache, record_llm_usage, sql_cache_key,
+)
+from src.utils import extract_and_normalize, telemetry
+from src.utils.query_cache import hash_parts
+from src.utils.sql_guard import QueryResult
+from src.utils.sqlite_pool import ReadOnlyConnectionPool
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+load_dotenv()
+
+log = logging.getLogger(__name__)
+
+READ_POOL_SIZE = int(os.environ.get("READ_POOL_SIZE", "8"))
+# parse processes one ingest job may start; more than the machine has cores only adds contention
+MAX_INGEST_WORKERS = int(os.environ.get("MAX_INGEST_WORKERS", str(os.cpu_count() or 1)))
+# finished ingest jobs stay queryable for this long, and at most this many are kept
+INGEST_JOB_TTL_SECONDS = float(os.environ.get("INGEST_JOB_TTL_SECONDS", "3600"))
+MAX_FINISHED_INGEST_JOBS = int(os.environ.get("MAX_FINISHED_INGEST_JOBS", "1000"))
+
+_async_client: Optional["AsyncOpenAI"] = None
+
+# one async OpenAI client per process, so concurrent requests share its connection pool instead of blocking each other;
+# it is built on the first LLM call, so the app starts without the openai import or an API key
+def get_async_client() -> "AsyncOpenAI":
+    global _async_client
+    if _async_client is None:
+        from openai import AsyncOpenAI
+        _async_client = AsyncOpenAI()
+    return _async_client
+
+class AskRequest(BaseModel):
+    question: str
+    stream: bool = False
+
+class IngestRequest(BaseModel):
+    ticker: str
+    years_back: int = 5
+    engine: str = "pdf"
+    workers: int = Field(1, ge=1, le=MAX_INGEST_WORKERS)
+
+# every write goes through one thread that owns the only writable connection, so ingest jobs are
+# serialized and never contend with each other; readers are unaffected thanks to WAL
+class IngestWriter:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.jobs: Dict[str, Dict] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-writer")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._store = None
+        # creating the schema up front means the read-only pool can open the database
+        self._executor.submit(self._open).result()
+
+    def _open(self) -> None:
+        self._conn = connect_or_create_sql_db(self.db_path)
+        self._store = connect_or_create_doc_store()
+
+    def _run(self, job: Dict) -> None:
+        job["status"] = "running"
+        try:
+            # the ingest stack is loaded by the first job rather than at app startup
+            from src.ingest import ingest_ticker
+            job["summary"] = ingest_ticker(job["ticker"], job["years_back"], self._conn, self._store, job["engine"], job["workers"])
+            job["status"] = "done"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+        job["finished_at"] = time.time()
+
+    # forgets finished jobs past the TTL, then the oldest finished ones over the cap; queued and running jobs are kept
+    def _evict_finished(self) -> None:
+        finished = sorted((job["finished_at"], job_id) for job_id, job in list(self.jobs.items()) if "finished_at" in job)
+        expired = time.time() - INGEST_JOB_TTL_SECONDS
+        stale = sum(1 for finished_at, _ in finished if finished_at < expired)
+        stale = max(stale, len(finished) - MAX_FINISHED_INGEST_JOBS)
+        for _, job_id in finished[:stale]:
+            self.jobs.pop(job_id, None)
+
+    def submit(self, request: IngestRequest) -> Dict:
+        self._evict_finished()
+        job = {"job_id": uuid.uuid4().hex, "status": "queued", **request.model_dump(), "ticker": request.ticker.upper()}
+        self.jobs[job["job_id"]] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def close(self) -> None:
+        def _close() -> None:
+            self._conn.close()
+            self._store.close()
+        self._executor.submit(_close).result()
+        self._executor.shutdown()
+
+# async version of generate_sql_query
+async def generate_sql_query_async(schema_description: str, user_question: str) -> str:
+    with telemetry.span("llm.generate_sql"):
+        response = await get_async_client().chat.completions.create(
+            model=MODEL,
+            messages=build_sql_messages(schema_description, user_question),
+            temperature=0
+        )
+    record_llm_usage(getattr(response, "usage", None))
+    return response.choices[0].message.content.strip()
+
+# async version of stream_llm_answer
+async def stream_llm_answer_async(messages: List[dict]) -> AsyncIterator[str]:
+    usage = None
+    with telemetry.span("llm.answer"):
+        start = time.perf_counter()
+        stream = await get_async_client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=0,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if start is not None:
+                    telemetry.TELEMETRY.record_span("llm.answer_first_chunk", time.perf_counter() - start)
+                    start = None
+                yield chunk.choices[0].delta.content
+    record_llm_usage(usage)
+
+# everything up to the answer phrasing; answer is set when no LLM phrasing is needed (cache hit or direct answer)
+class PreparedAnswer(NamedTuple):
+    question: str
+    answer_key: str
+    answer: Optional[str] = None
+    query: Optional[str] = None
+    result: Optional[QueryResult] = None
+
+# async twin of the first half of stream_answer_from_db: cache and sqlite work run on worker threads, the NL -> SQL call
+# is awaited. Rejected or failing SQL raises here, before any response has been started
+async def prepare_answer_async(question: str, pool: ReadOnlyConnectionPool, schema: str = BALANCE_SHEET_SCHEMA) -> PreparedAnswer:
+    sql_cache, answer_cache = get_sql_cache(), get_answer_cache()
+    cache_key = sql_cache_key(schema, question)
+    data_version = await pool.run(get_data_version)
+
+    answer_key = hash_parts(cache_key, data_version)
+    cached_answer = await asyncio.to_thread(answer_cache.get, answer_key)
+    if cached_answer is not None:
+        return PreparedAnswer(question, answer_key, cached_answer)
+
+    cleaned_query = await asyncio.to_thread(sql_cache.get, cache_key)
+    if cleaned_query is None:
+        cleaned_query = clean_generated_sql(await generate_sql_query_async(schema, question))
+        result = await pool.run(lambda conn: execute_sql_query_cached(cleaned_query, conn, None, data_version))
+        await asyncio.to_thread(sql_cache.put, cache_key, cleaned_query)
+    else:
+        result = await pool.run(lambda conn: execute_sql_query_cached(cleaned_query, conn, None, data_version))
+
+    answer = format_direct_answer(result.rows)
+    if answer is not None:
+        telemetry.incr("answers.direct")
+        await asyncio.to_thread(answer_cache.put, answer_key, answer)
+        return PreparedAnswer(question, answer_key, answer)
+    return PreparedAnswer(question, answer_key, None, cleaned_query, result)
+
+# the answer text: the prepared answer as is, or the LLM's phrasing of the result as it streams in
+async def phrase_answer_async(prepared: PreparedAnswer) -> AsyncIterator[str]:
+    if prepared.answer is not None:
+        yield prepared.answer
+        return
+
+    telemetry.incr("answers.llm")
+    chunks = []
+    async for chunk in stream_llm_answer_async(build_answer_messages(prepared.question, prepared.query, prepared.result)):
+        chunks.append(chunk)
+        yield chunk
+    await asyncio.to_thread(get_answer_cache().put, prepared.answer_key, "".join(chunks).strip())
+
+# async twin of stream_answer_from_db
+async def stream_answer_async(question: str, pool: ReadOnlyConnectionPool, schema: str = BALANCE_SHEET_SCHEMA) -> AsyncIterator[str]:
+    prepared = await prepare_answer_async(question, pool, schema)
+    async for chunk in phrase_answer_async(prepared):
+        yield chunk
+
+# once a streaming response has started its status can no longer change, so a failure while phrasing ends the
+# stream with an error line instead of cutting the connection
+async def with_error_chunk(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        log.warning(f"Answer stream failed: {e}")
+        telemetry.incr("answers.stream_errors")
+        yield f"\n[error] The answer could not be completed: {e}\n"
+
+def create_app(db_path: Optional[str] = None, pool_size: int = READ_POOL_SIZE) -> FastAPI:
+    db_path = db_path or DB_PATH
+    # uvicorn only sets up its own loggers; LOG_JSON=1 switches the app's logs to one json object per line
+    if not logging.getLogger().handlers:
+        telemetry.configure_logging(os.environ.get("LOG_LEVEL", "INFO"), os.environ.get("LOG_JSON") == "1")
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.writer = IngestWriter(db_path)
+        app.state.pool = ReadOnlyConnectionPool(db_path, pool_size)
+        yield
+        app.state.pool.close()
+        app.state.writer.close()
+
+    app = FastAPI(title="Financial Research Assistant", lifespan=lifespan)
+
+    @app.get("/health")
+    async def health(request: Request) -> Dict:
+        return {"status": "ok", "data_version": await request.app.state.pool.run(get_data_version)}
+
+    # span timings and counters since the process started
+    @app.get("/metrics")
+    async def metrics() -> Dict:
+        return telemetry.report()
+
+    @app.post("/ask")
+    async def ask(body: AskRequest, request: Request):
+        if not body.question.strip():
+            raise HTTPException(status_code=400, detail="question must not be empty")
+        try:
+            prepared = await prepare_answer_async(body.question, request.app.state.pool)
+        except (ValueError, sqlite3.Error) as e:
+            # rejected by the SQL safety checks, or SQL the database could not run
+            raise HTTPException(status_code=400, detail=str(e))
+        if body.stream:
+            # only the phrasing is streamed; everything that can be rejected has already run
+            return StreamingResponse(with_error_chunk(phrase_answer_async(prepared)), media_type="text/plain")
+        answer = "".join([chunk async for chunk in phrase_answer_async(prepared)]).strip()
+        return {"question": body.question, "answer": answer}
+
+    @app.post("/ingest", status_code=202)
+    async def ingest(body: IngestRequest, request: Request) -> Dict:
+        if body.engine not in extract_and_normalize.ENGINES:
+            raise HTTPException(status_code=400, detail=f"engine must be one of {extract_and_normalize.ENGINES}")
+        return request.app.state.writer.submit(body)
+
+    @app.get("/ingest/{job_id}")
+    async def ingest_status(job_id: str, request: Request) -> Dict:
+        job = request.app.state.writer.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="unknown or expired job")
+        return job
+
+    return app
+
+app = create_app()
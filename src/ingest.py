@@ -0,0 +1,445 @@
+#src/ingest.py
+import logging
+import os
+import glob
+import sqlite3
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.scripts.connect_or_create_document_db import BATCH_DONE, BATCH_FAILED, BATCH_PARTIAL, DocumentStore, PARSE_FAILED, PARSE_OK
+from src.utils.query_cache import hash_parts
+from src.sql_interface import bulk_insert_balance_sheets
+from src.utils import extract_and_normalize, telemetry, xbrl_facts
+from src.utils.metadata_cache import MetadataCache, get_metadata_cache
+from src.utils.sec_http import SecClient
+
+log = logging.getLogger(__name__)
+
+# yields (key, ParsedFiling) for every (key, path, as_of_date) job, in a process pool when workers > 1
+def iter_parsed_filings(jobs: List[Tuple[str, str, Optional[str]]], ticker: str, workers: int = 1, engine: str = "pdf") -> Iterator[Tuple[str, extract_and_normalize.ParsedFiling]]:
+    if workers <= 1 or len(jobs) <= 1:
+        for key, path, as_of_date in jobs:
+            log.info(f"Processing: {path}")
+            yield key, extract_and_normalize.parse_and_normalize_filing(path, ticker, engine=engine, as_of_date=as_of_date)
+        return
+
+    log.info(f"Parsing {len(jobs)} filings with {workers} worker processes...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(telemetry.collect, extract_and_normalize.parse_and_normalize_filing, path, ticker, engine=engine, as_of_date=as_of_date): (key, path)
+            for key, path, as_of_date in jobs
+        }
+        for future in as_completed(futures):
+            key, path = futures[future]
+            try:
+                # workers record their spans in their own process and hand them back with the result
+                result, spans = future.result()
+                telemetry.merge(spans)
+                yield key, result
+            except Exception as e:
+                # a crashed worker only loses its own file
+                yield key, extract_and_normalize.ParsedFiling(path, None, f"worker failed: {e}")
+
+# renders a filing to a temp pdf next to the store; returns the temp path, or None if conversion failed
+def render_filing_pdf(filing: Dict, filing_htm_url: str, html: str, tmp_dir: str) -> Optional[str]:
+    tmp_path = os.path.join(tmp_dir, f"{filing['accession']}.pdf.tmp")
+    try:
+        log.info(f"Converting to PDF: {filing_htm_url}")
+        extract_and_normalize.render_html_to_pdf(html, filing_htm_url, tmp_path)
+        return tmp_path
+    except Exception as e:
+        log.warning(f"PDF conversion failed: {e}")
+        return None
+
+# writes a downloaded filing (and its rendered pdf, if any) into the store and manifest
+def store_downloaded_filing(filing: Dict, store: DocumentStore, filing_htm_url: str, html: str, pdf_tmp_path: Optional[str] = None) -> None:
+    filename = os.path.basename(filing_htm_url)
+    sha256, _ = store.put(html.encode("utf-8"), ".htm")
+    store.record_fetch(filing, "html", sha256, filename, filing_htm_url)
+    if pdf_tmp_path:
+        sha256, _ = store.put_file(pdf_tmp_path, ".pdf")
+        store.record_fetch(filing, "pdf", sha256, filename, filing_htm_url)
+
+# downloads filings into the document store; pdfs are rendered when the pdf engine needs them or for archival
+def fetch_filings(filings: List[Dict], store: DocumentStore, engine: str = "pdf", archive_pdf: bool = False, client: Optional[SecClient] = None) -> None:
+    by_index_url = {filing["index_url"]: filing for filing in filings}
+    for index_url, filing_htm_url, html in extract_and_normalize.fetch_10k_documents(list(by_index_url), client):
+        filing = by_index_url[index_url]
+        pdf_tmp_path = render_filing_pdf(filing, filing_htm_url, html, store.root) if engine == "pdf" or archive_pdf else None
+        store_downloaded_filing(filing, store, filing_htm_url, html, pdf_tmp_path)
+
+# the filename stamp wins (as before); the submissions reportDate covers filings without one
+def filing_as_of_date(entry: Dict) -> Optional[str]:
+    from_name = extract_and_normalize.as_of_date_from_filename(entry.get("filename") or "")
+    return from_name or entry.get("report_date")
+
+# loads a batch of parsed filings in one transaction and records each filing's outcome in the manifest
+def flush_parsed_batch(batch: List[Tuple[str, extract_and_normalize.ParsedFiling]], conn: sqlite3.Connection, store: DocumentStore, engine: str) -> Tuple[int, int]:
+    if not batch:
+        return 0, 0
+    try:
+        report = bulk_insert_balance_sheets([result.df for _, result in batch], conn)
+    except Exception as e:
+        log.warning(f"Failed to insert balance sheet data: {e}")
+        for accession, result in batch:
+            store.record_parse(accession, PARSE_FAILED, engine, result.page, error=f"insert failed: {e}")
+        return 0, len(batch)
+
+    for (accession, result), inserted in zip(batch, report.per_statement):
+        store.record_parse(accession, PARSE_OK, engine, result.page, inserted)
+    log.info(f"Inserted {report.inserted} new rows from {len(batch)} filings ({report.skipped} duplicates skipped).")
+    return report.inserted, 0
+
+# fetches and parses only filings that are new or previously failed, and records the outcome in the manifest
+def ingest_ticker(ticker: str, years_back: int, conn: sqlite3.Connection, store: DocumentStore, engine: str = "pdf",
+                  workers: int = 1, archive_pdf: bool = False, client: Optional[SecClient] = None, batch_size: int = 20) -> Dict[str, int]:
+    ticker = ticker.upper()
+    kind = "html" if engine == "html" else "pdf"
+
+    filings = extract_and_normalize.get_10k_filings(ticker, years_back, client)
+    pending = store.pending(filings)
+    log.info(f"{ticker}: {len(filings)} filings found, {len(filings) - len(pending)} already ingested, {len(pending)} to process.")
+
+    to_fetch = [filing for filing in pending if store.document_path(filing["accession"], kind) is None]
+    if to_fetch:
+        fetch_filings(to_fetch, store, engine, archive_pdf, client)
+
+    jobs = []
+    for filing in pending:
+        path = store.document_path(filing["accession"], kind)
+        if path is not None:
+            jobs.append((filing["accession"], path, filing_as_of_date(store.get(filing["accession"]))))
+
+    summary = {"found": len(filings), "processed": 0, "failed": 0, "rows_inserted": 0}
+    batch = []
+    # parsing fans out to workers; inserts are batched onto this single connection
+    for accession, result in iter_parsed_filings(jobs, ticker, workers, engine):
+        if result.skip_reason:
+            log.warning(f"Skipping {accession}: {result.skip_reason}")
+            store.record_parse(accession, PARSE_FAILED, engine, result.page, error=result.skip_reason)
+            summary["failed"] += 1
+            continue
+
+        log.debug("Cleaned Balance Sheet: %s\n%s", store.get(accession)["filename"], result.df)
+        batch.append((accession, result))
+        if len(batch) >= batch_size:
+            inserted, failed = flush_parsed_batch(batch, conn, store, engine)
+            summary["rows_inserted"] += inserted
+            summary["processed"] += len(batch) - failed
+            summary["failed"] += failed
+            batch = []
+
+    inserted, failed = flush_parsed_batch(batch, conn, store, engine)
+    summary["rows_inserted"] += inserted
+    summary["processed"] += len(batch) - failed
+    summary["failed"] += failed
+    return summary
+
+# network (and wkhtmltopdf) half of fetching one filing; runs on a download thread and never touches the store
+def download_filing(filing: Dict, tmp_dir: str, render_pdf: bool, client: Optional[SecClient] = None) -> Optional[Tuple[str, str, Optional[str]]]:
+    fetched = extract_and_normalize.fetch_10k_document(filing["index_url"], client)
+    if fetched is None:
+        return None
+    filing_htm_url, html = fetched
+    pdf_tmp_path = render_filing_pdf(filing, filing_htm_url, html, tmp_dir) if render_pdf else None
+    return filing_htm_url, html, pdf_tmp_path
+
+# reads tickers from a file: one per line (or comma separated), blank lines and # comments ignored
+def read_tickers_file(path: str) -> List[str]:
+    tickers = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            tickers.extend(part.strip() for part in line.split(",") if part.strip())
+    return tickers
+
+# the same ticker list, lookback and engine is the same batch, which is what lets a rerun resume it
+def batch_id_for(tickers: List[str], years_back: int, engine: str) -> str:
+    return hash_parts(",".join(sorted(tickers)), str(years_back), engine)[:16]
+
+# pipelined multi-ticker ingest: discovery and downloads run on bounded thread pools, parsing on a process pool,
+# and this thread is the only one touching the store and the database, so every stage overlaps with the others
+def ingest_tickers(tickers: Iterable[str], years_back: int, conn: sqlite3.Connection, store: DocumentStore, engine: str = "pdf",
+                   workers: int = 1, download_workers: int = 4, discovery_workers: int = 4, archive_pdf: bool = False,
+                   client: Optional[SecClient] = None, batch_size: int = 20, resume: bool = True) -> Dict[str, Dict[str, int]]:
+    tickers = list(dict.fromkeys(ticker.strip().upper() for ticker in tickers if ticker.strip()))
+    kind = "html" if engine == "html" else "pdf"
+    render_pdf = engine == "pdf" or archive_pdf
+    batch_id = batch_id_for(tickers, years_back, engine)
+    completed = set(store.completed_tickers(batch_id)) if resume else set()
+    if completed:
+        log.info(f"Resuming batch {batch_id}: {len(completed)} of {len(tickers)} tickers already done.")
+
+    summaries = {ticker: {"found": 0, "processed": 0, "failed": 0, "rows_inserted": 0} for ticker in tickers if ticker not in completed}
+    # filings of each ticker that are discovered but not yet inserted or failed; None until discovery finishes
+    outstanding: Dict[str, Optional[int]] = {ticker: None for ticker in summaries}
+    tmp_dir = os.path.join(store.root, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    def finish_filings(ticker: str, count: int = 1) -> None:
+        outstanding[ticker] -= count
+        if outstanding[ticker] == 0:
+            summary = summaries[ticker]
+            status = BATCH_DONE if summary["failed"] == 0 else BATCH_PARTIAL
+            store.record_ticker_progress(batch_id, ticker, status, summary)
+            log.info(f"{ticker}: {status} {summary}")
+
+    def fail_filing(filing: Dict, error: str, page: Optional[int] = None) -> None:
+        log.warning(f"Skipping {filing['accession']}: {error}")
+        if store.get(filing["accession"]) is not None:
+            store.record_parse(filing["accession"], PARSE_FAILED, engine, page, error=error)
+        summaries[filing["ticker"]]["failed"] += 1
+        finish_filings(filing["ticker"])
+
+    batch: List[Tuple[str, extract_and_normalize.ParsedFiling]] = []
+    batch_filings: List[Dict] = []
+
+    def flush() -> None:
+        flush_parsed_batch(batch, conn, store, engine)
+        for filing in batch_filings:
+            entry = store.get(filing["accession"])
+            summary = summaries[filing["ticker"]]
+            if entry["parse_status"] == PARSE_OK:
+                summary["processed"] += 1
+                summary["rows_inserted"] += entry["rows_inserted"] or 0
+            else:
+                summary["failed"] += 1
+        for filing in batch_filings:
+            finish_filings(filing["ticker"])
+        batch.clear()
+        batch_filings.clear()
+
+    futures: Dict = {}
+    with ThreadPoolExecutor(discovery_workers, thread_name_prefix="discover") as discovery_pool, \
+         ThreadPoolExecutor(download_workers, thread_name_prefix="download") as download_pool, \
+         ProcessPoolExecutor(max(1, workers)) as parse_pool:
+
+        def submit_parse(filing: Dict) -> None:
+            path = store.document_path(filing["accession"], kind)
+            if path is None:
+                fail_filing(filing, f"no {kind} document was stored")
+                return
+            as_of_date = filing_as_of_date(store.get(filing["accession"]))
+            future = parse_pool.submit(telemetry.collect, extract_and_normalize.parse_and_normalize_filing, path, filing["ticker"], engine=engine, as_of_date=as_of_date)
+            futures[future] = ("parse", filing)
+
+        for ticker in summaries:
+            futures[discovery_pool.submit(extract_and_normalize.get_10k_filings, ticker, years_back, client)] = ("discover", ticker)
+
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, payload = futures.pop(future)
+
+                if stage == "discover":
+                    ticker = payload
+                    try:
+                        filings = future.result()
+                    except Exception as e:
+                        log.warning(f"{ticker}: discovery failed: {e}")
+                        store.record_ticker_progress(batch_id, ticker, BATCH_FAILED, {"error": str(e)})
+                        summaries[ticker]["error"] = str(e)
+                        continue
+                    pending = store.pending(filings)
+                    summaries[ticker]["found"] = len(filings)
+                    outstanding[ticker] = len(pending) + 1
+                    log.info(f"{ticker}: {len(filings)} filings found, {len(filings) - len(pending)} already ingested, {len(pending)} to process.")
+                    for filing in pending:
+                        if store.document_path(filing["accession"], kind) is not None:
+                            submit_parse(filing)
+                        else:
+                            futures[download_pool.submit(download_filing, filing, tmp_dir, render_pdf, client)] = ("download", filing)
+                    # the extra count keeps a ticker from completing while its filings are still being queued
+                    finish_filings(ticker)
+
+                elif stage == "download":
+                    filing = payload
+                    try:
+                        downloaded = future.result()
+                    except Exception as e:
+                        fail_filing(filing, f"download failed: {e}")
+                        continue
+                    if downloaded is None:
+                        fail_filing(filing, "download failed")
+                        continue
+                    try:
+                        store_downloaded_filing(filing, store, *downloaded)
+                    except Exception as e:
+                        # one filing the store rejects (full disk, bad manifest row) is skipped like a failed parse
+                        pdf_tmp_path = downloaded[2]
+                        if pdf_tmp_path and os.path.exists(pdf_tmp_path):
+                            os.remove(pdf_tmp_path)
+                        fail_filing(filing, f"storing the download failed: {e}")
+                        continue
+                    submit_parse(filing)
+
+                else:
+                    filing = payload
+                    try:
+                        result, spans = future.result()
+                        telemetry.merge(spans)
+                    except Exception as e:
+                        # a crashed worker only loses its own file
+                        result = extract_and_normalize.ParsedFiling(None, None, f"worker failed: {e}")
+                    if result.skip_reason:
+                        fail_filing(filing, result.skip_reason, result.page)
+                        continue
+                    batch.append((filing["accession"], result))
+                    batch_filings.append(filing)
+                    if len(batch) >= batch_size:
+                        flush()
+
+        flush()
+
+    return summaries
+
+# drops rows for (company, as_of_date, label) the database already has, e.g. from the pdf path, so a company
+# loaded both ways doesn't get two values for the same line item; the batch's keys go through a temp table and
+# one join, so the lookup doesn't depend on how many companies or facts the batch holds
+def drop_existing_facts(df: pd.DataFrame, conn: sqlite3.Connection) -> pd.DataFrame:
+    if df.empty:
+        return df
+    keys = ["company", "as_of_date", "label"]
+    # filling the temp table opens a transaction; one we opened is ours to close, a caller's stays open
+    started = not conn.in_transaction
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS incoming_facts (company TEXT, as_of_date TEXT, label TEXT)")
+    conn.execute("DELETE FROM temp.incoming_facts")
+    try:
+        conn.executemany("INSERT INTO temp.incoming_facts VALUES (?, ?, ?)", df[keys].drop_duplicates().itertuples(index=False, name=None))
+        existing = pd.read_sql_query(
+            "SELECT DISTINCT b.company, b.as_of_date, b.label FROM temp.incoming_facts i "
+            "JOIN balance_sheet b ON b.company = i.company AND b.as_of_date = i.as_of_date AND b.label = i.label",
+            conn,
+        )
+    finally:
+        conn.execute("DELETE FROM temp.incoming_facts")
+        if started:
+            conn.commit()
+    if existing.empty:
+        return df
+    present = df[keys].merge(existing.assign(_present=True), on=keys, how="left")["_present"].notna().to_numpy()
+    return df[~present]
+
+# collects per-company frames and loads them every batch_size companies, so at most one batch is held in memory;
+# summary counts companies read, companies with no balance sheet facts, companies that failed, and rows
+class CompanyfactsLoader:
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = 200, skip_existing: bool = True):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.skip_existing = skip_existing
+        self.frames: List[pd.DataFrame] = []
+        self.summary = {"companies": 0, "empty": 0, "failed": 0, "rows_inserted": 0, "duplicates_skipped": 0}
+
+    def add(self, df: pd.DataFrame) -> None:
+        self.summary["companies"] += 1
+        self.summary["empty"] += int(df.empty)
+        if not df.empty:
+            self.frames.append(df)
+        if len(self.frames) >= self.batch_size:
+            self.flush()
+
+    def fail(self, count: int = 1) -> None:
+        self.summary["failed"] += count
+
+    # loads the pending frames in one transaction
+    def flush(self) -> None:
+        if not self.frames:
+            return
+        batch = pd.concat(self.frames, ignore_index=True)
+        self.frames.clear()
+        if self.skip_existing:
+            batch = drop_existing_facts(batch, self.conn)
+        report = bulk_insert_balance_sheets([batch], self.conn)
+        self.summary["rows_inserted"] += report.inserted
+        self.summary["duplicates_skipped"] += report.skipped
+        log.info(f"Inserted {report.inserted} XBRL rows ({self.summary['companies']} companies so far).")
+
+def min_year_for(years_back: Optional[int]) -> Optional[int]:
+    return datetime.now().year - years_back if years_back is not None else None
+
+# fast path for tickers that file XBRL: one companyfacts request per company instead of rendering and scraping 10-K pdfs
+def ingest_companyfacts(tickers: Iterable[str], conn: sqlite3.Connection, years_back: Optional[int] = None,
+                        cache: Optional[MetadataCache] = None, skip_existing: bool = True, batch_size: int = 200) -> Dict[str, int]:
+    cache = cache or get_metadata_cache()
+    loader = CompanyfactsLoader(conn, batch_size, skip_existing)
+    for ticker in dict.fromkeys(ticker.strip().upper() for ticker in tickers if ticker.strip()):
+        try:
+            cik = cache.lookup_cik(ticker)
+            if not cik:
+                raise ValueError(f"CIK not found for ticker: {ticker}")
+            df = xbrl_facts.companyfacts_to_balance_sheet(cache.get_companyfacts(cik), ticker, min_year=min_year_for(years_back))
+        except Exception as e:
+            log.warning(f"{ticker}: companyfacts failed: {e}")
+            loader.fail()
+            continue
+        log.info(f"{ticker}: {len(df)} balance sheet facts from XBRL.")
+        loader.add(df)
+    loader.flush()
+    return loader.summary
+
+# offline load from a companyfacts bulk zip (streamed member by member), a single CIK##########.json, or a directory of them;
+# tickers limits the load to those companies, and worker processes split the zip members between them
+def ingest_companyfacts_path(path: str, conn: sqlite3.Connection, tickers: Optional[Iterable[str]] = None, years_back: Optional[int] = None,
+                             workers: int = 1, batch_size: int = 200, skip_existing: bool = True,
+                             cache: Optional[MetadataCache] = None) -> Dict[str, int]:
+    cache = cache or get_metadata_cache()
+    ticker_index = cache.cached_ticker_index() or {}
+    if tickers:
+        wanted = {ticker.strip().upper(): ticker_index.get(ticker.strip().upper()) for ticker in tickers if ticker.strip()}
+        companies = {cik: ticker for ticker, cik in wanted.items() if cik}
+        missing = [ticker for ticker, cik in wanted.items() if not cik]
+        if missing:
+            log.info(f"No cached CIK for {missing}; run once online (or without --tickers) to resolve them.")
+    else:
+        # several tickers can share a CIK (GOOG / GOOGL); the first listed one names the company
+        companies = {}
+        for ticker, cik in ticker_index.items():
+            companies.setdefault(cik, ticker)
+
+    loader = CompanyfactsLoader(conn, batch_size, skip_existing)
+    min_year = min_year_for(years_back)
+
+    def add(df: Optional[pd.DataFrame]) -> None:
+        if df is None:
+            loader.fail()
+        else:
+            loader.add(df)
+
+    if xbrl_facts.is_companyfacts_zip(path):
+        members = xbrl_facts.list_companyfacts_members(path, list(companies) if tickers else None)
+        log.info(f"Reading {len(members)} companies from {path}...")
+        if workers <= 1:
+            for _, df in xbrl_facts.iter_companyfacts_frames(path, members, companies, min_year):
+                add(df)
+        else:
+            slices = [members[i:i + batch_size] for i in range(0, len(members), batch_size)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(telemetry.collect, xbrl_facts.companyfacts_zip_to_frames, path, chunk, companies, min_year): chunk for chunk in slices}
+                for future in as_completed(futures):
+                    try:
+                        frames_by_cik, spans = future.result()
+                    except Exception as e:
+                        # a crashed worker loses every company in its slice
+                        log.warning(f"Companyfacts worker failed: {e}")
+                        loader.fail(len(futures[future]))
+                        continue
+                    telemetry.merge(spans)
+                    for _, df in frames_by_cik:
+                        add(df)
+    else:
+        paths = sorted(glob.glob(os.path.join(path, "CIK*.json"))) if os.path.isdir(path) else [path]
+        for json_path in paths:
+            try:
+                cik, data = xbrl_facts.read_companyfacts_json(json_path)
+            except Exception as e:
+                log.warning(f"Could not read {json_path}: {e}")
+                loader.fail()
+                continue
+            if tickers and cik not in companies:
+                continue
+            add(xbrl_facts.companyfacts_to_balance_sheet(data, companies.get(cik) or f"CIK{cik}", min_year=min_year))
+
+    loader.flush()
+    return loader.summary
@@ -1,20 +1,30 @@
 #src/scripts/clear_document_db.py
-def clear_doc_store(path="../data/pdfs", should_clear: bool = False)-> None:
+import logging
+import os
+import shutil
+
+from src.scripts.connect_or_create_document_db import DOC_STORE_DIR
+
+log = logging.getLogger(__name__)
+
+def clear_doc_store(path: str = DOC_STORE_DIR, should_clear: bool = False) -> None:
     """
-    Clears all files from the document store directory if should_clear is True.
+    Removes all stored filings and the ingest manifest if should_clear is True.
     """
     if not should_clear:
-        print("Document store clear skipped (should_clear is False).")
+        log.info("Document store clear skipped (should_clear is False).")
         return
 
     if os.path.isdir(path):
         for filename in os.listdir(path):
             file_path = os.path.join(path, filename)
             try:
-                if os.path.isfile(file_path):
+                if os.path.isdir(file_path):
+                    shutil.rmtree(file_path)
+                else:
                     os.remove(file_path)
             except Exception as e:
-                print(f"Error deleting file {file_path}: {e}")
-        print(f"Cleared all files in document store: {path}")
+                log.warning(f"Error deleting {file_path}: {e}")
+        log.info(f"Cleared all files in document store: {path}")
     else:
-        print(f"Document store directory does not exist: {path}")
+        log.warning(f"Document store directory does not exist: {path}")
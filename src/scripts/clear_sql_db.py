@@ -1,27 +1,35 @@
 #src/scripts/clear_sql_db.py
+import logging
 import sqlite3
 import os
 import shutil
 
-from src.scripts.connect_or_create_sql_db import connect_or_create_sql_db
+from src.scripts.connect_or_create_sql_db import SCHEMA_OBJECTS, bump_data_version, connect_or_create_sql_db
 from src.utils.path_helpers import project_root
 import os
 
+log = logging.getLogger(__name__)
+
 def clear_sql_database(conn, should_clear):
     """
-    Clears all data from the balance_sheet table in the connected database if should_clear is True.
+    Drops the balance sheet view, facts and lookup tables in the connected database if should_clear is True.
     """
     if not should_clear:
-        print("Database clear skipped (should_clear is False).")
+        log.info("Database clear skipped (should_clear is False).")
         return
 
     try:
         cursor = conn.cursor()
-        cursor.execute("DROP TABLE IF EXISTS balance_sheet")
+        existing = dict(cursor.execute("SELECT name, type FROM sqlite_master").fetchall())
+        for _, name in SCHEMA_OBJECTS:
+            # an unmigrated database still has balance_sheet as a table rather than a view
+            if name in existing:
+                cursor.execute(f"DROP {existing[name].upper()} {name}")
+        bump_data_version(conn)
         conn.commit()
-        print("Cleared the balance_sheet table (if it existed).")
+        log.info("Cleared the balance_sheet storage (if it existed).")
     except sqlite3.Error as e:
-        print(f"Error clearing database: {e}")
+        log.warning(f"Error clearing database: {e}")
 
 
 if __name__ == "__main__":
@@ -1,2 +1,22 @@
-#To Do:
-#implement logic for clearning the vector db based on condition and existence of db
\ No newline at end of file
+#src/scripts/clear_vector_db.py
+import logging
+import os
+import shutil
+
+from src.scripts.connect_or_create_vector_db import VECTOR_DB_DIR
+
+log = logging.getLogger(__name__)
+
+def clear_vector_db(path: str = VECTOR_DB_DIR, should_clear: bool = False) -> None:
+    """
+    Removes the embedding matrix, chunk catalog and cluster index if should_clear is True.
+    """
+    if not should_clear:
+        log.info("Vector store clear skipped (should_clear is False).")
+        return
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+        log.info(f"Cleared vector store: {path}")
+    else:
+        log.warning(f"Vector store directory does not exist: {path}")
@@ -1,9 +1,163 @@
 #src/scripts/connect_or_create_document_db.py
+import logging
 import os
+import json
+import time
+import sqlite3
+import hashlib
+from typing import Dict, List, Optional, Tuple
 
-def connect_or_create_doc_store(path="../data/pdfs")->None:
+from src.utils.path_helpers import project_root
+
+log = logging.getLogger(__name__)
+
+DOC_STORE_DIR = os.path.join(project_root(), "data", "documents")
+PARSE_PENDING, PARSE_OK, PARSE_FAILED = "pending", "parsed", "failed"
+BATCH_DONE, BATCH_PARTIAL, BATCH_FAILED = "done", "partial", "failed"
+
+# content-addressed filing store: blobs live under objects/<sha[:2]>/<sha><ext>,
+# and manifest.db records per accession what was fetched, when, and how parsing went
+class DocumentStore:
+    def __init__(self, root: str = DOC_STORE_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(root, "manifest.db"))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS filings (
+            accession TEXT PRIMARY KEY,
+            ticker TEXT NOT NULL,
+            cik TEXT,
+            filing_date TEXT,
+            report_date TEXT,
+            filename TEXT,
+            source_url TEXT,
+            html_sha256 TEXT,
+            pdf_sha256 TEXT,
+            fetched_at REAL,
+            parse_status TEXT NOT NULL DEFAULT 'pending',
+            engine TEXT,
+            page INTEGER,
+            rows_inserted INTEGER,
+            error TEXT,
+            parsed_at REAL
+        )
+        """)
+        # per-ticker outcome of multi-ticker batches, so an interrupted batch resumes where it stopped
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS batch_progress (
+            batch_id TEXT NOT NULL,
+            ticker TEXT NOT NULL,
+            status TEXT NOT NULL,
+            summary TEXT,
+            updated_at REAL,
+            PRIMARY KEY (batch_id, ticker)
+        )
+        """)
+        self.conn.commit()
+
+    def object_path(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], f"{sha256}{ext}")
+
+    # stores bytes under their hash; identical content is only written once
+    def put(self, content: bytes, ext: str) -> Tuple[str, str]:
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = self.object_path(sha256, ext)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return sha256, path
+
+    def put_file(self, file_path: str, ext: str) -> Tuple[str, str]:
+        with open(file_path, "rb") as f:
+            sha256, path = self.put(f.read(), ext)
+        os.remove(file_path)
+        return sha256, path
+
+    def get(self, accession: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM filings WHERE accession = ?", (accession,)).fetchone()
+        return dict(row) if row else None
+
+    # every filing in the manifest, optionally for one ticker, oldest report first
+    def filings(self, ticker: Optional[str] = None) -> List[Dict]:
+        if ticker:
+            rows = self.conn.execute("SELECT * FROM filings WHERE ticker = ? ORDER BY report_date", (ticker.upper(),)).fetchall()
+        else:
+            rows = self.conn.execute("SELECT * FROM filings ORDER BY ticker, report_date").fetchall()
+        return [dict(row) for row in rows]
+
+    # path of the stored html or pdf for a filing, or None if it was never fetched
+    def document_path(self, accession: str, kind: str) -> Optional[str]:
+        entry = self.get(accession)
+        sha256 = entry and entry.get(f"{kind}_sha256")
+        if not sha256:
+            return None
+        path = self.object_path(sha256, ".htm" if kind == "html" else ".pdf")
+        return path if os.path.exists(path) else None
+
+    # filings that were never parsed successfully (new, pending or previously failed)
+    def pending(self, filings: List[Dict]) -> List[Dict]:
+        result = []
+        for filing in filings:
+            entry = self.get(filing["accession"])
+            if entry is None or entry["parse_status"] != PARSE_OK:
+                result.append(filing)
+        return result
+
+    def record_fetch(self, filing: Dict, kind: str, sha256: str, filename: str, source_url: str) -> None:
+        self.conn.execute(
+            """
+            INSERT INTO filings (accession, ticker, cik, filing_date, report_date, filename, source_url, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(accession) DO UPDATE SET
+                filename = excluded.filename, source_url = excluded.source_url, fetched_at = excluded.fetched_at
+            """,
+            (filing["accession"], filing["ticker"], filing.get("cik"), filing.get("filing_date"),
+             filing.get("report_date"), filename, source_url, time.time()),
+        )
+        self.conn.execute(f"UPDATE filings SET {kind}_sha256 = ? WHERE accession = ?", (sha256, filing["accession"]))
+        self.conn.commit()
+
+    def record_parse(self, accession: str, status: str, engine: str, page: Optional[int] = None,
+                     rows_inserted: Optional[int] = None, error: Optional[str] = None) -> None:
+        self.conn.execute(
+            """
+            UPDATE filings SET parse_status = ?, engine = ?, page = ?, rows_inserted = ?, error = ?, parsed_at = ?
+            WHERE accession = ?
+            """,
+            (status, engine, page, rows_inserted, error, time.time(), accession),
+        )
+        self.conn.commit()
+
+    def record_ticker_progress(self, batch_id: str, ticker: str, status: str, summary: Optional[Dict] = None) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO batch_progress (batch_id, ticker, status, summary, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (batch_id, ticker, status, json.dumps(summary) if summary is not None else None, time.time()),
+        )
+        self.conn.commit()
+
+    def completed_tickers(self, batch_id: str) -> List[str]:
+        rows = self.conn.execute("SELECT ticker FROM batch_progress WHERE batch_id = ? AND status = ?", (batch_id, BATCH_DONE)).fetchall()
+        return [row[0] for row in rows]
+
+    # after the SQL database is cleared every stored filing has to be parsed and inserted again
+    def reset_parse_status(self) -> None:
+        self.conn.execute("UPDATE filings SET parse_status = ?, rows_inserted = NULL", (PARSE_PENDING,))
+        self.conn.execute("DELETE FROM batch_progress")
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+def connect_or_create_doc_store(path: str = DOC_STORE_DIR) -> DocumentStore:
     """
-    Ensure that the document storage directory exists.
+    Ensure that the document store (objects directory and manifest) exists and return it.
     """
-    os.makedirs(path, exist_ok=True)
-    print(f"Document store is ready at: {path}")
\ No newline at end of file
+    store = DocumentStore(path)
+    log.info(f"Document store is ready at: {path}")
+    return store
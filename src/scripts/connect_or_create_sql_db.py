@@ -1,32 +1,197 @@
 #src/scripts/connect_or_create_sql_db.py
+import logging
 import os
+import uuid
 import sqlite3
+from typing import Optional
+from urllib.request import pathname2url
 from src.utils.path_helpers import project_root
+from src.utils.balance_sheet_wide import WIDE_TABLE, create_wide_table
+from src.utils.sql_guard import GuardedConnection
 
-# returns a connection to the sqlite db and creates the schema if needed
-def connect_or_create_sql_db() -> sqlite3.Connection:
-    """
-    Connects to the SQLite database (or creates it if it doesn't exist),
-    and ensures that the balance_sheet table exists with a composite primary key.
-    """
-    db_path = os.path.join(project_root(), "data", "sqlite", "financials.db")
-    print(f"Connected to SQLite database at: {db_path}")
+log = logging.getLogger(__name__)
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+DB_PATH = os.path.join(project_root(), "data", "sqlite", "financials.db")
 
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS balance_sheet (
+# WAL lets readers keep querying while a loader writes; NORMAL sync is safe under WAL and much cheaper per commit
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA busy_timeout=5000",
+)
+
+# bump when the storage schema changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 2
+
+# v2 storage: repeated strings live in lookup tables, facts reference them by integer key,
+# and the balance_sheet view keeps the original flat shape for queries and the LLM prompt
+SCHEMA_V2 = (
+    "CREATE TABLE IF NOT EXISTS companies (id INTEGER PRIMARY KEY, ticker TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS statement_types (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS sections (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS labels (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+    """
+    CREATE TABLE IF NOT EXISTS balance_sheet_facts (
         uid TEXT PRIMARY KEY,
-        as_of_date TEXT NOT NULL,
-        company TEXT NOT NULL,
-        statement_type TEXT NOT NULL,
-        section TEXT,
-        label TEXT NOT NULL,
-        year TEXT NOT NULL,
+        as_of_date DATE NOT NULL CHECK (as_of_date = date(as_of_date)),
+        company_id INTEGER NOT NULL REFERENCES companies(id),
+        statement_type_id INTEGER NOT NULL REFERENCES statement_types(id),
+        section_id INTEGER REFERENCES sections(id),
+        label_id INTEGER NOT NULL REFERENCES labels(id),
+        year INTEGER NOT NULL,
         value REAL
     )
-    """)
+    """,
+    # covering indexes: label + date lookups through the view, with or without a company filter, never touch the table
+    "CREATE INDEX IF NOT EXISTS idx_facts_company_label_date ON balance_sheet_facts (company_id, label_id, as_of_date, value, statement_type_id, section_id)",
+    "CREATE INDEX IF NOT EXISTS idx_facts_label_date ON balance_sheet_facts (label_id, as_of_date, company_id, value, statement_type_id, section_id)",
+    """
+    CREATE VIEW IF NOT EXISTS balance_sheet AS
+    SELECT
+        f.uid AS uid,
+        f.as_of_date AS as_of_date,
+        c.ticker AS company,
+        t.name AS statement_type,
+        s.name AS section,
+        l.name AS label,
+        f.year AS year,
+        f.value AS value
+    FROM balance_sheet_facts f
+    JOIN companies c ON c.id = f.company_id
+    JOIN statement_types t ON t.id = f.statement_type_id
+    LEFT JOIN sections s ON s.id = f.section_id
+    JOIN labels l ON l.id = f.label_id
+    """,
+    # survives clear_sql_database on purpose: the data version must keep increasing across clears
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)",
+)
+
+# (lookup table, key column, flat balance_sheet column it encodes)
+LOOKUP_TABLES = (
+    ("companies", "ticker", "company"),
+    ("statement_types", "name", "statement_type"),
+    ("sections", "name", "section"),
+    ("labels", "name", "label"),
+)
+
+# every object the balance sheet storage owns, in the order clear_sql_database drops them
+SCHEMA_OBJECTS = (
+    ("table", WIDE_TABLE),
+    ("view", "balance_sheet"),
+    ("table", "balance_sheet_facts"),
+    ("table", "labels"),
+    ("table", "sections"),
+    ("table", "statement_types"),
+    ("table", "companies"),
+)
+
+def configure_connection(conn: sqlite3.Connection) -> sqlite3.Connection:
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+# every change to the stored facts bumps data_version, so anything cached against an older version is stale
+def bump_data_version(conn: sqlite3.Connection) -> int:
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+    conn.execute("INSERT INTO meta (key, value) VALUES ('data_version', 1) ON CONFLICT(key) DO UPDATE SET value = value + 1")
+    return conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()[0]
+
+# "<database id>:<data version>"; the random id keeps caches shared between databases from colliding
+def get_data_version(conn: sqlite3.Connection) -> str:
+    values = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('database_id', 'data_version')").fetchall())
+    return f"{values.get('database_id')}:{values.get('data_version', 0)}"
+
+# v1 rows the migration would lose; raised inside the schema transaction, so the rollback keeps the v1 table as it was
+class MigrationError(sqlite3.DatabaseError):
+    pass
+
+# v1 rows shown in the log when a migration is aborted
+MIGRATION_SAMPLE_ROWS = 20
+
+# v1 rows with no fact under their uid (a missing company, label or statement type, or an invalid date),
+# or sharing their uid with a different row, so only one of them could be kept
+MIGRATION_LOST_ROWS_SQL = f"""
+SELECT v.rowid, v.uid, v.company, v.statement_type, v.section, v.label, v.as_of_date, v.year, v.value
+FROM balance_sheet_v1 v
+WHERE NOT EXISTS (SELECT 1 FROM balance_sheet_facts f WHERE f.uid = v.uid)
+   OR v.uid IN (SELECT uid FROM (SELECT DISTINCT * FROM balance_sheet_v1) GROUP BY uid HAVING count(*) > 1)
+ORDER BY v.rowid
+LIMIT {MIGRATION_SAMPLE_ROWS}
+"""
+
+# moves a v1 flat balance_sheet table (text years, repeated strings, no indexes) into the v2 layout; every v1 row
+# has to arrive, otherwise the migration is aborted (rows repeated exactly are stored once)
+def _migrate_v1_to_v2(conn: sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE balance_sheet RENAME TO balance_sheet_v1")
+    expected = conn.execute("SELECT count(*) FROM (SELECT DISTINCT * FROM balance_sheet_v1)").fetchone()[0]
+    for statement in SCHEMA_V2:
+        conn.execute(statement)
+    for table, key_column, source_column in LOOKUP_TABLES:
+        conn.execute(f"INSERT OR IGNORE INTO {table} ({key_column}) SELECT DISTINCT {source_column} FROM balance_sheet_v1 WHERE {source_column} IS NOT NULL")
+    inserted = conn.execute("""
+    INSERT OR IGNORE INTO balance_sheet_facts (uid, as_of_date, company_id, statement_type_id, section_id, label_id, year, value)
+    SELECT v.uid, v.as_of_date, c.id, t.id, s.id, l.id, CAST(v.year AS INTEGER), v.value
+    FROM balance_sheet_v1 v
+    JOIN companies c ON c.ticker = v.company
+    JOIN statement_types t ON t.name = v.statement_type
+    LEFT JOIN sections s ON s.name = v.section
+    JOIN labels l ON l.name = v.label
+    """).rowcount
+    if inserted != expected:
+        lost = conn.execute(MIGRATION_LOST_ROWS_SQL).fetchall()
+        log.error(f"Migration would keep {inserted} of {expected} balance_sheet rows; first rows that cannot be migrated (rowid, uid, company, statement_type, section, label, as_of_date, year, value):")
+        for row in lost:
+            log.error(f"  {row}")
+        raise MigrationError(f"balance_sheet migration aborted: only {inserted} of {expected} rows could be moved to schema version 2. The table was left unchanged; fix or remove the logged rows and reconnect.")
+    conn.execute("DROP TABLE balance_sheet_v1")
+
+# creates the balance sheet storage if it is missing (e.g. right after clear_sql_database) and upgrades
+# older layouts; runs inside the caller's transaction
+def create_balance_sheet_schema(conn: sqlite3.Connection) -> None:
+    legacy = conn.execute("SELECT type FROM sqlite_master WHERE name = 'balance_sheet'").fetchone()
+    if legacy and legacy[0] == "table":
+        log.info("Migrating balance_sheet table to schema version 2...")
+        _migrate_v1_to_v2(conn)
+    else:
+        for statement in SCHEMA_V2:
+            conn.execute(statement)
+
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('database_id', ?)", (uuid.uuid4().hex,))
+    if get_schema_version(conn) != SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    # a rebuilt wide table can answer differently than the one cached results were computed from
+    if create_wide_table(conn):
+        bump_data_version(conn)
+
+# read-only connection (mode=ro URI) for query workers; it cannot write even if a query slips past the checks
+def connect_read_only(db_path: Optional[str] = None) -> sqlite3.Connection:
+    db_path = os.path.abspath(db_path or DB_PATH)
+    conn = sqlite3.connect(f"file:{pathname2url(db_path)}?mode=ro", uri=True, check_same_thread=False, factory=GuardedConnection)
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA cache_size=-16384")
+    return conn
+
+# returns a connection to the sqlite db and creates the schema if needed
+def connect_or_create_sql_db(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Connects to the SQLite database (or creates it if it doesn't exist),
+    and ensures the balance sheet schema exists at the current version.
+    """
+    db_path = db_path or DB_PATH
+    log.info(f"Connected to SQLite database at: {db_path}")
 
-    conn.commit()
-    return conn
\ No newline at end of file
+    conn = configure_connection(sqlite3.connect(db_path, factory=GuardedConnection))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        create_balance_sheet_schema(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return conn
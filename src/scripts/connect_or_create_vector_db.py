@@ -1,2 +1,246 @@
-#To Do:
-# #implement logic for connecting or creating the vector db based on condition and existence of db
\ No newline at end of file
+#src/scripts/connect_or_create_vector_db.py
+import logging
+import os
+import time
+import sqlite3
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.utils.path_helpers import project_root
+
+log = logging.getLogger(__name__)
+
+VECTOR_DB_DIR = os.path.join(project_root(), "data", "vectors")
+
+# below this many chunks a brute-force scan is already fast; above it search goes through the cluster index
+CLUSTER_MIN_VECTORS = 50_000
+# the cluster index is rebuilt once the corpus has grown this much since the last build
+CLUSTER_REBUILD_GROWTH = 2.0
+# rows scored per matrix product, which bounds the memory a search needs regardless of corpus size
+SEARCH_BLOCK_ROWS = 65_536
+
+# chunk embeddings live in a float32 memory-mapped matrix (embeddings.f32, one L2-normalized row per chunk);
+# chunk text, per-filing bookkeeping and the optional coarse cluster index live next to it
+class VectorStore:
+    def __init__(self, root: str = VECTOR_DB_DIR, dim: int = 512, embedder: str = "hashing"):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.matrix_path = os.path.join(root, "embeddings.f32")
+        self.assignments_path = os.path.join(root, "assignments.i32")
+        self.centroids_path = os.path.join(root, "centroids.npy")
+
+        self.conn = sqlite3.connect(os.path.join(root, "chunks.db"))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS chunks (
+            id INTEGER PRIMARY KEY,
+            accession TEXT NOT NULL,
+            page INTEGER,
+            text TEXT NOT NULL
+        )
+        """)
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS documents (
+            accession TEXT PRIMARY KEY,
+            ticker TEXT,
+            first_chunk INTEGER NOT NULL,
+            n_chunks INTEGER NOT NULL,
+            embedded_at REAL
+        )
+        """)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+        self.conn.commit()
+
+        meta = self._meta()
+        if "dim" not in meta:
+            self._set_meta(dim=dim, embedder=embedder, count=0, clustered_count=0)
+            meta = self._meta()
+        if meta["dim"] != dim or meta["embedder"] != embedder:
+            raise ValueError(f"Vector store at {root} holds {meta['embedder']} embeddings of dim {meta['dim']}; clear it to switch embedders.")
+        self.dim = dim
+        self.embedder = embedder
+        self.count = meta["count"]
+        self._matrix: Optional[np.memmap] = None
+        self._assignments: Optional[np.memmap] = None
+        self._centroids: Optional[np.ndarray] = np.load(self.centroids_path) if os.path.exists(self.centroids_path) else None
+        # rows sorted by cluster plus each cluster's [start, end) offsets; rebuilt lazily after writes
+        self._inverted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def _meta(self) -> Dict:
+        return dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def _set_meta(self, **values) -> None:
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", values.items())
+        self.conn.commit()
+
+    # capacity grows by doubling so appends stay amortized O(1) without rewriting the matrix
+    def _ensure_capacity(self, rows: int) -> None:
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self.matrix_path) if os.path.exists(self.matrix_path) else 0
+        capacity = size // row_bytes
+        if rows <= capacity and self._matrix is not None:
+            return
+        if rows > capacity:
+            new_capacity = max(rows, 2 * capacity, 1024)
+            for path, width in ((self.matrix_path, row_bytes), (self.assignments_path, 4)):
+                with open(path, "ab") as f:
+                    f.truncate(new_capacity * width)
+            capacity = new_capacity
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._assignments = np.memmap(self.assignments_path, dtype=np.int32, mode="r+", shape=(capacity,))
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self.count == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+        self._ensure_capacity(self.count)
+        return self._matrix[:self.count]
+
+    def has_document(self, accession: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM documents WHERE accession = ?", (accession,)).fetchone() is not None
+
+    # appends one filing's chunks; vectors are written and flushed before the rows that make them visible are committed
+    def add_document(self, accession: str, ticker: str, chunks: Sequence[Tuple[Optional[int], str]], vectors: np.ndarray) -> None:
+        if self.has_document(accession):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        start = self.count
+        end = start + len(chunks)
+        self._ensure_capacity(end)
+        self._matrix[start:end] = vectors
+        self._matrix.flush()
+        if self._centroids is not None:
+            self._assignments[start:end] = self._nearest_centroids(vectors)
+            self._assignments.flush()
+
+        self.conn.executemany(
+            "INSERT INTO chunks (id, accession, page, text) VALUES (?, ?, ?, ?)",
+            ((start + i, accession, page, text) for i, (page, text) in enumerate(chunks)),
+        )
+        self.conn.execute(
+            "INSERT INTO documents (accession, ticker, first_chunk, n_chunks, embedded_at) VALUES (?, ?, ?, ?, ?)",
+            (accession, ticker, start, len(chunks), time.time()),
+        )
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('count', ?)", (end,))
+        self.conn.commit()
+        self.count = end
+        self._inverted = None
+
+    def _nearest_centroids(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    # spherical k-means on a sample, then every row is assigned to its nearest centroid in blocks
+    def build_cluster_index(self, n_clusters: Optional[int] = None, iterations: int = 10, seed: int = 0) -> None:
+        vectors = self.vectors
+        if len(vectors) == 0:
+            return
+        n_clusters = min(n_clusters or int(np.sqrt(len(vectors))), len(vectors))
+        rng = np.random.default_rng(seed)
+        # ~64 points per centroid is plenty to place it
+        sample_size = min(64 * n_clusters, len(vectors))
+        sample = vectors[np.sort(rng.choice(len(vectors), size=sample_size, replace=False))]
+        centroids = sample[rng.choice(len(sample), size=n_clusters, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            # per-cluster sums via one sort + reduceat instead of a scatter-add per row
+            order = np.argsort(labels, kind="stable")
+            present, starts = np.unique(labels[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # empty clusters keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids).astype(np.float32)
+
+        self._centroids = centroids
+        self._inverted = None
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            block = vectors[start:start + SEARCH_BLOCK_ROWS]
+            self._assignments[start:start + len(block)] = self._nearest_centroids(block)
+        self._assignments.flush()
+        np.save(self.centroids_path, centroids)
+        self._set_meta(clustered_count=len(vectors))
+        log.info(f"Built vector cluster index: {n_clusters} clusters over {len(vectors)} chunks.")
+
+    # builds the cluster index once brute force gets expensive and rebuilds it when the corpus has outgrown it
+    def maybe_build_cluster_index(self) -> None:
+        clustered_count = self._meta().get("clustered_count", 0)
+        if self.count >= CLUSTER_MIN_VECTORS and (self._centroids is None or self.count >= CLUSTER_REBUILD_GROWTH * clustered_count):
+            self.build_cluster_index()
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._inverted is None:
+            assignments = self._assignments[:self.count]
+            order = np.argsort(assignments, kind="stable")
+            offsets = np.searchsorted(assignments[order], np.arange(len(self._centroids) + 1))
+            self._inverted = (order, offsets)
+        return self._inverted
+
+    # exact top-k of the given rows (or all rows) for a batch of queries; returns (ids, scores), each (queries, k)
+    def _scan(self, queries: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        total = self.count if rows is None else len(rows)
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        vectors = self.vectors
+        for start in range(0, total, SEARCH_BLOCK_ROWS):
+            if rows is None:
+                ids = np.arange(start, min(start + SEARCH_BLOCK_ROWS, total))
+                block = vectors[start:start + len(ids)]
+            else:
+                ids = rows[start:start + SEARCH_BLOCK_ROWS]
+                block = vectors[ids]
+            scores = queries @ block.T
+            ids = np.broadcast_to(ids, scores.shape)
+            # merge this block's candidates with the running best and keep k
+            scores = np.concatenate([best_scores, scores], axis=1)
+            ids = np.concatenate([best_ids, ids], axis=1)
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                ids = np.take_along_axis(ids, keep, axis=1)
+            best_scores, best_ids = scores, ids
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_ids, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    # batched top-k cosine search; with a cluster index only the rows in the n_probe closest clusters are scored
+    def search(self, queries: np.ndarray, k: int = 5, n_probe: int = 8) -> List[List[Tuple[int, float]]]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.count == 0:
+            return [[] for _ in queries]
+
+        if self._centroids is None:
+            ids, scores = self._scan(queries, k)
+        else:
+            self._ensure_capacity(self.count)
+            probes = np.argsort(-(queries @ self._centroids.T), axis=1)[:, :n_probe]
+            order, offsets = self._inverted_lists()
+            results = []
+            for query, probe in zip(queries, probes):
+                rows = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe]))
+                results.append(self._scan(query[None, :], k, rows))
+            return [list(zip(ids[0].tolist(), scores[0].tolist())) for ids, scores in results]
+        return [list(zip(row_ids.tolist(), row_scores.tolist())) for row_ids, row_scores in zip(ids, scores)]
+
+    def get_chunks(self, ids: Sequence[int]) -> Dict[int, Dict]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self.conn.execute(
+            f"SELECT c.id, c.accession, c.page, c.text, d.ticker FROM chunks c JOIN documents d USING (accession) WHERE c.id IN ({placeholders})",
+            list(ids),
+        ).fetchall()
+        return {row[0]: {"accession": row[1], "page": row[2], "text": row[3], "ticker": row[4]} for row in rows}
+
+    def close(self) -> None:
+        self._matrix = None
+        self._assignments = None
+        self.conn.close()
+
+def connect_or_create_vector_db(path: str = VECTOR_DB_DIR, dim: int = 512, embedder: str = "hashing") -> VectorStore:
+    """
+    Ensure that the vector store (embedding matrix and chunk catalog) exists and return it.
+    """
+    store = VectorStore(path, dim, embedder)
+    log.info(f"Vector store is ready at: {path} ({store.count} chunks)")
+    return store
@@ -1,67 +1,146 @@
 
+import logging
 import sqlite3
 import os
-import pandas as pd
+import json
+import time
 import hashlib
-from dotenv import load_dotenv
-from openai import OpenAI
-from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, NamedTuple, Optional
 
 from src.utils.path_helpers import project_root
-from src.utils.extract_and_normalize import parse_balance_sheet_from_pdf, normalize_balance_sheet, extract_as_of_date_from_filename
-from src.scripts.connect_or_create_sql_db import connect_or_create_sql_db
-from src.scripts.clear_sql_db import clear_sql_database
-from src.scripts.connect_or_create_document_db import connect_or_create_doc_store
-from src.scripts.clear_document_db import clear_doc_store
+from src.utils.balance_sheet_wide import describe_wide_table, refresh_wide_table
+from src.utils.query_cache import PersistentCache, hash_parts, normalize_question, normalize_sql
+from src.utils.result_compaction import compact_results
+from src.utils.sql_guard import MAX_RESULT_ROWS, QUERY_TIME_BUDGET_SECONDS, QueryRejected, QueryResult, run_guarded_query
+from src.utils.telemetry import TELEMETRY, incr, span, traced
+from src.scripts.connect_or_create_sql_db import LOOKUP_TABLES, bump_data_version, create_balance_sheet_schema, get_data_version
 
-load_dotenv()
+# pandas is only needed by the load path; querying never imports it
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
 
 DB_PATH = os.path.join(project_root(), "data", "sqlite", "financials.db")
-print("DB path used:", DB_PATH)
 
-client = OpenAI()
+# built on first use, so importing this module, or answering from the caches, never loads the openai package or .env
+client = None
+
+def get_client():
+    global client
+    if client is None:
+        from dotenv import load_dotenv
+        from openai import OpenAI
+        load_dotenv()
+        client = OpenAI()
+    return client
+
+UID_COLUMNS = ["as_of_date", "company", "statement_type", "section", "label", "year"]
 
 # generate a unique ID based on all the identifying columns
-def generate_uid(row: pd.Series) -> str:
+def generate_uid(row: "pd.Series") -> str:
     uid_str = f"{row['as_of_date']}_{row['company']}_{row['statement_type']}_{row['section']}_{row['label']}_{row['year']}"
     return hashlib.md5(uid_str.encode()).hexdigest()
 
-# insert rows into the balance_sheet table, skipping any that already exist
-def insert_balance_sheet(df: pd.DataFrame, conn: sqlite3.Connection) -> None:
+# same keys as generate_uid, built column-wise and hashed in one pass instead of a row-wise apply
+def generate_uids(df: "pd.DataFrame") -> "pd.Series":
+    import pandas as pd
+
+    keys = df[UID_COLUMNS[0]].astype(str)
+    for col in UID_COLUMNS[1:]:
+        keys = keys + "_" + df[col].astype(str)
+    md5 = hashlib.md5
+    return pd.Series([md5(key.encode()).hexdigest() for key in keys], index=df.index, dtype=object)
+
+BALANCE_SHEET_COLUMNS = ["uid", "as_of_date", "company", "statement_type", "section", "label", "year", "value"]
+
+# lookup values are interned first; each fact row then resolves its keys through the unique name indexes
+INSERT_FACT_SQL = """
+INSERT OR IGNORE INTO balance_sheet_facts (uid, as_of_date, company_id, statement_type_id, section_id, label_id, year, value)
+VALUES (
+    ?, ?,
+    (SELECT id FROM companies WHERE ticker = ?),
+    (SELECT id FROM statement_types WHERE name = ?),
+    (SELECT id FROM sections WHERE name = ?),
+    (SELECT id FROM labels WHERE name = ?),
+    ?, ?
+)
+"""
+
+# outcome of a bulk load; per_statement holds rows inserted for each input frame, in order
+class LoadReport(NamedTuple):
+    inserted: int
+    skipped: int
+    per_statement: List[int]
+
+# loads many normalized statements in one explicit transaction; rows whose uid already exists are skipped by INSERT OR IGNORE.
+# inside a transaction the caller already opened, the load is a savepoint instead: a failure only undoes the load,
+# and the caller's commit (or rollback) decides whether the rows are kept
+@traced("db.insert")
+def bulk_insert_balance_sheets(frames: Iterable["pd.DataFrame"], conn: sqlite3.Connection) -> LoadReport:
+    frames = list(frames)
+
+    per_statement = []
+    total_rows = 0
+    changed_companies = set()
+    nested = conn.in_transaction
+    conn.execute("SAVEPOINT bulk_insert" if nested else "BEGIN IMMEDIATE")
+    try:
+        create_balance_sheet_schema(conn)
+        for df in frames:
+            if df is None or df.empty:
+                per_statement.append(0)
+                continue
+
+            rows = df.assign(uid=generate_uids(df))[BALANCE_SHEET_COLUMNS]
+            # plain python objects with NULLs for missing values, which is what sqlite3 binds
+            rows = rows.astype(object).where(rows.notna(), None)
+
+            for table, key_column, source_column in LOOKUP_TABLES:
+                names = df[source_column].dropna().unique()
+                conn.executemany(f"INSERT OR IGNORE INTO {table} ({key_column}) VALUES (?)", ((str(name),) for name in names))
+
+            before = conn.total_changes
+            conn.executemany(INSERT_FACT_SQL, rows.itertuples(index=False, name=None))
+            per_statement.append(conn.total_changes - before)
+            total_rows += len(rows)
+            if per_statement[-1]:
+                changed_companies.update(df["company"].dropna().astype(str).unique())
+        if sum(per_statement):
+            # the wide table commits together with the facts it is derived from
+            with span("db.refresh_wide_table"):
+                refresh_wide_table(conn, changed_companies)
+            bump_data_version(conn)
+        if nested:
+            conn.execute("RELEASE bulk_insert")
+        else:
+            conn.commit()
+    except Exception:
+        if nested:
+            conn.execute("ROLLBACK TO bulk_insert")
+            conn.execute("RELEASE bulk_insert")
+        else:
+            conn.rollback()
+        raise
+
+    inserted = sum(per_statement)
+    incr("db.rows_inserted", inserted)
+    incr("db.rows_skipped", total_rows - inserted)
+    return LoadReport(inserted, total_rows - inserted, per_statement)
+
+# insert rows into the balance_sheet table, skipping any that already exist; returns rows inserted, or None on failure
+def insert_balance_sheet(df: "pd.DataFrame", conn: sqlite3.Connection) -> Optional[int]:
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS balance_sheet (
-                uid TEXT PRIMARY KEY,
-                as_of_date TEXT,
-                company TEXT,
-                statement_type TEXT,
-                section TEXT,
-                label TEXT,
-                year TEXT,
-                value REAL
-            );
-        """)
-        conn.commit()
-
-        df["uid"] = df.apply(generate_uid, axis=1)
-
-        placeholders = ','.join('?' for _ in df["uid"])
-        existing_uids = set()
-        if placeholders:
-            cursor.execute(f"SELECT uid FROM balance_sheet WHERE uid IN ({placeholders})", tuple(df["uid"]))
-            existing_uids = {row[0] for row in cursor.fetchall()}
-
-        df_filtered = df[~df["uid"].isin(existing_uids)]
-        if df_filtered.empty:
-            print("No new rows to insert (all duplicates).")
-            return
-
-        df_filtered.to_sql("balance_sheet", conn, if_exists="append", index=False)
-        print(f"Inserted {len(df_filtered)} new rows into 'balance_sheet' table.")
+        report = bulk_insert_balance_sheets([df], conn)
+        if report.inserted == 0:
+            log.info("No new rows to insert (all duplicates).")
+        else:
+            log.info(f"Inserted {report.inserted} new rows into 'balance_sheet' table ({report.skipped} duplicates skipped).")
+        return report.inserted
 
     except Exception as e:
-        print(f"Failed to insert balance sheet data: {e}")
+        log.warning(f"Failed to insert balance sheet data: {e}")
+        return None
 
 # removes markdown formatting from generated SQL
 def clean_generated_sql(sql: str) -> str:
@@ -69,9 +148,23 @@ def clean_generated_sql(sql: str) -> str:
     lines = [line for line in lines if not line.strip().startswith("```")]
     return "\n".join(lines).strip()
 
-# uses the OpenAI client to generate SQL from a user question and schema
-def generate_sql_query(schema_description: str, user_question: str) -> str:
-    few_shot_examples = """
+MODEL = "gpt-4o"
+
+# schema description given to the model; shared by the REPL and the API
+BALANCE_SHEET_SCHEMA = """
+    Table: balance_sheet(
+        uid TEXT PRIMARY KEY,
+        as_of_date TEXT,
+        company TEXT,
+        statement_type TEXT,
+        section TEXT,
+        label TEXT,
+        year INTEGER,
+        value REAL
+    )
+""" + describe_wide_table()
+
+FEW_SHOT_EXAMPLES = """
 Example rows in the table:
 ('2020-09-26', 'AAPL', 'balance_sheet', 'Current liabilities', 'Total current liabilities', 'current_year', 105392.0, 'uid1')
 ('2021-09-25', 'MSFT', 'balance_sheet', 'Non-current liabilities', 'Total liabilities', 'current_year', 120000.0, 'uid2')
@@ -95,95 +188,241 @@ Q: How much was retained earnings for MSFT in 2021?
 A: SELECT value FROM balance_sheet WHERE company = 'MSFT' AND label = 'Retained earnings' AND as_of_date LIKE '2021%';
 
 Q: What companies had more than 100000 in total liabilities in 2024?
-A: SELECT DISTINCT company FROM balance_sheet WHERE label = 'Total liabilities' AND CAST(substr(as_of_date, 1, 4) AS INTEGER) = 2024 AND value > 100000;
+A: SELECT company FROM balance_sheet_wide WHERE year = 2024 AND total_liabilities > 100000;
+
+Q: How did AAPL's total assets change year over year?
+A: SELECT year, total_assets, total_assets_yoy, total_assets_yoy_pct FROM balance_sheet_wide WHERE company = 'AAPL' ORDER BY year;
+
+Q: Compare the retained earnings of MSFT and GOOG in 2023.
+A: SELECT company, retained_earnings FROM balance_sheet_wide WHERE company IN ('MSFT', 'GOOG') AND year = 2023;
+
+Prefer balance_sheet_wide whenever the question is about one of its columns: trends, year-over-year changes and
+comparisons across companies or years are a single indexed lookup there. Use balance_sheet for any other line item.
     """
 
-    messages = [
+# builds the NL -> SQL chat prompt; its text is part of the SQL cache key
+def build_sql_messages(schema_description: str, user_question: str) -> List[dict]:
+    return [
         {
             "role": "system",
             "content": (
                 "You are a SQL assistant. Given a schema, a few example rows from a table, and a user question, output a single SQLite-compatible SQL query. "
                 "Never include anything other than the SQL query."
-                f"\n\nSchema:\n{schema_description}\n\n{few_shot_examples}"
+                f"\n\nSchema:\n{schema_description}\n\n{FEW_SHOT_EXAMPLES}"
             )
         },
         {"role": "user", "content": user_question}
     ]
 
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=messages,
-        temperature=0
-    )
+# token counters for one completion; usage is None when the client or stream doesn't report it
+def record_llm_usage(usage) -> None:
+    incr("llm.requests")
+    if usage is not None:
+        incr("llm.prompt_tokens", usage.prompt_tokens)
+        incr("llm.completion_tokens", usage.completion_tokens)
+
+# uses the OpenAI client to generate SQL from a user question and schema
+def generate_sql_query(schema_description: str, user_question: str) -> str:
+    with span("llm.generate_sql"):
+        response = get_client().chat.completions.create(
+            model=MODEL,
+            messages=build_sql_messages(schema_description, user_question),
+            temperature=0
+        )
+    record_llm_usage(getattr(response, "usage", None))
     sql_raw = response.choices[0].message.content.strip()
     return sql_raw
 
-# makes sure the query is safe, then executes it
-def execute_sql_query(query: str, conn: sqlite3.Connection) -> list:
+# bump when the layout of a cached query result changes; older entries are simply never looked up again
+RESULT_CACHE_VERSION = 2
+
+# namespace -> (max entries, ttl seconds); results and answers are keyed on the data version, so they only need an LRU bound
+CACHE_SETTINGS = {
+    "nl_to_sql": (2000, 30 * 24 * 3600),
+    "sql_results": (5000, 30 * 24 * 3600),
+    "answers": (2000, 30 * 24 * 3600),
+}
+_caches: Dict[str, PersistentCache] = {}
+
+def get_cache(namespace: str) -> PersistentCache:
+    if namespace not in _caches:
+        max_entries, ttl_seconds = CACHE_SETTINGS[namespace]
+        _caches[namespace] = PersistentCache(namespace, max_entries=max_entries, ttl_seconds=ttl_seconds)
+    return _caches[namespace]
+
+def get_sql_cache() -> PersistentCache:
+    return get_cache("nl_to_sql")
+
+def get_result_cache() -> PersistentCache:
+    return get_cache("sql_results")
+
+def get_answer_cache() -> PersistentCache:
+    return get_cache("answers")
+
+# cache key: the normalized question plus a hash of everything else that shapes the generated SQL
+def sql_cache_key(schema_description: str, user_question: str) -> str:
+    prompt_hash = hash_parts(MODEL, schema_description, FEW_SHOT_EXAMPLES)
+    return hash_parts(prompt_hash, normalize_question(user_question))
+
+# makes sure the query is a read, then runs it under the guard: plan check, read-only authorizer,
+# time budget and row cap (see src/utils/sql_guard.py)
+def execute_sql_query(query: str, conn: sqlite3.Connection, time_budget: float = QUERY_TIME_BUDGET_SECONDS,
+                      max_rows: int = MAX_RESULT_ROWS) -> QueryResult:
     lowered = query.lower().strip()
     if not (lowered.startswith("select") or lowered.startswith("with")):
-        raise ValueError(f"Only SELECT or WITH queries are allowed for safety. Generated query: {query}")
-
-    forbidden = ("insert", "update", "delete", "drop", "alter", "create", "replace")
-    if any(word in lowered for word in forbidden):
-        raise ValueError("Query contains potentially unsafe operations.")
-
-    print("Executing SQL:", query)
-    cursor = conn.cursor()
-    cursor.execute(query)
-    return cursor.fetchall()
-
-# runs a full pipeline from NL -> SQL -> DB result -> final answer
-def answer_question_from_db(schema: str, question: str, conn: sqlite3.Connection) -> str:
-    sql_query = generate_sql_query(schema, question)
-    cleaned_query = clean_generated_sql(sql_query)
-    results = execute_sql_query(cleaned_query, conn)
-
+        raise QueryRejected(f"Only SELECT or WITH queries are allowed for safety. Generated query: {query}")
+
+    log.info(f"Executing SQL: {query}")
+    with span("sql.execute"):
+        result = run_guarded_query(conn, query, time_budget, max_rows)
+    incr("sql.rows_returned", len(result.rows))
+    if result.truncated:
+        log.warning(f"Result cut off at {max_rows} rows.")
+    return result
+
+# same as execute_sql_query, but reuses rows from an earlier run of the same SQL against the same data version
+def execute_sql_query_cached(query: str, conn: sqlite3.Connection, result_cache: Optional[PersistentCache] = None,
+                             data_version: Optional[str] = None) -> QueryResult:
+    result_cache = result_cache or get_result_cache()
+    data_version = data_version or get_data_version(conn)
+    cache_key = hash_parts(str(RESULT_CACHE_VERSION), data_version, normalize_sql(query), str(MAX_RESULT_ROWS))
+
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        log.info("Result cache hit.")
+        cached = json.loads(cached)
+        return QueryResult([tuple(row) for row in cached["rows"]], cached["truncated"], tuple(cached["columns"]))
+
+    result = execute_sql_query(query, conn)
+    result_cache.put(cache_key, json.dumps(result._asdict()))
+    return result
+
+# single-column results up to this many rows are answered by format_direct_answer instead of the LLM
+DIRECT_ANSWER_MAX_ROWS = 10
+
+def format_value(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"{value:,}"
+    return "NULL" if value is None else str(value)
+
+# deterministic answer for a scalar or a short single-column result; None means the LLM should phrase it
+def format_direct_answer(results: list) -> Optional[str]:
+    if not results:
+        return "No matching data was found in the database."
+    if any(len(row) != 1 for row in results) or len(results) > DIRECT_ANSWER_MAX_ROWS:
+        return None
+    values = [format_value(row[0]) for row in results]
+    return values[0] if len(values) == 1 else ", ".join(values)
+
+# the results go in as a compact table, or a summary once they outgrow the token budget, so prompt size stays flat
+def build_answer_messages(question: str, query: str, result: QueryResult) -> List[dict]:
+    with span("answer.compact_results"):
+        results = compact_results(result.columns, result.rows, result.truncated)
     answer_prompt = (
         f"Question: {question}\n"
-        f"SQL: {cleaned_query}\n"
-        f"Results: {results}\n"
+        f"SQL: {query}\n"
+        f"Results:\n{results}\n"
         "Provide a concise answer using this data."
     )
-
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": answer_prompt}],
-        temperature=0
-    )
-
-    return response.choices[0].message.content.strip()
+    return [{"role": "user", "content": answer_prompt}]
+
+# yields answer text as the model produces it; the last chunk of the stream carries the token usage
+def stream_llm_answer(messages: List[dict]) -> Iterator[str]:
+    usage = None
+    with span("llm.answer"):
+        start = time.perf_counter()
+        stream = get_client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=0,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if start is not None:
+                    TELEMETRY.record_span("llm.answer_first_chunk", time.perf_counter() - start)
+                    start = None
+                yield chunk.choices[0].delta.content
+    record_llm_usage(usage)
+
+# runs a full pipeline from NL -> SQL -> DB result -> final answer, yielding the answer in chunks as soon as they exist
+def stream_answer_from_db(schema: str, question: str, conn: sqlite3.Connection, sql_cache: Optional[PersistentCache] = None,
+                          result_cache: Optional[PersistentCache] = None, answer_cache: Optional[PersistentCache] = None) -> Iterator[str]:
+    sql_cache = sql_cache or get_sql_cache()
+    answer_cache = answer_cache or get_answer_cache()
+    cache_key = sql_cache_key(schema, question)
+    data_version = get_data_version(conn)
+
+    # the same question against unchanged data gets the same answer, without touching the db or the LLM
+    answer_key = hash_parts(cache_key, data_version)
+    cached_answer = answer_cache.get(answer_key)
+    if cached_answer is not None:
+        log.info("Answer cache hit.")
+        yield cached_answer
+        return
+
+    cleaned_query = sql_cache.get(cache_key)
+    if cleaned_query is None:
+        sql_query = generate_sql_query(schema, question)
+        cleaned_query = clean_generated_sql(sql_query)
+        result = execute_sql_query_cached(cleaned_query, conn, result_cache, data_version)
+        # only SQL that passed the safety checks and ran is worth reusing
+        sql_cache.put(cache_key, cleaned_query)
+    else:
+        log.info("SQL cache hit.")
+        result = execute_sql_query_cached(cleaned_query, conn, result_cache, data_version)
+
+    # scalars and short lists need no second LLM round trip
+    answer = format_direct_answer(result.rows)
+    if answer is not None:
+        incr("answers.direct")
+        answer_cache.put(answer_key, answer)
+        yield answer
+        return
+
+    incr("answers.llm")
+    chunks = []
+    for chunk in stream_llm_answer(build_answer_messages(question, cleaned_query, result)):
+        chunks.append(chunk)
+        yield chunk
+    answer_cache.put(answer_key, "".join(chunks).strip())
+
+# same pipeline as stream_answer_from_db, returning the whole answer at once
+def answer_question_from_db(schema: str, question: str, conn: sqlite3.Connection, sql_cache: Optional[PersistentCache] = None,
+                            result_cache: Optional[PersistentCache] = None, answer_cache: Optional[PersistentCache] = None) -> str:
+    return "".join(stream_answer_from_db(schema, question, conn, sql_cache, result_cache, answer_cache)).strip()
 
 # REPL for asking the LLM balance sheet questions
 def run_interactive_research_assistant(conn: sqlite3.Connection) -> None:
-    schema = """
-    Table: balance_sheet(
-        uid TEXT PRIMARY KEY,
-        as_of_date TEXT,
-        company TEXT,
-        statement_type TEXT,
-        section TEXT,
-        label TEXT,
-        year TEXT,
-        value REAL
-    )
-    """
+    schema = BALANCE_SHEET_SCHEMA
     print("Welcome to the financial research assistant.\n")
     while True:
         user_input = input("Ask a question about the balance sheet (or type 'exit' to quit): ")
         if user_input.lower() in ("exit", "quit"):
+            for namespace in CACHE_SETTINGS:
+                print(f"{namespace} cache: {get_cache(namespace).stats()}")
             print("Goodbye!")
             break
 
         try:
-            answer = answer_question_from_db(schema, user_input, conn)
-            print("\nAnswer:", answer, "\n")
+            # the header waits for the first chunk so SQL logging doesn't land in the middle of the answer
+            for i, chunk in enumerate(stream_answer_from_db(schema, user_input, conn)):
+                print("\nAnswer: " + chunk if i == 0 else chunk, end="", flush=True)
+            print("\n")
         except Exception as e:
             print("\nError:", str(e), "\n")
 
 
 
 if __name__ == "__main__":
+    from src.utils.extract_and_normalize import parse_balance_sheet_from_pdf, normalize_balance_sheet, extract_as_of_date_from_filename
+    from src.scripts.connect_or_create_sql_db import connect_or_create_sql_db
+    from src.scripts.clear_sql_db import clear_sql_database
+
     """
     # for testing with aapl files downloaded
     conn = connect_or_create_sql_db()
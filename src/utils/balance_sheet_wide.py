@@ -0,0 +1,148 @@
+#src/utils/balance_sheet_wide.py
+import re
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+WIDE_TABLE = "balance_sheet_wide"
+# bump when the canonical columns or how they are derived change; the table is rebuilt from the facts
+WIDE_TABLE_VERSION = 1
+
+# column -> label spellings it is built from, most preferred first; spellings are compared after normalize_label
+CANONICAL_LABELS = {
+    "cash_and_equivalents": ("cash and cash equivalents",),
+    "marketable_securities": ("marketable securities", "short-term investments"),
+    "accounts_receivable": ("accounts receivable, net", "accounts receivable"),
+    "inventory": ("inventory", "inventories"),
+    "total_current_assets": ("total current assets",),
+    "property_and_equipment": ("property and equipment, net", "property, plant and equipment, net", "property, plant, and equipment, net"),
+    "goodwill": ("goodwill",),
+    "total_assets": ("total assets",),
+    "accounts_payable": ("accounts payable",),
+    "deferred_revenue": ("deferred revenue",),
+    "total_current_liabilities": ("total current liabilities",),
+    "long_term_debt": ("long-term debt",),
+    "total_liabilities": ("total liabilities",),
+    "retained_earnings": ("retained earnings", "retained earnings (accumulated deficit)"),
+    "total_stockholders_equity": ("total stockholders' equity", "total shareholders' equity", "total equity"),
+    "total_liabilities_and_equity": ("total liabilities and stockholders' equity", "total liabilities and shareholders' equity", "total liabilities and equity"),
+}
+
+WIDE_COLUMNS = [
+    column
+    for label_column in CANONICAL_LABELS
+    for column in (label_column, f"{label_column}_yoy", f"{label_column}_yoy_pct")
+]
+
+# (column, declared type) of the key columns; the DDL and the prompt description are both built from it
+WIDE_KEY_COLUMNS = (("company", "TEXT"), ("year", "INTEGER"), ("as_of_date", "DATE"))
+
+WIDE_TABLE_DDL = (
+    f"""
+    CREATE TABLE IF NOT EXISTS {WIDE_TABLE} (
+        {", ".join(f"{column} {declared} NOT NULL" for column, declared in WIDE_KEY_COLUMNS)},
+        {", ".join(f"{column} REAL" for column in WIDE_COLUMNS)},
+        PRIMARY KEY (company, year)
+    )
+    """,
+    # cross-company comparisons for one year are the other common access path
+    f"CREATE INDEX IF NOT EXISTS idx_wide_year ON {WIDE_TABLE} (year, company)",
+)
+
+# companies refreshed per statement, well under sqlite's bound parameter limit
+REFRESH_BATCH = 500
+
+# lowercase, straight apostrophes, single spaces and no trailing colon, so "Total stockholders’ equity:" matches
+def normalize_label(label: str) -> str:
+    return re.sub(r"\s+", " ", label.lower().replace("’", "'")).strip().rstrip(":").strip()
+
+# canonical column -> label ids, in preference order, from the labels the database has actually seen
+def canonical_label_ids(conn: sqlite3.Connection) -> Dict[str, List[int]]:
+    ids_by_label: Dict[str, List[int]] = {}
+    for label_id, name in conn.execute("SELECT id, name FROM labels"):
+        ids_by_label.setdefault(normalize_label(name), []).append(label_id)
+    return {
+        column: [label_id for spelling in spellings for label_id in ids_by_label.get(spelling, [])]
+        for column, spellings in CANONICAL_LABELS.items()
+    }
+
+# one pass over the affected companies' canonical facts through the (company, label) index: pivoted per balance sheet,
+# the latest balance sheet of each fiscal year kept, and the year before it read with LAG rather than a self join
+def _refresh_sql(label_ids: Dict[str, List[int]], n_companies: int) -> str:
+    pivots = []
+    previous = []
+    deltas = []
+    for column, ids in label_ids.items():
+        # the first spelling a filing reports wins, so "Total stockholders' equity" beats "Total equity"
+        candidates = [f"MAX(CASE WHEN f.label_id = {label_id} THEN f.value END)" for label_id in ids]
+        value = "NULL" if not candidates else candidates[0] if len(candidates) == 1 else f"COALESCE({', '.join(candidates)})"
+        pivots.append(f"{value} AS {column}")
+        # only the directly preceding fiscal year counts; a gap leaves the deltas NULL
+        previous.append(f"CASE WHEN LAG(year) OVER by_company = year - 1 THEN LAG({column}) OVER by_company END AS prev_{column}")
+        deltas.append(f"w.{column}")
+        deltas.append(f"w.{column} - w.prev_{column}")
+        deltas.append(f"ROUND(100.0 * (w.{column} - w.prev_{column}) / ABS(NULLIF(w.prev_{column}, 0)), 2)")
+
+    all_ids = ", ".join(str(label_id) for ids in label_ids.values() for label_id in ids)
+    placeholders = ", ".join("?" * n_companies)
+    return f"""
+    WITH statements AS (
+        SELECT f.company_id, f.year, f.as_of_date, {", ".join(pivots)},
+               ROW_NUMBER() OVER (PARTITION BY f.company_id, f.year ORDER BY f.as_of_date DESC) AS recency
+        FROM balance_sheet_facts f
+        WHERE f.company_id IN (SELECT id FROM companies WHERE ticker IN ({placeholders}))
+          AND f.label_id IN ({all_ids})
+          AND f.statement_type_id = (SELECT id FROM statement_types WHERE name = 'balance_sheet')
+        GROUP BY f.company_id, f.year, f.as_of_date
+    ),
+    wide AS (
+        SELECT *, {", ".join(previous)}
+        FROM statements
+        WHERE recency = 1
+        WINDOW by_company AS (PARTITION BY company_id ORDER BY year)
+    )
+    INSERT INTO {WIDE_TABLE} (company, year, as_of_date, {", ".join(WIDE_COLUMNS)})
+    SELECT c.ticker, w.year, w.as_of_date, {", ".join(deltas)}
+    FROM wide w
+    JOIN companies c ON c.id = w.company_id
+    """
+
+# recomputes the wide rows of the given companies (all of them when None); runs inside the caller's transaction
+def refresh_wide_table(conn: sqlite3.Connection, companies: Optional[Iterable[str]] = None) -> None:
+    if companies is None:
+        companies = [row[0] for row in conn.execute("SELECT ticker FROM companies")]
+    companies = sorted(set(companies))
+    if not companies:
+        return
+    label_ids = canonical_label_ids(conn)
+    for start in range(0, len(companies), REFRESH_BATCH):
+        batch = companies[start:start + REFRESH_BATCH]
+        placeholders = ", ".join("?" * len(batch))
+        conn.execute(f"DELETE FROM {WIDE_TABLE} WHERE company IN ({placeholders})", batch)
+        conn.execute(_refresh_sql(label_ids, len(batch)), batch)
+
+# creates the wide table and fills it from the facts when it is missing or was built by an older version; returns
+# True when it was (re)built, so the caller can invalidate anything cached against the old contents
+def create_wide_table(conn: sqlite3.Connection) -> bool:
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (WIDE_TABLE,)).fetchone()
+    version = conn.execute("SELECT value FROM meta WHERE key = 'wide_table_version'").fetchone()
+    if exists and version and version[0] == WIDE_TABLE_VERSION:
+        return False
+    conn.execute(f"DROP TABLE IF EXISTS {WIDE_TABLE}")
+    for statement in WIDE_TABLE_DDL:
+        conn.execute(statement)
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('wide_table_version', ?)", (WIDE_TABLE_VERSION,))
+    refresh_wide_table(conn)
+    return True
+
+# schema text for the SQL prompt, generated from WIDE_KEY_COLUMNS and CANONICAL_LABELS so it never drifts from the DDL
+def describe_wide_table() -> str:
+    columns = [f"{column} {declared}" for column, declared in WIDE_KEY_COLUMNS]
+    columns += [f"{column} REAL, {column}_yoy REAL, {column}_yoy_pct REAL" for column in CANONICAL_LABELS]
+    columns.append("PRIMARY KEY (company, year)")
+    body = ",\n".join(f"        {column}" for column in columns)
+    return (
+        f"    Table: {WIDE_TABLE}(\n{body}\n    )\n"
+        "    One row per company and fiscal year (its latest balance sheet), with the common balance sheet lines as columns.\n"
+        "    <column>_yoy is the change from the previous fiscal year and <column>_yoy_pct that change in percent; both are\n"
+        "    NULL when the previous year is missing.\n"
+    )
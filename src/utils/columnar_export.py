@@ -0,0 +1,250 @@
+#src/utils/columnar_export.py
+import os
+import csv
+import glob
+import json
+import shutil
+import logging
+import argparse
+import itertools
+import sqlite3
+from datetime import datetime
+from urllib.parse import quote
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
+
+from src.scripts.connect_or_create_sql_db import connect_read_only
+from src.utils.telemetry import incr, span
+
+# pyarrow is only needed to write an export; importing this module never loads it
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+log = logging.getLogger(__name__)
+
+# bump when the exported columns or the directory layout change; the next export rewrites everything
+EXPORT_VERSION = 1
+EXPORT_STATE_FILE = "_export_state.json"
+EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+# rows fetched from sqlite and converted per batch; memory stays around one batch however large the table grows
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "10000"))
+
+# facts grouped by partition; rowid is the watermark, which works because facts are only ever appended (INSERT OR IGNORE).
+# the ORDER BY is sorted by sqlite, which spills to a temp file on the read-only connection rather than growing in memory
+EXPORT_SQL = """
+SELECT c.ticker, f.year, f.uid, f.as_of_date, t.name, s.name, l.name, f.value
+FROM balance_sheet_facts f
+JOIN companies c ON c.id = f.company_id
+JOIN statement_types t ON t.id = f.statement_type_id
+LEFT JOIN sections s ON s.id = f.section_id
+JOIN labels l ON l.id = f.label_id
+WHERE f.rowid > ? AND f.rowid <= ?
+ORDER BY c.ticker, f.year, f.rowid
+"""
+
+# outcome of one export; watermark is the last fact rowid the export directory now holds
+class ExportReport(NamedTuple):
+    rows: int
+    partitions: int
+    watermark: int
+    full: bool
+
+# columns stored in each file; company and year are in the hive-style path (company=GOOG/year=2024)
+def export_schema() -> "pa.Schema":
+    import pyarrow as pa
+
+    return pa.schema([
+        ("uid", pa.string()),
+        ("as_of_date", pa.date32()),
+        ("statement_type", pa.string()),
+        ("section", pa.string()),
+        ("label", pa.string()),
+        ("value", pa.float64()),
+    ])
+
+# a fetched chunk as one arrow record batch, converted column by column; partitions are zero-copy slices of it
+def _to_batch(rows: List[tuple], schema: "pa.Schema") -> "pa.RecordBatch":
+    import pyarrow as pa
+
+    _, _, uids, dates, statement_types, sections, labels, values = zip(*rows)
+    arrays = [
+        pa.array(uids, pa.string()),
+        pa.array(dates, pa.string()).cast(pa.date32()),
+        pa.array(statement_types, pa.string()),
+        pa.array(sections, pa.string()),
+        pa.array(labels, pa.string()),
+        pa.array(values, pa.float64()),
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+# one file in one partition, written to a temp name and moved into place on close so readers never see half a file
+class PartitionWriter:
+    def __init__(self, path: str, schema: "pa.Schema", fmt: str):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(self.tmp_path, schema, compression="zstd")
+        else:
+            import pyarrow.ipc as ipc
+            self.writer = ipc.new_file(self.tmp_path, schema)
+
+    def write(self, batch: "pa.RecordBatch") -> None:
+        self.writer.write_batch(batch)
+
+    def close(self) -> None:
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        try:
+            self.writer.close()
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+def export_state_path(out_dir: str) -> str:
+    return os.path.join(out_dir, EXPORT_STATE_FILE)
+
+def load_export_state(out_dir: str) -> Dict:
+    try:
+        with open(export_state_path(out_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_export_state(out_dir: str, state: Dict) -> None:
+    path = export_state_path(out_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+# the watermark of the previous export into out_dir, or 0 when it cannot be trusted: another database, format or layout,
+# or a facts table that was cleared and refilled since (the row at the watermark is then no longer the same fact)
+def resume_watermark(conn: sqlite3.Connection, state: Dict, database_id: Optional[str], fmt: str) -> int:
+    if state.get("version") != EXPORT_VERSION or state.get("format") != fmt or state.get("database_id") != database_id:
+        return 0
+    watermark = state.get("watermark", 0)
+    row = conn.execute("SELECT uid FROM balance_sheet_facts WHERE rowid = ?", (watermark,)).fetchone()
+    return watermark if row and row[0] == state.get("watermark_uid") else 0
+
+# removes the partitions and state of an earlier export before a full one; nothing else in out_dir is touched
+def _clear_export(out_dir: str) -> None:
+    for name in os.listdir(out_dir):
+        if name.startswith("company="):
+            shutil.rmtree(os.path.join(out_dir, name))
+    if os.path.exists(export_state_path(out_dir)):
+        os.remove(export_state_path(out_dir))
+
+# removes what an earlier export that failed part way left past the watermark: its part files all start at low + 1, and
+# their end rowid is that run's high, which a rerun after more inserts no longer matches (so they wouldn't be overwritten)
+def _clear_unfinished_parts(out_dir: str, low: int) -> None:
+    for path in glob.glob(os.path.join(out_dir, "company=*", "year=*", f"part-{low + 1:012d}-*")):
+        os.remove(path)
+
+# streams the facts into out_dir/company=<ticker>/year=<year>/part-<first rowid>-<last rowid>.<ext>; incremental runs only
+# write the facts added since the previous export, as new part files next to the earlier ones
+def export_balance_sheet(out_dir: str, db_path: Optional[str] = None, fmt: str = "parquet", incremental: bool = True,
+                         chunk_rows: int = EXPORT_CHUNK_ROWS) -> ExportReport:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    os.makedirs(out_dir, exist_ok=True)
+    schema = export_schema()
+
+    conn = connect_read_only(db_path)
+    try:
+        # one read transaction, so the watermark and the exported rows come from the same snapshot
+        conn.execute("BEGIN")
+        database_id = (conn.execute("SELECT value FROM meta WHERE key = 'database_id'").fetchone() or (None,))[0]
+        high = conn.execute("SELECT max(rowid) FROM balance_sheet_facts").fetchone()[0] or 0
+        low = resume_watermark(conn, load_export_state(out_dir), database_id, fmt) if incremental else 0
+        full = low == 0
+        if full:
+            _clear_export(out_dir)
+        else:
+            _clear_unfinished_parts(out_dir, low)
+
+        rows = 0
+        partitions = 0
+        part_name = f"part-{low + 1:012d}-{high:012d}{EXPORT_FORMATS[fmt]}"
+        writer = None
+        current = None
+        with span("export.balance_sheet"):
+            cursor = conn.execute(EXPORT_SQL, (low, high))
+            try:
+                while True:
+                    chunk = cursor.fetchmany(chunk_rows)
+                    if not chunk:
+                        break
+                    batch = _to_batch(chunk, schema)
+                    offset = 0
+                    # rows arrive grouped by partition, so a chunk splits into consecutive runs of one (company, year)
+                    for key, group in itertools.groupby(chunk, key=lambda row: (row[0], row[1])):
+                        length = sum(1 for _ in group)
+                        if key != current:
+                            if writer:
+                                writer.close()
+                            current = key
+                            partition_dir = os.path.join(out_dir, f"company={quote(key[0], safe='')}", f"year={key[1]}")
+                            writer = PartitionWriter(os.path.join(partition_dir, part_name), schema, fmt)
+                            partitions += 1
+                        writer.write(batch.slice(offset, length))
+                        offset += length
+                    rows += len(chunk)
+                if writer:
+                    writer.close()
+                    writer = None
+            finally:
+                if writer:
+                    writer.abort()
+                cursor.close()
+
+        watermark_uid = conn.execute("SELECT uid FROM balance_sheet_facts WHERE rowid = ?", (high,)).fetchone()
+        conn.rollback()
+    finally:
+        conn.close()
+
+    # written last: an export that failed part way keeps the old watermark, and its rerun clears the part files it left
+    save_export_state(out_dir, {
+        "version": EXPORT_VERSION,
+        "format": fmt,
+        "database_id": database_id,
+        "watermark": high,
+        "watermark_uid": watermark_uid[0] if watermark_uid else None,
+        "exported_at": datetime.now().isoformat(timespec="seconds"),
+    })
+    incr("export.rows", rows)
+    incr("export.partitions", partitions)
+    log.info(f"Exported {rows} rows into {partitions} partitions of {out_dir} ({'full' if full else 'incremental'}, watermark {high}).")
+    return ExportReport(rows, partitions, high, full)
+
+# the flat balance_sheet view as one csv, written in chunks instead of through a DataFrame of the whole table
+def export_csv(conn: sqlite3.Connection, path: str, chunk_rows: int = EXPORT_CHUNK_ROWS) -> int:
+    cursor = conn.execute("SELECT * FROM balance_sheet")
+    rows = 0
+    try:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(description[0] for description in cursor.description)
+            while True:
+                chunk = cursor.fetchmany(chunk_rows)
+                if not chunk:
+                    break
+                writer.writerows(chunk)
+                rows += len(chunk)
+    finally:
+        cursor.close()
+    return rows
+
+if __name__ == "__main__":
+    # warehouse sync entry point: python -m src.utils.columnar_export <out_dir>
+    parser = argparse.ArgumentParser()
+    parser.add_argument("out_dir", help="Directory of company=/year= partitions to export into")
+    parser.add_argument("--db_path", default=None, help="SQLite database to export (defaults to the project database)")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="parquet", help="Parquet, or the Arrow IPC file format")
+    parser.add_argument("--full", action="store_true", help="Rewrite every partition instead of appending the rows added since the last export")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(export_balance_sheet(args.out_dir, args.db_path, args.format, incremental=not args.full))
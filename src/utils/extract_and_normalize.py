@@ -1,46 +1,67 @@
 #src/utils/extract_and_normalize.py
-import requests
 from datetime import datetime
-from bs4 import BeautifulSoup
 import os
-import pdfkit
 from urllib.parse import urljoin
-import pdfplumber
 import re
-import pandas as pd
 import logging
-from typing import List, Optional
+from functools import lru_cache
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 from src.utils.path_helpers import project_root
+from src.utils.page_index import PageIndex, load_or_build_page_index
+from src.utils.metadata_cache import MetadataCache, get_metadata_cache
+from src.utils.page_cache import PageCache, file_sha256, get_page_cache, settings_key
+from src.utils.sec_http import SEC_WWW_URL, SecClient, get_sec_client
+from src.utils.telemetry import span, traced
+
+# pandas, pdfplumber, BeautifulSoup and pdfkit are imported by the functions that use them, so importing this
+# module for its helpers or constants stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
 
 logging.getLogger("pdfminer").setLevel(logging.ERROR)
 
-# grabs all 10-K index page URLs for a company
-def get_10k_filing_urls(ticker: str, years_back: int) -> List[str]:
-    headers = {"User-Agent": "Justin Novick (justinnovick2@gmail.com)"}
-    cik_lookup_url = "https://www.sec.gov/files/company_tickers.json"
-    res = requests.get(cik_lookup_url, headers=headers)
-    res.raise_for_status()
-    ticker_data = res.json()
-
-    cik = None
-    for k, v in ticker_data.items():
-        if v['ticker'].lower() == ticker.lower():
-            cik = str(v['cik_str']).zfill(10)
-            break
+# extraction engines: "pdf" scrapes the wkhtmltopdf rendering, "html" reads the filing's own tables
+ENGINES = ("pdf", "html")
+
+# passed to pdfplumber's extract_tables() and extract_text(); both are part of the page cache key
+TABLE_SETTINGS: Dict = {}
+TEXT_SETTINGS: Dict = {}
+
+# what the cached pages were extracted with; read from package metadata so a cache hit never imports pdfplumber
+@lru_cache(maxsize=1)
+def extractor_settings() -> Dict:
+    from importlib import metadata
+
+    versions = {}
+    for package in ("pdfplumber", "pdfminer.six"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {"versions": versions, "tables": TABLE_SETTINGS, "text": TEXT_SETTINGS}
+
+# lists a company's recent 10-K filings with their accession numbers and dates
+def get_10k_filings(ticker: str, years_back: int, client: Optional[SecClient] = None, cache: Optional[MetadataCache] = None) -> List[Dict[str, str]]:
+    if cache is None:
+        cache = MetadataCache(client=client) if client is not None else get_metadata_cache()
+
+    # O(1) lookup in the persisted ticker index; company_tickers.json is only re-read when SEC changes it
+    cik = cache.lookup_cik(ticker)
     if not cik:
         raise ValueError(f"CIK not found for ticker: {ticker}")
 
-    submissions_url = f"https://data.sec.gov/submissions/CIK{cik}.json"
-    res = requests.get(submissions_url, headers=headers)
-    res.raise_for_status()
-    data = res.json()
+    data = cache.get_submissions(cik)
 
     current_year = datetime.now().year
     target_years = {str(y) for y in range(current_year - years_back, current_year + 1)}
 
     recent = data["filings"]["recent"]
-    filing_urls = []
+    report_dates = recent.get("reportDate", [])
+    filings = []
 
     for i in range(len(recent["form"])):
         if recent["form"][i] != "10-K":
@@ -52,90 +73,266 @@ def get_10k_filing_urls(ticker: str, years_back: int) -> List[str]:
 
         accession_raw = recent["accessionNumber"][i]
         accession_clean = accession_raw.replace("-", "")
-        index_url = f"https://www.sec.gov/Archives/edgar/data/{int(cik)}/{accession_clean}/{accession_raw}-index.htm"
-        filing_urls.append(index_url)
+        filings.append({
+            "ticker": ticker.upper(),
+            "cik": cik,
+            "accession": accession_raw,
+            "filing_date": filing_date,
+            "report_date": report_dates[i] if i < len(report_dates) else None,
+            "index_url": f"{SEC_WWW_URL}/Archives/edgar/data/{int(cik)}/{accession_clean}/{accession_raw}-index.htm",
+        })
 
-    return filing_urls
+    return filings
 
-# converts the linked HTML filings into PDFs
-def save_10k_htmls_as_pdfs(index_urls: List[str], output_dir: Optional[str] = None) -> List[str]:
-    if output_dir is None:
-        output_dir = os.path.join(project_root(), "data", "pdfs")
+# grabs all 10-K index page URLs for a company
+def get_10k_filing_urls(ticker: str, years_back: int, client: Optional[SecClient] = None, cache: Optional[MetadataCache] = None) -> List[str]:
+    return [filing["index_url"] for filing in get_10k_filings(ticker, years_back, client, cache)]
 
-    os.makedirs(output_dir, exist_ok=True)
-    headers = {"User-Agent": "Justin Novick (justinnovick2@gmail.com)"}
-    saved_pdfs = []
+# finds the primary 10-K document link on a filing index page
+def find_primary_10k_url(index_html: str) -> Optional[str]:
+    from bs4 import BeautifulSoup
 
-    for index_url in index_urls:
-        print(f"Scanning index page: {index_url}")
-        try:
-            response = requests.get(index_url, headers=headers)
-            response.raise_for_status()
-        except Exception as e:
-            print(f"Failed to fetch {index_url}: {e}")
-            continue
+    soup = BeautifulSoup(index_html, "html.parser")
+    table = soup.find("table", class_="tableFile", summary="Document Format Files")
+    if not table:
+        log.warning("No document table found.")
+        return None
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        table = soup.find("table", class_="tableFile", summary="Document Format Files")
-        if not table:
-            print("No document table found.")
+    rows = table.find_all("tr")
+    for row in rows[1:]:
+        cells = row.find_all("td")
+        if len(cells) >= 4:
+            description = cells[1].text.strip().lower()
+            doc_link = cells[2].find("a")
+            if doc_link and "10-k" in description:
+                raw_href = doc_link["href"]
+                filing_htm_url = urljoin(SEC_WWW_URL, raw_href)
+                if filing_htm_url.startswith(f"{SEC_WWW_URL}/ix?doc="):
+                    filing_htm_url = filing_htm_url.replace(f"{SEC_WWW_URL}/ix?doc=", SEC_WWW_URL)
+                return filing_htm_url
+
+    log.warning("10-K HTML document not found.")
+    return None
+
+# renders already-downloaded filing HTML to PDF; the <base> tag lets wkhtmltopdf resolve relative images
+@traced("pdf.render")
+def render_html_to_pdf(html: str, source_url: str, pdf_path: str) -> None:
+    base_tag = f'<base href="{source_url}">'
+    if re.search(r"<head[^>]*>", html, re.IGNORECASE):
+        html = re.sub(r"(<head[^>]*>)", lambda m: m.group(1) + base_tag, html, count=1, flags=re.IGNORECASE)
+    else:
+        html = base_tag + html
+    import pdfkit
+    pdfkit.from_string(html, pdf_path)
+
+# fetches index pages, then primary 10-K documents, both concurrently; yields (index_url, document_url, html)
+def fetch_10k_documents(index_urls: List[str], client: Optional[SecClient] = None) -> Iterator[Tuple[str, str, str]]:
+    client = client or get_sec_client()
+
+    document_index = {}
+    for index_url, response in client.get_many(index_urls):
+        log.info(f"Scanning index page: {index_url}")
+        if isinstance(response, Exception):
+            log.warning(f"Failed to fetch {index_url}: {response}")
             continue
+        filing_htm_url = find_primary_10k_url(response.text)
+        if filing_htm_url:
+            document_index[filing_htm_url] = index_url
 
-        rows = table.find_all("tr")
-        filing_htm_url = None
-
-        for row in rows[1:]:
-            cells = row.find_all("td")
-            if len(cells) >= 4:
-                description = cells[1].text.strip().lower()
-                doc_link = cells[2].find("a")
-                if doc_link and "10-k" in description:
-                    raw_href = doc_link["href"]
-                    filing_htm_url = urljoin("https://www.sec.gov", raw_href)
-                    if filing_htm_url.startswith("https://www.sec.gov/ix?doc="):
-                        filing_htm_url = filing_htm_url.replace("https://www.sec.gov/ix?doc=", "https://www.sec.gov")
-                    break
+    for filing_htm_url, response in client.get_many(list(document_index)):
+        if isinstance(response, Exception):
+            log.warning(f"Failed to fetch {filing_htm_url}: {response}")
+            continue
+        yield document_index[filing_htm_url], filing_htm_url, response.text
 
+# single-filing version of fetch_10k_documents for callers that schedule filings themselves; returns (document_url, html)
+def fetch_10k_document(index_url: str, client: Optional[SecClient] = None) -> Optional[Tuple[str, str]]:
+    client = client or get_sec_client()
+    try:
+        filing_htm_url = find_primary_10k_url(client.get(index_url).text)
         if not filing_htm_url:
-            print("10-K HTML document not found.")
-            continue
+            return None
+        return filing_htm_url, client.get(filing_htm_url).text
+    except Exception as e:
+        log.warning(f"Failed to fetch filing from {index_url}: {e}")
+        return None
+
+# converts the linked HTML filings into PDFs
+def save_10k_htmls_as_pdfs(index_urls: List[str], output_dir: Optional[str] = None, client: Optional[SecClient] = None) -> List[str]:
+    if output_dir is None:
+        output_dir = os.path.join(project_root(), "data", "pdfs")
+
+    os.makedirs(output_dir, exist_ok=True)
+    saved_pdfs = []
 
+    for _, filing_htm_url, html in fetch_10k_documents(index_urls, client):
         file_name = os.path.basename(filing_htm_url).replace(".htm", ".pdf")
         pdf_path = os.path.join(output_dir, file_name)
 
         try:
-            print(f"Converting to PDF: {filing_htm_url} → {pdf_path}")
-            pdfkit.from_url(filing_htm_url, pdf_path)
+            log.info(f"Converting to PDF: {filing_htm_url} → {pdf_path}")
+            render_html_to_pdf(html, filing_htm_url, pdf_path)
             saved_pdfs.append(pdf_path)
         except Exception as e:
-            print(f"PDF conversion failed: {e}")
+            log.warning(f"PDF conversion failed: {e}")
 
     return saved_pdfs
 
+# saves the primary 10-K HTML documents as-is; PDFs are only rendered when an archive dir is given
+def save_10k_htmls(index_urls: List[str], output_dir: Optional[str] = None, pdf_archive_dir: Optional[str] = None, client: Optional[SecClient] = None) -> List[str]:
+    if output_dir is None:
+        output_dir = os.path.join(project_root(), "data", "html")
+
+    os.makedirs(output_dir, exist_ok=True)
+    if pdf_archive_dir:
+        os.makedirs(pdf_archive_dir, exist_ok=True)
+    saved_htmls = []
+
+    for _, filing_htm_url, html in fetch_10k_documents(index_urls, client):
+        html_path = os.path.join(output_dir, os.path.basename(filing_htm_url))
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        log.info(f"Saved HTML: {filing_htm_url} → {html_path}")
+        saved_htmls.append(html_path)
+
+        if pdf_archive_dir:
+            pdf_path = os.path.join(pdf_archive_dir, os.path.basename(html_path).replace(".htm", ".pdf"))
+            try:
+                render_html_to_pdf(html, filing_htm_url, pdf_path)
+            except Exception as e:
+                log.warning(f"PDF archival failed: {e}")
+
+    return saved_htmls
+
+# holds one open PDF and memoizes page text and tables so each page is only laid out once; with a page cache, pages
+# laid out by earlier runs on the same pdf bytes are read back instead and pdfplumber is only opened for new ones
+class PdfDocument:
+    def __init__(self, pdf_path: str, page_cache: Optional[PageCache] = None):
+        self.path = pdf_path
+        self._pdf = None
+        self._text: Dict[int, Optional[str]] = {}
+        self._tables: Dict[int, List[list]] = {}
+        self._n_pages: Optional[int] = None
+        self._page_index: Optional[PageIndex] = None
+        self._page_cache = page_cache if page_cache is not None else get_page_cache()
+        self._source_hash: Optional[str] = None
+        self._cache_key: Optional[Tuple[str, str]] = None
+        self._cache_dirty = False
+        # page index each statement was found on, recorded by the extractors
+        self.statement_pages: Dict[str, int] = {}
+
+    def __enter__(self) -> "PdfDocument":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        self._load_cached_pages()
+        if self._n_pages is None:
+            self._n_pages = len(self.pdf.pages)
+            self._cache_dirty = self._page_cache is not None
+        return self._n_pages
+
+    @property
+    def pdf(self):
+        if self._pdf is None:
+            import pdfplumber
+            self._pdf = pdfplumber.open(self.path)
+        return self._pdf
+
+    # content hash of the pdf bytes, read once and shared by the page cache and the page index
+    @property
+    def source_hash(self) -> str:
+        if self._source_hash is None:
+            self._source_hash = file_sha256(self.path)
+        return self._source_hash
+
+    # reads this document's cache file once, before the first page is needed
+    def _load_cached_pages(self) -> None:
+        if self._page_cache is None or self._cache_key is not None:
+            return
+        self._cache_key = (self.source_hash, settings_key(extractor_settings()))
+        cached = self._page_cache.load(*self._cache_key)
+        if cached:
+            self._n_pages = cached.get("n_pages")
+            self._text.update({int(page): text for page, text in cached.get("text", {}).items()})
+            self._tables.update({int(page): tables for page, tables in cached.get("tables", {}).items()})
+
+    def page_text(self, page_index: int) -> Optional[str]:
+        self._load_cached_pages()
+        if page_index not in self._text:
+            self._text[page_index] = self.pdf.pages[page_index].extract_text(**TEXT_SETTINGS)
+            self._cache_dirty = self._page_cache is not None
+        return self._text[page_index]
+
+    # keyword index over the pages, persisted next to the pdf and built on first use
+    @property
+    def page_index(self) -> PageIndex:
+        if self._page_index is None:
+            self._page_index = load_or_build_page_index(self.path, self.source_hash)
+        return self._page_index
+
+    def page_tables(self, page_index: int) -> List[list]:
+        self._load_cached_pages()
+        if page_index not in self._tables:
+            self._tables[page_index] = self.pdf.pages[page_index].extract_tables(TABLE_SETTINGS)
+            self._cache_dirty = self._page_cache is not None
+        return self._tables[page_index]
+
+    # writes the pages laid out since the cache file was read, together with the ones it already had
+    def flush_page_cache(self) -> None:
+        if not self._cache_dirty:
+            return
+        self._page_cache.save(*self._cache_key, {
+            "source": os.path.basename(self.path),
+            "settings": extractor_settings(),
+            "n_pages": self._n_pages,
+            "text": {str(page): text for page, text in self._text.items()},
+            "tables": {str(page): tables for page, tables in self._tables.items()},
+        })
+        self._cache_dirty = False
+
+    def close(self) -> None:
+        self.flush_page_cache()
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+# lets every helper take either a path or an already-open PdfDocument
+@contextmanager
+def open_document(pdf: Union[str, PdfDocument]) -> Iterator[PdfDocument]:
+    if isinstance(pdf, PdfDocument):
+        yield pdf
+        return
+    with PdfDocument(pdf) as doc:
+        yield doc
+
 # helper to find which page the table of contents is on
-def find_toc_page_index(pdf_path: str, max_search_pages: int = 10) -> Optional[int]:
-    with pdfplumber.open(pdf_path) as pdf:
-        for i in range(min(max_search_pages, len(pdf.pages))):
-            text = pdf.pages[i].extract_text()
+def find_toc_page_index(pdf: Union[str, PdfDocument], max_search_pages: int = 10) -> Optional[int]:
+    with open_document(pdf) as doc:
+        for i in range(min(max_search_pages, len(doc))):
+            text = doc.page_text(i)
             if text and "table of contents" in text.lower():
-                print(f"TOC likely found on pdf.pages[{i}]")
+                log.info(f"TOC likely found on pdf.pages[{i}]")
                 return i
-    print("TOC not found in first few pages.")
+    log.warning("TOC not found in first few pages.")
     return None
 
 # uses TOC to locate the Balance Sheet page
-def find_balance_sheet_page_by_toc(pdf_path: str) -> Optional[int]:
-    toc_index = find_toc_page_index(pdf_path)
-    if toc_index is None:
-        return None
+@traced("pdf.locate_page_toc")
+def find_balance_sheet_page_by_toc(pdf: Union[str, PdfDocument]) -> Optional[int]:
+    with open_document(pdf) as doc:
+        toc_index = find_toc_page_index(doc)
+        if toc_index is None:
+            return None
 
-    page_offset = toc_index + 1
-    toc_pattern = re.compile(r"item\s+8[\.\s]+.*?(\d{1,3})", re.IGNORECASE)
+        page_offset = toc_index + 1
+        toc_pattern = re.compile(r"item\s+8[\.\s]+.*?(\d{1,3})", re.IGNORECASE)
 
-    with pdfplumber.open(pdf_path) as pdf:
-        toc_text = pdf.pages[toc_index].extract_text()
+        toc_text = doc.page_text(toc_index)
         if not toc_text:
-            print("TOC page had no extractable text.")
+            log.warning("TOC page had no extractable text.")
             return None
 
         for line in toc_text.split("\n"):
@@ -143,13 +340,15 @@ def find_balance_sheet_page_by_toc(pdf_path: str) -> Optional[int]:
             if match:
                 logical_page = int(match.group(1))
                 actual_index = logical_page + page_offset - 1
-                print(f"'Item 8' points to page {logical_page} → pdf.pages[{actual_index}]")
+                log.info(f"'Item 8' points to page {logical_page} → pdf.pages[{actual_index}]")
                 return actual_index
 
-    print("Could not find 'Item 8' in TOC.")
+    log.warning("Could not find 'Item 8' in TOC.")
     return None
 
-def is_likely_toc_table(df: pd.DataFrame) -> bool:
+def is_likely_toc_table(df: "pd.DataFrame") -> bool:
+    import pandas as pd
+
     first_column_text = " ".join(str(cell).lower() for cell in df[0] if pd.notnull(cell))
     return (
         df.shape[0] <= 10 and
@@ -157,40 +356,66 @@ def is_likely_toc_table(df: pd.DataFrame) -> bool:
         "comprehensive income" in first_column_text
     )
 
+# runs the table finder on one page and returns the first balance-sheet-looking table
+@traced("pdf.table_extraction")
+def extract_balance_sheet_table_on_page(doc: PdfDocument, page_number: int) -> Optional["pd.DataFrame"]:
+    import pandas as pd
+
+    for table in doc.page_tables(page_number):
+        df = pd.DataFrame(table)
+
+        if df.shape[1] >= 2:
+            if is_likely_toc_table(df):
+                log.warning(f"Skipping TOC-like table on page {page_number}")
+                continue
+
+            keywords = ["assets", "liabilities", "equity", "shareholders’ equity", "stockholders’ equity"]
+            flat_text = " ".join(str(cell).lower() for row in df.values for cell in row if cell)
+            if any(keyword in flat_text for keyword in keywords):
+                log.info(f"Found likely Balance Sheet on pdf.pages[{page_number}]")
+                doc.statement_pages["balance_sheet"] = page_number
+                df = df.dropna(how="all").dropna(axis=1, how="all")
+                return df
+    return None
+
+# looks the statement up in the page index and extracts tables only from the best-ranked page
+def extract_table_from_page_index(pdf: Union[str, PdfDocument], statement_type: str = "balance_sheet") -> Optional["pd.DataFrame"]:
+    with open_document(pdf) as doc:
+        try:
+            with span("pdf.locate_page"):
+                ranked = doc.page_index.rank_pages(statement_type)
+        except Exception as e:
+            log.warning(f"Page index unavailable: {e}")
+            return None
+        if not ranked:
+            log.warning("Page index has no candidate page.")
+            return None
+        page_number, score = ranked[0]
+        log.info(f"Page index ranks pdf.pages[{page_number}] first (score {score})")
+        return extract_balance_sheet_table_on_page(doc, page_number)
+
 # scans nearby pages for a balance-sheet-looking table
-def extract_table_near_page(pdf_path: str, page_number: int, max_offset: int = 6) -> Optional[pd.DataFrame]:
+def extract_table_near_page(pdf: Union[str, PdfDocument], page_number: int, max_offset: int = 6) -> Optional["pd.DataFrame"]:
     if page_number is None:
-        print("Cannot extract without a valid page number.")
+        log.warning("Cannot extract without a valid page number.")
         return None
 
-    with pdfplumber.open(pdf_path) as pdf:
+    with open_document(pdf) as doc:
         for offset in range(max_offset + 1):
             try_page = page_number + offset
-            if try_page >= len(pdf.pages):
+            if try_page >= len(doc):
                 break
 
-            page = pdf.pages[try_page]
-            tables = page.extract_tables()
-            for idx, table in enumerate(tables):
-                df = pd.DataFrame(table)
+            df = extract_balance_sheet_table_on_page(doc, try_page)
+            if df is not None:
+                return df
 
-                if df.shape[1] >= 2:
-                    if is_likely_toc_table(df):
-                        print(f"Skipping TOC-like table on page {try_page}")
-                        continue
-
-                    keywords = ["assets", "liabilities", "equity", "shareholders’ equity", "stockholders’ equity"]
-                    flat_text = " ".join(str(cell).lower() for row in df.values for cell in row if cell)
-                    if any(keyword in flat_text for keyword in keywords):
-                        print(f"Found likely Balance Sheet on pdf.pages[{try_page}]")
-                        df = df.dropna(how="all").dropna(axis=1, how="all")
-                        return df
-
-    print("No balance sheet-like table found.")
+    log.warning("No balance sheet-like table found.")
     return None
 
 # standard cleaner for scraped tables
-def clean_balance_sheet(df_raw: pd.DataFrame) -> pd.DataFrame:
+@traced("normalize.clean")
+def clean_balance_sheet(df_raw: "pd.DataFrame") -> "pd.DataFrame":
     df = df_raw.copy()
     df = df.iloc[1:]  # drop the header row
     df[0] = df[0].astype(str).str.strip()
@@ -210,95 +435,152 @@ def clean_balance_sheet(df_raw: pd.DataFrame) -> pd.DataFrame:
     df_clean = df[[label_col, value_col_1, value_col_2]].copy()
     df_clean.columns = ["label", "current_year", "previous_year"]
 
-    for col in ["current_year", "previous_year"]:
-        df_clean[col] = (
-            df_clean[col]
-            .astype(str)
-            .str.replace(r"[^\d\.\-]", "", regex=True)
-            .replace("", None)
-            .astype(float)
-        )
+    # one regex pass over both value columns, then a single numeric conversion
+    values = df_clean[["current_year", "previous_year"]].astype(str)
+    values = values.apply(lambda col: col.str.replace(r"[^\d\.\-]", "", regex=True))
+    df_clean[["current_year", "previous_year"]] = values.replace("", None).astype(float)
 
     return df_clean.reset_index(drop=True)
 
 # parses the PDF to extract and clean the balance sheet
-def parse_balance_sheet_from_pdf(pdf_path: str) -> Optional[pd.DataFrame]:
-    bs_page = find_balance_sheet_page_by_toc(pdf_path)
-    df = extract_table_near_page(pdf_path, bs_page)
+def parse_balance_sheet_from_pdf(pdf: Union[str, PdfDocument]) -> Optional["pd.DataFrame"]:
+    with open_document(pdf) as doc:
+        df = extract_table_from_page_index(doc)
+        if df is None:
+            # fall back to the TOC walk when the index has no confident page
+            bs_page = find_balance_sheet_page_by_toc(doc)
+            df = extract_table_near_page(doc, bs_page)
     if df is not None:
         return clean_balance_sheet(df)
     else:
-        print("Failed to extract Balance Sheet.")
+        log.warning("Failed to extract Balance Sheet.")
         return None
 
-# extracts date from filename
-def extract_as_of_date_from_filename(pdf_path: str, ticker: str) -> Optional[str]:
-    import shutil
+# parses the filing's HTML/iXBRL document directly, skipping the PDF render and layout analysis
+def parse_balance_sheet_from_html(html_path: str) -> Optional["pd.DataFrame"]:
+    from src.utils.html_extract import extract_balance_sheet_table_from_html
 
-    filename = os.path.basename(pdf_path)
+    with span("html.table_extraction"):
+        df = extract_balance_sheet_table_from_html(html_path)
+    if df is not None:
+        return clean_balance_sheet(df)
+    else:
+        log.warning("Failed to extract Balance Sheet.")
+        return None
+
+# reads the YYYYMMDD stamp EDGAR puts in primary document names (e.g. goog-20241231.htm)
+def as_of_date_from_filename(filename: str) -> Optional[str]:
     match = re.search(r'(\d{8})', filename)
     if match:
         try:
             return datetime.strptime(match.group(1), "%Y%m%d").date().isoformat()
         except ValueError:
-            print(f"Invalid 8-digit date in filename: {filename}")
+            log.warning(f"Invalid 8-digit date in filename: {filename}")
+    return None
+
+# extracts date from filename
+def extract_as_of_date_from_filename(pdf: Union[str, PdfDocument], ticker: str) -> Optional[str]:
+    import shutil
+
+    pdf_path = pdf.path if isinstance(pdf, PdfDocument) else pdf
+    filename = os.path.basename(pdf_path)
+    as_of_date = as_of_date_from_filename(filename)
+    if as_of_date:
+        return as_of_date
 
     # Fallback: use TOC to extract "For the Fiscal Year Ended ..."
-    toc_page_idx = find_toc_page_index(pdf_path)
-    if toc_page_idx is not None:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = pdf.pages[toc_page_idx].extract_text()
-            if text:
-                date_match = re.search(r"For the Fiscal Year Ended (.+?)\n", text)
-                if date_match:
-                    try:
-                        parsed = dateparser.parse(date_match.group(1).strip())
-                        if parsed:
-                            as_of_date = parsed.date().isoformat()
-                            date_str = parsed.strftime("%Y%m%d")
-                            print(f"Extracted date from TOC: {as_of_date}")
-
-                            # Standardize filename
-                            dir_path = os.path.dirname(pdf_path)
-                            new_filename = f"{ticker.lower()}-{date_str}.pdf"
-                            new_path = os.path.join(dir_path, new_filename)
-
-                            if os.path.basename(pdf_path) != new_filename:
-                                shutil.move(pdf_path, new_path)
-                                print(f"Renamed file: {filename} → {new_filename}")
-
-                            return as_of_date
-                    except Exception as e:
-                        print(f" Date parse failed: {e}")
-
-    print(f"Could not extract date for: {pdf_path}")
+    with open_document(pdf) as doc:
+        toc_page_idx = find_toc_page_index(doc)
+        text = doc.page_text(toc_page_idx) if toc_page_idx is not None else None
+    if text:
+        date_match = re.search(r"For the Fiscal Year Ended (.+?)\n", text)
+        if date_match:
+            try:
+                parsed = dateparser.parse(date_match.group(1).strip())
+                if parsed:
+                    as_of_date = parsed.date().isoformat()
+                    date_str = parsed.strftime("%Y%m%d")
+                    log.info(f"Extracted date from TOC: {as_of_date}")
+
+                    # Standardize filename
+                    dir_path = os.path.dirname(pdf_path)
+                    new_filename = f"{ticker.lower()}-{date_str}.pdf"
+                    new_path = os.path.join(dir_path, new_filename)
+
+                    if os.path.basename(pdf_path) != new_filename:
+                        if isinstance(pdf, PdfDocument):
+                            # release the handle before moving; it reopens lazily at the new path
+                            pdf.close()
+                            pdf.path = new_path
+                        shutil.move(pdf_path, new_path)
+                        log.info(f"Renamed file: {filename} → {new_filename}")
+
+                    return as_of_date
+            except Exception as e:
+                log.warning(f"Date parse failed: {e}")
+
+    log.warning(f"Could not extract date for: {pdf_path}")
     return None
 
 # reshapes cleaned balance sheet into long format for storage
-def normalize_balance_sheet(df: pd.DataFrame, company: str, as_of_date: str, statement_type: str = "balance_sheet") -> pd.DataFrame:
-    rows = []
-    current_section = None
-    filing_year = pd.to_datetime(as_of_date).year
-
-    for _, row in df.iterrows():
-        label = row['label']
-        if label.endswith(":"):
-            current_section = label.rstrip(":")
-            continue
+@traced("normalize.reshape")
+def normalize_balance_sheet(df: "pd.DataFrame", company: str, as_of_date: str, statement_type: str = "balance_sheet") -> "pd.DataFrame":
+    import pandas as pd
 
-        value = row.get('current_year')
-        if pd.notna(value):
-            rows.append({
-                'as_of_date': as_of_date,
-                'company': company,
-                'statement_type': statement_type,
-                'section': current_section,
-                'label': label,
-                'year': filing_year,
-                'value': value
-            })
-
-    return pd.DataFrame(rows)
+    filing_year = pd.to_datetime(as_of_date).year
+    labels = df['label']
+
+    # header rows ("Current assets:") open a section that carries forward until the next header; a table without
+    # any header leaves an all-missing object column, which infer_objects turns into floats before the fill
+    is_header = labels.str.endswith(":")
+    sections = labels.where(is_header).str.rstrip(":").infer_objects().ffill()
+    values = df['current_year'] if 'current_year' in df else pd.Series(None, index=df.index, dtype=float)
+    keep = ~is_header & values.notna()
+
+    if not keep.any():
+        return pd.DataFrame()
+
+    return pd.DataFrame({
+        'as_of_date': as_of_date,
+        'company': company,
+        'statement_type': statement_type,
+        'section': sections[keep].astype(object).where(sections[keep].notna(), None),
+        'label': labels[keep],
+        'year': filing_year,
+        'value': values[keep],
+    }).reset_index(drop=True)
+
+# outcome of parsing one filing; df is None and skip_reason is set when the filing was skipped
+class ParsedFiling(NamedTuple):
+    path: str
+    df: Optional["pd.DataFrame"]
+    skip_reason: Optional[str]
+    page: Optional[int] = None
+
+# parses, dates and normalizes one filing; never raises, so it can run inside a worker process.
+# as_of_date can be passed in when it is already known (e.g. from the ingest manifest)
+@traced("ingest.parse_filing")
+def parse_and_normalize_filing(path: str, ticker: str, statement_type: str = "balance_sheet", engine: str = "pdf", as_of_date: Optional[str] = None) -> ParsedFiling:
+    page = None
+    try:
+        if engine == "html":
+            df = parse_balance_sheet_from_html(path)
+            if df is None or df.empty:
+                return ParsedFiling(path, None, "Empty or invalid balance sheet.")
+            as_of_date = as_of_date or as_of_date_from_filename(os.path.basename(path))
+        else:
+            with PdfDocument(path) as doc:
+                df = parse_balance_sheet_from_pdf(doc)
+                page = doc.statement_pages.get(statement_type)
+                if df is None or df.empty:
+                    return ParsedFiling(path, None, "Empty or invalid balance sheet.", page)
+                as_of_date = as_of_date or extract_as_of_date_from_filename(doc, ticker)
+
+        if not as_of_date:
+            return ParsedFiling(path, None, "missing as_of_date", page)
+        return ParsedFiling(path, normalize_balance_sheet(df, ticker, as_of_date, statement_type), None, page)
+    except Exception as e:
+        return ParsedFiling(path, None, f"parse failed: {e}", page)
 
 
 
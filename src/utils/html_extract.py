@@ -0,0 +1,86 @@
+#src/utils/html_extract.py
+import logging
+import io
+import re
+import pandas as pd
+from lxml import etree
+from typing import List, Optional, Union
+
+log = logging.getLogger(__name__)
+
+# every balance sheet has these lines; the TOC and selected-data tables do not have all of them
+REQUIRED_MARKERS = ("total assets", "total liabilities")
+EQUITY_MARKERS = ("stockholders’ equity", "shareholders’ equity", "stockholders' equity", "shareholders' equity")
+MIN_NUMERIC_ROWS = 10
+
+NUMBER_PATTERN = re.compile(r"\(?-?\$?\s*\d[\d,]*(?:\.\d+)?\s*\)?|^[—–-]$")
+YEAR_PATTERN = re.compile(r"(19|20)\d{2}")
+
+# flattens one <td>/<th> (including nested ix:nonFraction spans) into a single line of text
+def _cell_text(cell: etree._Element) -> str:
+    text = " ".join(cell.itertext()).replace("\xa0", " ")
+    return " ".join(text.split())
+
+# turns one <tr> into [label, first value, second value]; SEC HTML splits "$", numbers and ")" into separate cells
+def _collapse_row(cells: List[str]) -> Optional[List[Optional[str]]]:
+    label = None
+    values: List[str] = []
+    for text in cells:
+        if not text:
+            continue
+        if label is None and not NUMBER_PATTERN.fullmatch(text) and text not in ("$", ")", "%"):
+            label = text
+            continue
+        if text in ("$", ")", "%"):
+            if text == ")" and values:
+                values[-1] += ")"
+            continue
+        if NUMBER_PATTERN.fullmatch(text) or text in ("—", "–"):
+            values.append(text)
+
+    if label is None and not values:
+        return None
+    # column headers ("As of December 31, 2023 2024") carry years, not amounts
+    if values and all(YEAR_PATTERN.fullmatch(value) for value in values):
+        return None
+    values = (values + [None, None])[:2]
+    return [label or "", values[0], values[1]]
+
+def _looks_like_balance_sheet(rows: List[List[Optional[str]]]) -> bool:
+    flat_text = " ".join(row[0].lower() for row in rows if row[0])
+    numeric_rows = sum(1 for row in rows if row[1] is not None)
+    return (
+        all(marker in flat_text for marker in REQUIRED_MARKERS)
+        and any(marker in flat_text for marker in EQUITY_MARKERS)
+        and numeric_rows >= MIN_NUMERIC_ROWS
+    )
+
+# streams the filing with lxml's iterparse and returns the first balance-sheet-looking table as raw rows,
+# shaped like extract_table_near_page output (header row first, label in column 0)
+def extract_balance_sheet_table_from_html(source: Union[str, bytes]) -> Optional[pd.DataFrame]:
+    if isinstance(source, bytes):
+        return _extract_from_stream(io.BytesIO(source))
+    # opened here rather than by iterparse, which leaves the file open when the scan returns early
+    with open(source, "rb") as f:
+        return _extract_from_stream(f)
+
+def _extract_from_stream(source) -> Optional[pd.DataFrame]:
+    context = etree.iterparse(source, events=("end",), tag="table", html=True, recover=True, huge_tree=True)
+    for _, table in context:
+        rows = []
+        for tr in table.iter("tr"):
+            row = _collapse_row([_cell_text(cell) for cell in tr if cell.tag in ("td", "th")])
+            if row is not None:
+                rows.append(row)
+
+        if _looks_like_balance_sheet(rows):
+            log.info(f"Found likely Balance Sheet table with {len(rows)} rows")
+            return pd.DataFrame([["", None, None]] + rows)
+
+        # drop parsed tables (and anything before them) so memory stays flat on large filings
+        table.clear()
+        while table.getprevious() is not None:
+            del table.getparent()[0]
+
+    log.warning("No balance sheet-like table found in HTML.")
+    return None
@@ -0,0 +1,144 @@
+#src/utils/metadata_cache.py
+import logging
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from src.utils.path_helpers import project_root
+from src.utils.sec_http import SEC_DATA_URL, SEC_WWW_URL, SecClient, get_sec_client
+from src.utils.telemetry import incr
+
+log = logging.getLogger(__name__)
+
+COMPANY_TICKERS_URL = f"{SEC_WWW_URL}/files/company_tickers.json"
+TICKER_INDEX_FILE = "ticker_cik_index.json"
+
+# writes to a temp file first so a crashed or concurrent run never leaves half a file behind
+def _atomic_write(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+# on-disk cache of SEC metadata responses, revalidated with ETag / Last-Modified
+class MetadataCache:
+    def __init__(self, cache_dir: Optional[str] = None, client: Optional[SecClient] = None, max_age: float = 0):
+        self.cache_dir = cache_dir or os.path.join(project_root(), "data", "cache", "sec")
+        self.client = client
+        # responses younger than max_age seconds are served without asking SEC at all
+        self.max_age = max_age
+        self._validated = set()
+        self._ticker_index: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, url: str):
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.body"), os.path.join(self.cache_dir, f"{key}.meta.json")
+
+    def _load_meta(self, meta_path: str) -> Optional[dict]:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # returns (body_path, changed); each URL is revalidated at most once per process
+    def fetch(self, url: str):
+        body_path, meta_path = self._paths(url)
+        meta = self._load_meta(meta_path) if os.path.exists(body_path) else None
+
+        if meta is not None:
+            fresh = self.max_age and time.time() - meta.get("fetched_at", 0) < self.max_age
+            if url in self._validated or fresh:
+                incr("cache.sec_metadata.hits")
+                return body_path, False
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = (self.client or get_sec_client()).get(url, headers=headers)
+        if response.status_code == 304 and meta is not None:
+            log.info(f"Metadata cache hit (not modified): {url}")
+            incr("cache.sec_metadata.not_modified")
+            meta["fetched_at"] = time.time()
+            _atomic_write(meta_path, json.dumps(meta).encode())
+            self._validated.add(url)
+            return body_path, False
+
+        _atomic_write(body_path, response.content)
+        _atomic_write(meta_path, json.dumps({
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }).encode())
+        log.info(f"Metadata cache refreshed: {url}")
+        incr("cache.sec_metadata.misses")
+        self._validated.add(url)
+        return body_path, True
+
+    def get_json(self, url: str):
+        body_path, _ = self.fetch(url)
+        with open(body_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    # ticker -> zero-padded CIK, rebuilt only when company_tickers.json actually changes
+    def ticker_index(self) -> Dict[str, str]:
+        with self._lock:
+            body_path, changed = self.fetch(COMPANY_TICKERS_URL)
+            index_path = os.path.join(self.cache_dir, TICKER_INDEX_FILE)
+
+            if not changed and self._ticker_index is not None:
+                return self._ticker_index
+            if not changed and os.path.exists(index_path):
+                with open(index_path, "r", encoding="utf-8") as f:
+                    self._ticker_index = json.load(f)
+                return self._ticker_index
+
+            with open(body_path, "r", encoding="utf-8") as f:
+                ticker_data = json.load(f)
+            index = {}
+            for v in ticker_data.values():
+                # first entry wins, matching the old linear scan
+                index.setdefault(v["ticker"].upper(), str(v["cik_str"]).zfill(10))
+            _atomic_write(index_path, json.dumps(index).encode())
+            self._ticker_index = index
+            return index
+
+    def lookup_cik(self, ticker: str) -> Optional[str]:
+        return self.ticker_index().get(ticker.upper())
+
+    # the ticker index as last persisted, without contacting SEC; None if it was never built
+    def cached_ticker_index(self) -> Optional[Dict[str, str]]:
+        if self._ticker_index is not None:
+            return self._ticker_index
+        try:
+            with open(os.path.join(self.cache_dir, TICKER_INDEX_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_submissions(self, cik: str) -> dict:
+        return self.get_json(f"{SEC_DATA_URL}/submissions/CIK{cik}.json")
+
+    def get_companyfacts(self, cik: str) -> dict:
+        return self.get_json(f"{SEC_DATA_URL}/api/xbrl/companyfacts/CIK{cik}.json")
+
+_default_cache: Optional[MetadataCache] = None
+_default_cache_lock = threading.Lock()
+
+# process-wide cache so a multi-ticker run loads the ticker index once
+def get_metadata_cache() -> MetadataCache:
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = MetadataCache()
+        return _default_cache
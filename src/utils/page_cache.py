@@ -0,0 +1,126 @@
+#src/utils/page_cache.py
+import os
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+from src.utils.path_helpers import project_root
+from src.utils.telemetry import incr
+
+log = logging.getLogger(__name__)
+
+# bump when what is stored per page changes; files written by older versions are ignored and age out through eviction
+PAGE_CACHE_VERSION = 1
+PAGE_CACHE_SUFFIX = ".pages.json.gz"
+PAGE_CACHE_DIR = os.environ.get("PAGE_CACHE_DIR", os.path.join(project_root(), "data", "cache", "pages"))
+# total size the cache files may take; the least recently used documents are evicted past it
+PAGE_CACHE_MAX_BYTES = int(os.environ.get("PAGE_CACHE_MAX_MB", "512")) * 1024 * 1024
+# PAGE_CACHE=0 makes every PdfDocument lay its pages out again, e.g. when timing pdfplumber itself
+PAGE_CACHE_ENABLED = os.environ.get("PAGE_CACHE", "1") != "0"
+
+# content hash of the pdf, so a re-downloaded or renamed filing still finds its pages
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# short stable key for the extractor settings; changing a setting or a library version starts a new cache file
+def settings_key(settings: Dict) -> str:
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+# one gzip'd json file per (document, extractor settings) with the text and raw tables of every page extracted so far;
+# PdfDocument loads it on first use and writes it back on close when new pages were laid out
+class PageCache:
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir or PAGE_CACHE_DIR
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_path(self, doc_hash: str, settings: str) -> str:
+        return os.path.join(self.cache_dir, f"{doc_hash}-{settings}{PAGE_CACHE_SUFFIX}")
+
+    # {"n_pages": ..., "text": {page: text}, "tables": {page: tables}} with string page keys, or None on a miss
+    def load(self, doc_hash: str, settings: str) -> Optional[Dict]:
+        path = self.entry_path(doc_hash, settings)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            incr("cache.pages.misses")
+            return None
+        except (OSError, ValueError, EOFError) as e:
+            log.warning(f"Ignoring unreadable page cache file {path}: {e}")
+            incr("cache.pages.misses")
+            return None
+        if data.get("version") != PAGE_CACHE_VERSION:
+            incr("cache.pages.misses")
+            return None
+        try:
+            # reading counts as use, so eviction drops the documents nobody reprocesses
+            os.utime(path)
+        except OSError:
+            pass
+        incr("cache.pages.hits")
+        return data
+
+    def save(self, doc_hash: str, settings: str, data: Dict) -> None:
+        path = self.entry_path(doc_hash, settings)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump({**data, "version": PAGE_CACHE_VERSION}, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # a full disk or read-only location only costs the layout next time
+            log.warning(f"Could not save page cache file {path}: {e}")
+            return
+        self.evict()
+
+    # removes the least recently used files until the cache fits max_bytes; returns how many were removed
+    def evict(self) -> int:
+        with self._lock:
+            entries = []
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(PAGE_CACHE_SUFFIX):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    # another worker process evicted it first
+                    pass
+                total -= size
+                removed += 1
+        if removed:
+            incr("cache.pages.evicted", removed)
+            log.info(f"Evicted {removed} documents from the page cache ({total / 1024 / 1024:.1f} MB left).")
+        return removed
+
+_default_cache: Optional[PageCache] = None
+_default_cache_lock = threading.Lock()
+
+# process-wide cache shared by every PdfDocument; None when PAGE_CACHE=0
+def get_page_cache() -> Optional[PageCache]:
+    global _default_cache
+    if not PAGE_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PageCache()
+        return _default_cache
@@ -0,0 +1,157 @@
+#src/utils/page_index.py
+import logging
+import os
+import re
+import json
+import warnings
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.utils.page_cache import file_sha256
+from src.utils.telemetry import incr, span
+
+log = logging.getLogger(__name__)
+
+# bump when the indexed terms or the stored layout change; older sidecars are rebuilt
+PAGE_INDEX_VERSION = 3
+PAGE_INDEX_SUFFIX = ".pageindex.json"
+
+# headings that open a statement when they stand on a line of their own
+STATEMENT_TITLES = {
+    "balance_sheet": ("consolidated balance sheets", "consolidated balance sheet", "consolidated statements of financial position"),
+}
+
+# line items that only a page carrying the statement itself mentions all together
+STATEMENT_TERMS = {
+    "balance_sheet": (
+        "total assets", "total current assets", "total liabilities", "total current liabilities",
+        "retained earnings", "stockholders' equity", "shareholders' equity",
+    ),
+}
+
+TITLE_WEIGHT = 10.0
+TERM_WEIGHT = 2.0
+NUMERIC_WEIGHT = 5.0
+# a title line plus one line item, or most of the line items without a title
+MIN_STATEMENT_SCORE = 12.0
+# a title line plus most of the line items; with stop_early, once every statement has a page this good the rest of the pdf is not read
+CONCLUSIVE_SCORE = TITLE_WEIGHT + 5 * TERM_WEIGHT
+
+NUMERIC_LINE = re.compile(r"\d[\d,]*\)?\s*$")
+
+def _normalize(text: str) -> str:
+    return text.lower().replace("’", "'")
+
+# one page's score for one statement, the same sum rank_pages makes from the whole index
+def _page_score(statement_type: str, page_terms: Set[str], page_titles: Set[str], numeric: float) -> float:
+    score = TITLE_WEIGHT if any(_normalize(title) in page_titles for title in STATEMENT_TITLES.get(statement_type, ())) else 0.0
+    score += TERM_WEIGHT * sum(1 for term in STATEMENT_TERMS.get(statement_type, ()) if _normalize(term) in page_terms)
+    return score + NUMERIC_WEIGHT * numeric
+
+# compact per-filing inverted index: statement terms -> pages, standalone title lines -> pages,
+# and the share of lines on each page that end in a number (tables score high, prose low).
+# covers the first len(numeric) pages, which is all of them unless the build was asked to stop at a conclusive match
+class PageIndex:
+    def __init__(self, n_pages: int, terms: Dict[str, List[int]], titles: Dict[str, List[int]], numeric: List[float], source_hash: Optional[str] = None):
+        self.n_pages = n_pages
+        self.terms = terms
+        self.titles = titles
+        self.numeric = numeric
+        self.source_hash = source_hash
+
+    # one pass over the pdf's text layer; pdfium's text extraction is far cheaper than pdfplumber's layout analysis.
+    # every page is scored by default, so rank_pages picks the best candidate in the whole filing; the sidecar pays for
+    # the full pass once. stop_early ends the pass at the first page where every statement has scored CONCLUSIVE_SCORE,
+    # which reads about half of a 10-K but can miss a better page further on (a later, fuller copy of the statement)
+    @classmethod
+    def build(cls, pdf_path: str, source_hash: Optional[str] = None, stop_early: bool = False) -> "PageIndex":
+        import pypdfium2
+
+        vocabulary = sorted({_normalize(term) for terms in STATEMENT_TERMS.values() for term in terms})
+        title_vocabulary = {_normalize(title) for titles in STATEMENT_TITLES.values() for title in titles}
+        terms: Dict[str, List[int]] = {}
+        titles: Dict[str, List[int]] = {}
+        numeric: List[float] = []
+        unresolved = set(STATEMENT_TERMS)
+
+        pdf = pypdfium2.PdfDocument(pdf_path)
+        try:
+            n_pages = len(pdf)
+            for page_index in range(n_pages):
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    text = _normalize(pdf[page_index].get_textpage().get_text_bounded())
+                lines = [line.strip() for line in text.splitlines() if line.strip()]
+
+                page_terms = {term for term in vocabulary if term in text}
+                page_titles = set(lines) & title_vocabulary
+                for term in page_terms:
+                    terms.setdefault(term, []).append(page_index)
+                for line in page_titles:
+                    titles.setdefault(line, []).append(page_index)
+                numeric.append(round(sum(1 for line in lines if NUMERIC_LINE.search(line)) / len(lines), 3) if lines else 0.0)
+
+                unresolved = {statement for statement in unresolved if _page_score(statement, page_terms, page_titles, numeric[-1]) < CONCLUSIVE_SCORE}
+                if stop_early and not unresolved:
+                    break
+        finally:
+            pdf.close()
+
+        return cls(n_pages, terms, titles, numeric, source_hash)
+
+    # (page, score) for pages likely to hold the statement, best first
+    def rank_pages(self, statement_type: str = "balance_sheet") -> List[Tuple[int, float]]:
+        scores: Dict[int, float] = {}
+        for title in STATEMENT_TITLES.get(statement_type, ()):
+            for page in self.titles.get(_normalize(title), []):
+                scores[page] = TITLE_WEIGHT
+        for term in STATEMENT_TERMS.get(statement_type, ()):
+            for page in self.terms.get(_normalize(term), []):
+                scores[page] = scores.get(page, 0.0) + TERM_WEIGHT
+
+        ranked = [(page, score + NUMERIC_WEIGHT * self.numeric[page]) for page, score in scores.items()]
+        ranked = [(page, round(score, 3)) for page, score in ranked if score >= MIN_STATEMENT_SCORE]
+        return sorted(ranked, key=lambda item: (-item[1], item[0]))
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": PAGE_INDEX_VERSION,
+            "source_hash": self.source_hash,
+            "n_pages": self.n_pages,
+            "terms": self.terms,
+            "titles": self.titles,
+            "numeric": self.numeric,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PageIndex":
+        return cls(data["n_pages"], data["terms"], data["titles"], data["numeric"], data.get("source_hash"))
+
+def page_index_path(pdf_path: str) -> str:
+    return pdf_path + PAGE_INDEX_SUFFIX
+
+# reads the sidecar next to the pdf, or builds and writes it; a sidecar written for other pdf bytes, by an older
+# version or that cannot be read is rebuilt. pass source_hash when the caller has already hashed the pdf
+def load_or_build_page_index(pdf_path: str, source_hash: Optional[str] = None) -> PageIndex:
+    sidecar = page_index_path(pdf_path)
+    source_hash = source_hash or file_sha256(pdf_path)
+    try:
+        with open(sidecar, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == PAGE_INDEX_VERSION and data.get("source_hash") == source_hash:
+            incr("cache.page_index.hits")
+            return PageIndex.from_dict(data)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    incr("cache.page_index.misses")
+    with span("pdf.page_index_build"):
+        index = PageIndex.build(pdf_path, source_hash)
+    try:
+        tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp_path, sidecar)
+    except OSError as e:
+        # a read-only location only costs the rebuild next time
+        log.warning(f"Could not save page index for {pdf_path}: {e}")
+    return index
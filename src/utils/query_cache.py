@@ -0,0 +1,110 @@
+#src/utils/query_cache.py
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from src.utils.path_helpers import project_root
+from src.utils.telemetry import incr
+
+CACHE_DB_PATH = os.path.join(project_root(), "data", "cache", "query_cache.db")
+
+# lowercases, collapses whitespace and drops trailing punctuation so trivially different phrasings share a key
+def normalize_question(question: str) -> str:
+    normalized = " ".join(question.lower().split())
+    return re.sub(r"[\s\?\.!]+$", "", normalized)
+
+# collapses whitespace and drops the trailing semicolon; literals keep their case since SQLite compares them exactly
+def normalize_sql(query: str) -> str:
+    return " ".join(query.split()).rstrip(";").strip()
+
+def hash_parts(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+# SQLite-backed key/value cache with LRU + TTL eviction and hit/miss counters; one table shared by namespaces
+class PersistentCache:
+    def __init__(self, namespace: str, db_path: str = CACHE_DB_PATH, max_entries: int = 1000, ttl_seconds: float = 30 * 24 * 3600):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS cache_entries (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (namespace, key)
+        )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache_entries (namespace, last_used)")
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self.conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                    self.conn.commit()
+                self.misses += 1
+                incr(f"cache.{self.namespace}.misses")
+                return None
+
+            self.conn.execute(
+                "UPDATE cache_entries SET last_used = ?, hits = hits + 1 WHERE namespace = ? AND key = ?", (now, self.namespace, key)
+            )
+            self.conn.commit()
+            self.hits += 1
+            incr(f"cache.{self.namespace}.hits")
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO cache_entries (namespace, key, value, created_at, last_used) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value, created_at = excluded.created_at, last_used = excluded.last_used
+                """,
+                (self.namespace, key, value, now, now),
+            )
+            # evict expired entries, then the least recently used ones beyond max_entries
+            self.conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND created_at < ?", (self.namespace, now - self.ttl_seconds))
+            self.conn.execute(
+                """
+                DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                    SELECT key FROM cache_entries WHERE namespace = ? ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.namespace, self.namespace, self.max_entries),
+            )
+            self.conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
@@ -0,0 +1,90 @@
+#src/utils/result_compaction.py
+import os
+from collections import Counter
+from typing import List, Sequence
+
+from src.utils.telemetry import incr
+
+# the answer prompt carries at most about this many tokens of query results, however many rows came back
+RESULT_TOKEN_BUDGET = int(os.environ.get("ANSWER_RESULT_TOKEN_BUDGET", "2000"))
+# head and tail rows a summary starts from; halved until the summary fits the budget
+SUMMARY_EDGE_ROWS = 10
+# most common values listed per text column in a summary
+SUMMARY_TOP_VALUES = 5
+
+# rough count for the gpt-4o tokenizer, which averages about 4 characters per token on tables of names and numbers
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+# shortest faithful text for a cell: 119013.0 -> 119013, no thousands separators, NULL for missing
+def format_cell(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else str(round(value, 4))
+    return str(value)
+
+# one header line and one " | "-separated line per row; far fewer tokens than the repr of a list of tuples
+def render_table(columns: Sequence[str], rows: Sequence[tuple]) -> str:
+    lines = [" | ".join(columns)] if columns else []
+    lines.extend(" | ".join(format_cell(value) for value in row) for row in rows)
+    return "\n".join(lines)
+
+def _column_summary(name: str, values: List) -> str:
+    present = [value for value in values if value is not None]
+    if not present:
+        return f"{name}: NULL in every row"
+    missing = f", {len(values) - len(present)} NULL" if len(present) < len(values) else ""
+    if all(_is_number(value) for value in present):
+        total = sum(present)
+        return (f"{name}: min {format_cell(min(present))}, max {format_cell(max(present))}, "
+                f"mean {format_cell(round(total / len(present), 4))}, sum {format_cell(total)}{missing}")
+    counts = Counter(str(value) for value in present)
+    if len(counts) == 1:
+        return f"{name}: only {next(iter(counts))}{missing}"
+    text = f"{name}: {len(counts)} distinct, from {min(counts)} to {max(counts)}"
+    common = counts.most_common(SUMMARY_TOP_VALUES)
+    # a column of unique values (one row per company, say) has no most common ones worth the tokens
+    if common[0][1] > 1:
+        text += "; most common: " + ", ".join(f"{value} ({count})" for value, count in common)
+    return text + missing
+
+# per-column statistics over every fetched row, then as many head and tail rows as the budget allows
+def summarize_results(columns: Sequence[str], rows: Sequence[tuple], truncated: bool, token_budget: int) -> str:
+    columns = list(columns) or [f"column_{i + 1}" for i in range(len(rows[0]))]
+    header = f"{len(rows)} rows{' (cut off at the row cap; the query matched more)' if truncated else ''}, summarized:"
+    stats = "\n".join(f"- {_column_summary(name, [row[i] for row in rows])}" for i, name in enumerate(columns))
+
+    edge = SUMMARY_EDGE_ROWS
+    while True:
+        parts = [header, stats]
+        if edge:
+            parts.append(f"First {edge} rows:\n{render_table(columns, rows[:edge])}")
+            parts.append(f"... {len(rows) - 2 * edge} rows not shown ...")
+            parts.append(f"Last {edge} rows:\n{render_table(columns, rows[-edge:])}")
+        else:
+            parts.append(f"... all {len(rows)} rows not shown ...")
+        text = "\n".join(parts)
+        if edge == 0 or estimate_tokens(text) <= token_budget:
+            return text
+        edge //= 2
+
+# the results as the answer prompt should see them: the whole table when it fits the token budget, a summary otherwise
+def compact_results(columns: Sequence[str], rows: Sequence[tuple], truncated: bool = False,
+                    token_budget: int = RESULT_TOKEN_BUDGET) -> str:
+    if not rows:
+        return "(no rows)"
+    table = render_table(columns, rows)
+    if truncated:
+        table += "\n(cut off at the row cap; the query matched more rows)"
+    tokens = estimate_tokens(table)
+    # the summary only pays off once every row no longer fits; whole tables read more naturally
+    if tokens > token_budget and len(rows) > 2 * SUMMARY_EDGE_ROWS:
+        incr("answers.results_summarized")
+        table = summarize_results(columns, rows, truncated, token_budget)
+        tokens = estimate_tokens(table)
+    incr("answers.result_tokens", tokens)
+    return table
@@ -0,0 +1,138 @@
+#src/utils/sec_http.py
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+from src.utils.telemetry import incr, span
+
+# requests is imported when the first client is built
+if TYPE_CHECKING:
+    import requests
+
+log = logging.getLogger(__name__)
+
+SEC_USER_AGENT = "Justin Novick (justinnovick2@gmail.com)"
+
+# base URLs are overridable so the fetch layer can be pointed at a local stub server
+SEC_WWW_URL = os.environ.get("SEC_WWW_URL", "https://www.sec.gov").rstrip("/")
+SEC_DATA_URL = os.environ.get("SEC_DATA_URL", "https://data.sec.gov").rstrip("/")
+
+# SEC fair-access policy: at most 10 requests per second per client
+SEC_MAX_REQUESTS_PER_SECOND = 10
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# thread-safe token bucket; acquire() blocks until a request may be sent. capacity is the burst allowed after idling,
+# on top of rate per second: a full bucket of capacity rate lets through about 2 * rate requests in its first second
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+# one limiter for the whole process so concurrent clients share the SEC budget; without a burst even the first
+# second stays within SEC_MAX_REQUESTS_PER_SECOND
+SEC_RATE_LIMITER = TokenBucket(SEC_MAX_REQUESTS_PER_SECOND, capacity=1)
+
+# pooled requests session with rate limiting and retry/backoff on 429/5xx and connection errors
+class SecClient:
+    def __init__(
+        self,
+        limiter: Optional[TokenBucket] = None,
+        max_retries: int = 4,
+        backoff: float = 0.5,
+        pool_size: int = 10,
+        timeout: float = 30,
+        user_agent: str = SEC_USER_AGENT,
+    ):
+        self.limiter = limiter or SEC_RATE_LIMITER
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": user_agent, "Accept-Encoding": "gzip, deflate"})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _retry_delay(self, attempt: int, response: Optional["requests.Response"]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * (2 ** attempt)
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> "requests.Response":
+        import requests
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                with span("http.fetch"):
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                incr("http.retries")
+                log.warning(f"Request to {url} failed ({e}); retrying")
+                time.sleep(self._retry_delay(attempt, None))
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                delay = self._retry_delay(attempt, response)
+                incr("http.retries")
+                log.warning(f"Got {response.status_code} from {url}; retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            response.raise_for_status()
+            incr("http.bytes", len(response.content))
+            return response
+
+    # fetches many URLs concurrently; results keep the input order and failures come back as exceptions
+    def get_many(self, urls: List[str], max_workers: Optional[int] = None) -> List[Tuple[str, Union["requests.Response", Exception]]]:
+        def fetch(url: str) -> Tuple[str, Union["requests.Response", Exception]]:
+            try:
+                return url, self.get(url)
+            except Exception as e:
+                return url, e
+
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool_size) as pool:
+            return list(pool.map(fetch, urls))
+
+    def close(self) -> None:
+        self.session.close()
+
+_default_client: Optional[SecClient] = None
+_default_client_lock = threading.Lock()
+
+# process-wide client so every caller reuses the same connection pool
+def get_sec_client() -> SecClient:
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = SecClient()
+        return _default_client
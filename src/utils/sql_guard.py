@@ -0,0 +1,233 @@
+#src/utils/sql_guard.py
+import os
+import time
+import weakref
+import sqlite3
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from src.utils.telemetry import incr
+
+# wall-clock budget for one generated query, from planning to the last fetched row
+QUERY_TIME_BUDGET_SECONDS = float(os.environ.get("SQL_TIME_BUDGET_SECONDS", "5"))
+# rows fetched before a result is cut off and flagged as truncated
+MAX_RESULT_ROWS = int(os.environ.get("SQL_MAX_ROWS", "500"))
+# plans expected to visit more rows than this are rejected before they run
+MAX_PLAN_ROWS = int(os.environ.get("SQL_MAX_PLAN_ROWS", "5000000"))
+
+FETCH_BATCH_ROWS = 100
+# rows an index lookup is assumed to match; sqlite's own planner assumes about 10 per key without ANALYZE statistics
+SEARCH_ROWS_PER_KEY = 10
+# sqlite calls the progress handler every this many VM instructions, well under a millisecond of work
+PROGRESS_HANDLER_OPS = 10_000
+
+# reading tables and calling functions is all a generated query may do; writes, pragmas and attach are denied
+READ_ONLY_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+# plan estimates remembered per connection, so a repeated query skips EXPLAIN QUERY PLAN until someone writes
+PLAN_CACHE_SIZE = 256
+
+class QueryRejected(ValueError):
+    pass
+
+class QueryTimeout(QueryRejected):
+    pass
+
+class QueryResult(NamedTuple):
+    rows: list
+    truncated: bool
+    columns: tuple = ()
+
+# the connections the app opens; unlike sqlite3.Connection itself they can be weakly referenced, which lets the guard
+# keep its handlers and caches per connection for as long as the connection lives
+class GuardedConnection(sqlite3.Connection):
+    pass
+
+# ((data_version, total_changes), {table: rows})
+TableRows = Tuple[Tuple[int, int], Dict[str, int]]
+
+# per-connection guard: the handlers are installed once and only act while a guarded query runs, because
+# sqlite3_set_authorizer expires every prepared statement and a per-query install re-prepared each query
+class GuardState:
+    def __init__(self):
+        self.active = False
+        self.deadline = 0.0
+        self.tables_read: Optional[Set[str]] = None
+        self.table_rows: Optional[TableRows] = None
+        # query -> (stamp the estimate was made at, estimate, stored tables the query reads)
+        self.plans: "OrderedDict[str, Tuple[Tuple[int, int], int, FrozenSet[str]]]" = OrderedDict()
+
+    def authorize(self, action, arg1, arg2, db_name, source):
+        if not self.active:
+            return sqlite3.SQLITE_OK
+        if action not in READ_ONLY_ACTIONS:
+            return sqlite3.SQLITE_DENY
+        if action == sqlite3.SQLITE_READ and self.tables_read is not None:
+            self.tables_read.add(arg1)
+        return sqlite3.SQLITE_OK
+
+    def interrupt(self) -> bool:
+        return self.active and time.perf_counter() > self.deadline
+
+    def install(self, conn: sqlite3.Connection) -> None:
+        conn.set_authorizer(self.authorize)
+        conn.set_progress_handler(self.interrupt, PROGRESS_HANDLER_OPS)
+
+_guard_states: "weakref.WeakKeyDictionary[sqlite3.Connection, GuardState]" = weakref.WeakKeyDictionary()
+
+# the connection's installed guard, or None for a plain sqlite3.Connection, which gets a fresh one per query
+def guard_state(conn: sqlite3.Connection) -> Optional[GuardState]:
+    try:
+        state = _guard_states.get(conn)
+    except TypeError:
+        return None
+    if state is None:
+        state = _guard_states[conn] = GuardState()
+        state.install(conn)
+    return state
+
+# read-only authorizer and time budget on conn for the duration of one query; the handlers are per connection,
+# so concurrent queries on pooled connections each get their own budget
+@contextmanager
+def guarded(conn: sqlite3.Connection, time_budget: float, tables_read: Optional[Set[str]] = None) -> Iterator[None]:
+    state = guard_state(conn)
+    persistent = state is not None
+    if not persistent:
+        state = GuardState()
+        state.install(conn)
+    state.deadline = time.perf_counter() + time_budget
+    state.tables_read = tables_read
+    state.active = True
+    try:
+        yield
+    finally:
+        state.active = False
+        state.tables_read = None
+        if not persistent:
+            conn.set_progress_handler(None, 0)
+            conn.set_authorizer(None)
+
+# upper bound on a stored table's row count; max(rowid) is an index seek, count(*) the fallback for WITHOUT ROWID tables
+def estimate_table_rows(conn: sqlite3.Connection, table: str) -> int:
+    quoted = '"' + table.replace('"', '""') + '"'
+    try:
+        return conn.execute(f"SELECT max(rowid) FROM {quoted}").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return conn.execute(f"SELECT count(*) FROM {quoted}").fetchone()[0]
+
+# sizes of the stored tables, looked up again only after someone writes; returns them with the stamp they are valid for
+def stored_table_rows(conn: sqlite3.Connection, state: Optional[GuardState] = None) -> TableRows:
+    stamp = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+    cached = state.table_rows if state is not None else None
+    if cached is None or cached[0] != stamp:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        cached = (stamp, {table: estimate_table_rows(conn, table) for table in tables})
+        if state is not None:
+            state.table_rows = cached
+    return cached
+
+def _is_full_scan(detail: str) -> bool:
+    # a SEARCH with no (column=?) constraint walks the whole index
+    return (detail.startswith("SCAN ") and detail != "SCAN CONSTANT ROW") or (detail.startswith("SEARCH ") and "(" not in detail)
+
+def _loop_rows(detail: str, table_rows: Dict[str, int]) -> int:
+    if _is_full_scan(detail):
+        name = detail.split()[1]
+        # plans name a table by its alias, and CTEs or subqueries by their own name; assume the largest table read
+        return table_rows.get(name, max(table_rows.values(), default=0))
+    if "(rowid=?)" in detail or "sqlite_autoindex" in detail or detail == "SCAN CONSTANT ROW":
+        return 1
+    return SEARCH_ROWS_PER_KEY
+
+# rough count of rows the plan visits: sibling loops nest, so their sizes multiply, and a correlated
+# subquery runs once per row of the loops around it; a full scan (SCAN) counts the whole table, a unique lookup one row
+def estimate_plan_rows(plan: List[tuple], table_rows: Dict[str, int]) -> int:
+    children: Dict[int, List[tuple]] = {}
+    for node_id, parent, _, detail in plan:
+        children.setdefault(parent, []).append((node_id, detail))
+
+    def visit(parent: int, outer: int) -> int:
+        total = 0
+        loops = 1
+        for node_id, detail in children.get(parent, []):
+            if detail.startswith(("SCAN ", "SEARCH ")):
+                loops *= max(_loop_rows(detail, table_rows), 1)
+                total += outer * loops
+                if "AUTOMATIC" in detail:
+                    # the transient index is built from one pass over its table
+                    total += max(table_rows.values(), default=0)
+            elif detail.startswith("CORRELATED"):
+                total += visit(node_id, outer * loops)
+            else:
+                total += visit(node_id, outer)
+        return total
+
+    return visit(0, 1)
+
+# checks EXPLAIN QUERY PLAN before running anything; unindexed scans that nest or cover a huge table are refused.
+# runs inside guarded(), whose authorizer fills tables_read with what the plan reads (views and CTEs included,
+# which is why only the stored tables' sizes are kept). the estimate is remembered on the connection until the next write
+def check_query_plan(conn: sqlite3.Connection, query: str, tables_read: Set[str], table_rows: TableRows, max_plan_rows: int,
+                     state: Optional[GuardState] = None) -> int:
+    stamp, sizes = table_rows
+    cached = state.plans.get(query) if state is not None else None
+    if cached is not None and cached[0] == stamp:
+        state.plans.move_to_end(query)
+        incr("sql.plan_cache_hits")
+        _, estimate, tables = cached
+        # the authorizer only fires when a statement is prepared, so a statement sqlite still had cached reads nothing
+        tables_read.update(tables)
+        if estimate > max_plan_rows:
+            incr("sql.rejected")
+            raise QueryRejected(f"Query would visit about {estimate:,} rows (limit {max_plan_rows:,}) through full scans. Add a filter on company or label.")
+        return estimate
+
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    # an EXPLAIN statement already in sqlite's cache was not authorized again; fall back to every stored table
+    tables = frozenset(table for table in (tables_read or sizes) if table in sizes)
+    estimate = estimate_plan_rows(plan, {table: sizes[table] for table in tables})
+    if state is not None:
+        state.plans[query] = (stamp, estimate, tables)
+        if len(state.plans) > PLAN_CACHE_SIZE:
+            state.plans.popitem(last=False)
+    if estimate > max_plan_rows:
+        incr("sql.rejected")
+        scans = [detail for _, _, _, detail in plan if _is_full_scan(detail)]
+        raise QueryRejected(f"Query would visit about {estimate:,} rows (limit {max_plan_rows:,}) through full scans ({'; '.join(scans)}). Add a filter on company or label.")
+    return estimate
+
+# plan check, then the query under the authorizer and time budget, fetched in batches up to max_rows
+def run_guarded_query(conn: sqlite3.Connection, query: str, time_budget: float = QUERY_TIME_BUDGET_SECONDS,
+                      max_rows: int = MAX_RESULT_ROWS, max_plan_rows: int = MAX_PLAN_ROWS) -> QueryResult:
+    state = guard_state(conn)
+    table_rows = stored_table_rows(conn, state)
+    tables_read: Set[str] = set()
+    rows: list = []
+    try:
+        with guarded(conn, time_budget, tables_read):
+            check_query_plan(conn, query, tables_read, table_rows, max_plan_rows, state)
+            cursor = conn.execute(query)
+            columns = tuple(description[0] for description in cursor.description or ())
+            try:
+                # one extra row tells a result that is exactly max_rows long from a truncated one
+                while len(rows) <= max_rows:
+                    batch = cursor.fetchmany(min(FETCH_BATCH_ROWS, max_rows + 1 - len(rows)))
+                    if not batch:
+                        break
+                    rows.extend(batch)
+            finally:
+                cursor.close()
+    except sqlite3.DatabaseError as e:
+        if "interrupted" in str(e):
+            incr("sql.timeouts")
+            raise QueryTimeout(f"Query exceeded its {time_budget:g}s time budget and was stopped.") from e
+        if "not authorized" in str(e):
+            incr("sql.rejected")
+            raise QueryRejected(f"Query tried something other than reading data: {e}") from e
+        raise
+
+    truncated = len(rows) > max_rows
+    if truncated:
+        incr("sql.truncated")
+        del rows[max_rows:]
+    return QueryResult(rows, truncated, columns)
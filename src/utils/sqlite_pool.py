@@ -0,0 +1,35 @@
+#src/utils/sqlite_pool.py
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional, TypeVar
+
+from src.scripts.connect_or_create_sql_db import connect_read_only
+
+T = TypeVar("T")
+
+# fixed set of read-only connections handed out to one request at a time; the blocking sqlite
+# work itself runs on a worker thread so the event loop keeps serving other requests
+class ReadOnlyConnectionPool:
+    def __init__(self, db_path: Optional[str] = None, size: int = 8):
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(connect_read_only(db_path))
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[sqlite3.Connection]:
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    # runs fn(conn, *args) on a pooled connection in a worker thread
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        async with self.connection() as conn:
+            return await asyncio.to_thread(fn, conn, *args)
+
+    def close(self) -> None:
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
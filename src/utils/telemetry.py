@@ -0,0 +1,166 @@
+#src/utils/telemetry.py
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, Dict, Iterator, Optional, TextIO
+
+# span events go to this logger at DEBUG, so they cost nothing unless someone asks for them
+SPAN_LOGGER = logging.getLogger("telemetry")
+
+# attributes every LogRecord has; anything else on a record came in through extra= and belongs in the json line
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# process-wide span timings and counters; recording is a lock plus a few dict updates, cheap enough to leave on
+class Telemetry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = time.time()
+            # name -> [count, total seconds, max seconds, errors]
+            self._spans: Dict[str, list] = {}
+            self._counters: Dict[str, float] = {}
+
+    def record_span(self, name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] += int(error)
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    # plain-dict copy that can cross a process boundary and be merged back in
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"spans": {name: list(stats) for name, stats in self._spans.items()}, "counters": dict(self._counters)}
+
+    def merge(self, snapshot: Dict) -> None:
+        with self._lock:
+            for name, (count, total, longest, errors) in snapshot.get("spans", {}).items():
+                stats = self._spans.setdefault(name, [0, 0.0, 0.0, 0])
+                stats[0] += count
+                stats[1] += total
+                stats[2] = max(stats[2], longest)
+                stats[3] += errors
+            for name, value in snapshot.get("counters", {}).items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    # per-run report: spans sorted by total time, then every counter
+    def report(self) -> Dict:
+        snapshot = self.snapshot()
+        spans = {
+            name: {
+                "count": count,
+                "total_seconds": round(total, 6),
+                "mean_seconds": round(total / count, 6) if count else 0.0,
+                "max_seconds": round(longest, 6),
+                "errors": errors,
+            }
+            for name, (count, total, longest, errors) in sorted(snapshot["spans"].items(), key=lambda item: -item[1][1])
+        }
+        return {
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec="seconds"),
+            "elapsed_seconds": round(time.time() - self.started_at, 3),
+            "spans": spans,
+            "counters": dict(sorted(snapshot["counters"].items())),
+        }
+
+TELEMETRY = Telemetry()
+
+# times a pipeline stage; the duration is aggregated under name and, with DEBUG enabled, logged with the given fields
+@contextmanager
+def span(name: str, **fields) -> Iterator[None]:
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        # GeneratorExit from a consumer that stopped reading a stream early is not an error
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        TELEMETRY.record_span(name, elapsed, error)
+        if SPAN_LOGGER.isEnabledFor(logging.DEBUG):
+            SPAN_LOGGER.debug(
+                "%s took %.1f ms", name, elapsed * 1000,
+                extra={"span": name, "duration_ms": round(elapsed * 1000, 3), "error": error, **fields},
+            )
+
+# decorator form of span for functions that are one stage end to end
+def traced(name: str) -> Callable:
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def incr(name: str, value: float = 1) -> None:
+    TELEMETRY.incr(name, value)
+
+# runs fn and returns (result, the telemetry it recorded); worker processes hand this back so the parent can merge it
+def collect(fn: Callable, *args, **kwargs):
+    TELEMETRY.reset()
+    result = fn(*args, **kwargs)
+    return result, TELEMETRY.snapshot()
+
+def merge(snapshot: Optional[Dict]) -> None:
+    if snapshot:
+        TELEMETRY.merge(snapshot)
+
+def report() -> Dict:
+    return TELEMETRY.report()
+
+def write_report(path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report(), f, indent=2)
+
+# human-readable table of the report for the end of a run
+def format_report(data: Optional[Dict] = None) -> str:
+    data = data or report()
+    lines = [f"{'stage':<28}{'count':>7}{'total (s)':>11}{'mean (ms)':>11}{'max (ms)':>10}"]
+    for name, stats in data["spans"].items():
+        lines.append(f"{name:<28}{stats['count']:>7}{stats['total_seconds']:>11.3f}{stats['mean_seconds'] * 1000:>11.1f}{stats['max_seconds'] * 1000:>10.1f}")
+    lines.extend(f"{name:<28}{value:>7g}" for name, value in data["counters"].items())
+    return "\n".join(lines)
+
+# one json object per line: timestamp, level, logger, message and any structured fields passed through extra=
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+# entry points call this once; plain messages keep the console looking like the old prints, json_logs is for log shippers
+def configure_logging(level: str = "INFO", json_logs: bool = False, stream: Optional[TextIO] = None) -> None:
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if json_logs else logging.Formatter("%(message)s"))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    # the OpenAI and SEC clients' per-request INFO lines would drown out the pipeline's own
+    logging.getLogger("httpx").setLevel(logging.WARNING)
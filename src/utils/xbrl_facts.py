@@ -0,0 +1,143 @@
+#src/utils/xbrl_facts.py
+import logging
+import os
+import re
+import zipfile
+import orjson
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.utils.telemetry import traced
+
+log = logging.getLogger(__name__)
+
+# us-gaap balance sheet concept -> (section, label) in the same vocabulary the pdf tables use
+BALANCE_SHEET_CONCEPTS = {
+    "CashAndCashEquivalentsAtCarryingValue": ("Current assets", "Cash and cash equivalents"),
+    "MarketableSecuritiesCurrent": ("Current assets", "Marketable securities"),
+    "ShortTermInvestments": ("Current assets", "Short-term investments"),
+    "AccountsReceivableNetCurrent": ("Current assets", "Accounts receivable, net"),
+    "InventoryNet": ("Current assets", "Inventory"),
+    "PrepaidExpenseAndOtherAssetsCurrent": ("Current assets", "Prepaid expenses and other current assets"),
+    "OtherAssetsCurrent": ("Current assets", "Other current assets"),
+    "AssetsCurrent": ("Current assets", "Total current assets"),
+    "MarketableSecuritiesNoncurrent": ("Non-current assets", "Non-current marketable securities"),
+    "PropertyPlantAndEquipmentNet": ("Non-current assets", "Property and equipment, net"),
+    "OperatingLeaseRightOfUseAsset": ("Non-current assets", "Operating lease assets"),
+    "Goodwill": ("Non-current assets", "Goodwill"),
+    "IntangibleAssetsNetExcludingGoodwill": ("Non-current assets", "Intangible assets, net"),
+    "DeferredIncomeTaxAssetsNet": ("Non-current assets", "Deferred income taxes"),
+    "OtherAssetsNoncurrent": ("Non-current assets", "Other non-current assets"),
+    "Assets": ("Non-current assets", "Total assets"),
+    "AccountsPayableCurrent": ("Current liabilities", "Accounts payable"),
+    "EmployeeRelatedLiabilitiesCurrent": ("Current liabilities", "Accrued compensation and benefits"),
+    "AccruedLiabilitiesCurrent": ("Current liabilities", "Accrued expenses and other current liabilities"),
+    "ContractWithCustomerLiabilityCurrent": ("Current liabilities", "Deferred revenue"),
+    "CommercialPaper": ("Current liabilities", "Commercial paper"),
+    "LongTermDebtCurrent": ("Current liabilities", "Current portion of long-term debt"),
+    "OtherLiabilitiesCurrent": ("Current liabilities", "Other current liabilities"),
+    "LiabilitiesCurrent": ("Current liabilities", "Total current liabilities"),
+    "LongTermDebtNoncurrent": ("Non-current liabilities", "Long-term debt"),
+    "ContractWithCustomerLiabilityNoncurrent": ("Non-current liabilities", "Deferred revenue, non-current"),
+    "OperatingLeaseLiabilityNoncurrent": ("Non-current liabilities", "Operating lease liabilities"),
+    "AccruedIncomeTaxesNoncurrent": ("Non-current liabilities", "Income taxes payable, non-current"),
+    "OtherLiabilitiesNoncurrent": ("Non-current liabilities", "Other long-term liabilities"),
+    "Liabilities": ("Non-current liabilities", "Total liabilities"),
+    "CommonStocksIncludingAdditionalPaidInCapital": ("Stockholders’ equity", "Common stock and additional paid-in capital"),
+    "CommonStockValue": ("Stockholders’ equity", "Common stock"),
+    "AdditionalPaidInCapital": ("Stockholders’ equity", "Additional paid-in capital"),
+    "AccumulatedOtherComprehensiveIncomeLossNetOfTax": ("Stockholders’ equity", "Accumulated other comprehensive income (loss)"),
+    "RetainedEarningsAccumulatedDeficit": ("Stockholders’ equity", "Retained earnings"),
+    "StockholdersEquity": ("Stockholders’ equity", "Total stockholders’ equity"),
+    "LiabilitiesAndStockholdersEquity": ("Stockholders’ equity", "Total liabilities and stockholders’ equity"),
+}
+
+# the pdf tables are reported in millions of USD
+VALUE_SCALE = 1_000_000
+
+CIK_MEMBER = re.compile(r"CIK(\d{10})\.json$")
+
+# turns one companyfacts document into the long balance sheet format normalize_balance_sheet emits,
+# keeping each 10-K's own period-end column (the "current_year" column of the pdf path); a company has a
+# few thousand relevant facts at most, so plain dict passes beat building and grouping a frame per company
+@traced("normalize.xbrl")
+def companyfacts_to_balance_sheet(data: Dict, company: str, statement_type: str = "balance_sheet", min_year: Optional[int] = None) -> pd.DataFrame:
+    us_gaap = data.get("facts", {}).get("us-gaap", {})
+    facts: List[Tuple[str, Dict]] = []
+    period_end: Dict[str, str] = {}
+    for concept in sorted(BALANCE_SHEET_CONCEPTS.keys() & us_gaap.keys()):
+        for fact in us_gaap[concept].get("units", {}).get("USD", []):
+            if fact.get("form") == "10-K" and "start" not in fact:
+                facts.append((concept, fact))
+                # a 10-K also repeats the prior year's balances; its own period end is the latest instant it reports
+                if fact["end"] > period_end.get(fact["accn"], ""):
+                    period_end[fact["accn"]] = fact["end"]
+
+    # restated periods keep the most recently filed value
+    latest: Dict[Tuple[str, str], Dict] = {}
+    for concept, fact in facts:
+        key = (concept, fact["end"])
+        if fact["end"] == period_end[fact["accn"]] and fact.get("filed", "") >= latest.get(key, {}).get("filed", ""):
+            latest[key] = fact
+
+    rows = []
+    for (concept, end), fact in latest.items():
+        year = int(end[:4])
+        if min_year is None or year >= min_year:
+            section, label = BALANCE_SHEET_CONCEPTS[concept]
+            rows.append((end, company, statement_type, section, label, year, fact["val"] / VALUE_SCALE))
+    if not rows:
+        return pd.DataFrame()
+
+    df = pd.DataFrame.from_records(rows, columns=["as_of_date", "company", "statement_type", "section", "label", "year", "value"])
+    return df.sort_values(["as_of_date", "section", "label"]).reset_index(drop=True)
+
+def cik_from_member(name: str) -> Optional[str]:
+    match = CIK_MEMBER.search(name)
+    return match.group(1) if match else None
+
+# member names of a companyfacts bulk zip, optionally limited to a set of zero-padded CIKs
+def list_companyfacts_members(zip_path: str, ciks: Optional[Sequence[str]] = None) -> List[str]:
+    wanted = set(ciks) if ciks is not None else None
+    with zipfile.ZipFile(zip_path) as archive:
+        names = [name for name in archive.namelist() if cik_from_member(name)]
+    return [name for name in names if wanted is None or cik_from_member(name) in wanted]
+
+# streams (cik, companyfacts) out of the bulk zip one member at a time; nothing is extracted to disk, and a member
+# that can't be read yields (cik, None) instead of ending the stream
+def iter_companyfacts_zip(zip_path: str, members: Optional[Sequence[str]] = None) -> Iterator[Tuple[str, Optional[Dict]]]:
+    with zipfile.ZipFile(zip_path) as archive:
+        for name in members if members is not None else archive.namelist():
+            cik = cik_from_member(name)
+            if cik is None:
+                continue
+            try:
+                with archive.open(name) as member:
+                    data = orjson.loads(member.read())
+            except Exception as e:
+                log.warning(f"Could not read {name}: {e}")
+                data = None
+            yield cik, data
+
+def read_companyfacts_json(path: str) -> Tuple[str, Dict]:
+    with open(path, "rb") as f:
+        data = orjson.loads(f.read())
+    return str(data.get("cik", "")).zfill(10), data
+
+# maps the bulk zip to (cik, long-format frame) one company at a time; (cik, None) marks a company that failed
+def iter_companyfacts_frames(zip_path: str, members: Sequence[str], companies: Dict[str, str], min_year: Optional[int] = None) -> Iterator[Tuple[str, Optional[pd.DataFrame]]]:
+    for cik, data in iter_companyfacts_zip(zip_path, members):
+        df = None
+        if data is not None:
+            try:
+                df = companyfacts_to_balance_sheet(data, companies.get(cik) or f"CIK{cik}", min_year=min_year)
+            except Exception as e:
+                log.warning(f"CIK{cik}: companyfacts failed: {e}")
+        yield cik, df
+
+# worker entry point: the frames of one slice of a bulk zip, keyed by CIK (None for members that failed)
+def companyfacts_zip_to_frames(zip_path: str, members: Sequence[str], companies: Dict[str, str], min_year: Optional[int] = None) -> List[Tuple[str, Optional[pd.DataFrame]]]:
+    return list(iter_companyfacts_frames(zip_path, members, companies, min_year))
+
+def is_companyfacts_zip(path: str) -> bool:
+    return os.path.isfile(path) and zipfile.is_zipfile(path)
@@ -1,3 +1,156 @@
-#To Do:
-#implement a RAG system for the vector database
-#provide qualitative answers based on 10ks and other follow ups
\ No newline at end of file
+#src/vector_RAG.py
+import logging
+import re
+import zlib
+import argparse
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.scripts.connect_or_create_document_db import DocumentStore, connect_or_create_doc_store
+from src.scripts.connect_or_create_vector_db import VECTOR_DB_DIR, VectorStore, connect_or_create_vector_db
+from src.utils.extract_and_normalize import PdfDocument
+from src.utils.telemetry import configure_logging, span
+
+log = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['.][a-z0-9]+)*")
+
+# offline embedder: signed feature hashing of word unigrams and bigrams with log term frequency;
+# deterministic across processes (crc32, not the salted builtin hash), so stored vectors stay valid
+class HashingEmbedder:
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = "hashing"
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not features:
+            return np.zeros(self.dim, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features), dtype=np.uint32, count=len(features))
+        signs = np.where(hashes >> 31, -1.0, 1.0)
+        counts = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+        return (np.sign(counts) * np.log1p(np.abs(counts))).astype(np.float32)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.stack([self._embed_one(text) for text in texts]) if texts else np.empty((0, self.dim), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+# any sentence-transformers model that is already downloaded; the package is optional and only needed for this embedder
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"sentence-transformers:{model_name}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+# embedders only need name, dim and embed(texts) -> L2-normalized float32 rows; register new ones here
+EMBEDDERS = {
+    "hashing": HashingEmbedder,
+    "sentence-transformers": SentenceTransformerEmbedder,
+}
+
+def get_embedder(name: str = "hashing", **kwargs):
+    return EMBEDDERS[name](**kwargs)
+
+def open_vector_store(embedder, path: str = VECTOR_DB_DIR) -> VectorStore:
+    return connect_or_create_vector_db(path, embedder.dim, embedder.name)
+
+# splits text into overlapping windows of words so a passage cut at a boundary still appears whole in one chunk
+def chunk_text(text: str, max_words: int = 200, overlap: int = 40) -> List[str]:
+    words = text.split()
+    step = max_words - overlap
+    return [" ".join(words[start:start + max_words]) for start in range(0, max(len(words) - overlap, 1), step) if words[start:start + max_words]]
+
+# (page, text) for a stored filing: pdf pages through pdfplumber when the pdf exists, else the html text as one page
+def filing_pages(doc_store: DocumentStore, accession: str) -> Iterator[Tuple[Optional[int], str]]:
+    pdf_path = doc_store.document_path(accession, "pdf")
+    if pdf_path:
+        with PdfDocument(pdf_path) as doc:
+            for page_index in range(len(doc)):
+                yield page_index, doc.page_text(page_index) or ""
+        return
+
+    html_path = doc_store.document_path(accession, "html")
+    if html_path:
+        from lxml import html as lxml_html
+        yield None, lxml_html.parse(html_path).getroot().text_content()
+
+def filing_chunks(doc_store: DocumentStore, accession: str) -> List[Tuple[Optional[int], str]]:
+    return [(page, chunk) for page, text in filing_pages(doc_store, accession) for chunk in chunk_text(text)]
+
+# embeds only filings that are not in the vector store yet; returns the number of chunks added
+def index_filings(doc_store: DocumentStore, vector_store: VectorStore, embedder, ticker: Optional[str] = None, batch_size: int = 256) -> int:
+    added = 0
+    for entry in doc_store.filings(ticker):
+        accession = entry["accession"]
+        if vector_store.has_document(accession):
+            continue
+        try:
+            chunks = filing_chunks(doc_store, accession)
+        except Exception as e:
+            log.warning(f"Could not read {accession} for the vector index: {e}")
+            continue
+
+        texts = [text for _, text in chunks]
+        vectors = np.concatenate([embedder.embed(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]) if texts else np.empty((0, embedder.dim), dtype=np.float32)
+        vector_store.add_document(accession, entry["ticker"], chunks, vectors)
+        added += len(chunks)
+        log.info(f"Embedded {len(chunks)} chunks from {entry['filename'] or accession}.")
+
+    vector_store.maybe_build_cluster_index()
+    return added
+
+# top-k chunks for each question, embedded and searched as one batch
+def retrieve(questions: Sequence[str], vector_store: VectorStore, embedder, k: int = 5) -> List[List[Dict]]:
+    with span("rag.retrieve"):
+        hits = vector_store.search(embedder.embed(list(questions)), k)
+    chunks = vector_store.get_chunks(sorted({chunk_id for row in hits for chunk_id, _ in row}))
+    return [[{**chunks[chunk_id], "score": score} for chunk_id, score in row if chunk_id in chunks] for row in hits]
+
+def build_rag_messages(question: str, passages: List[Dict]) -> List[dict]:
+    context = "\n\n".join(
+        f"[{i + 1}] {p['ticker']} {p['accession']} page {p['page'] if p['page'] is not None else '?'}:\n{p['text']}"
+        for i, p in enumerate(passages)
+    )
+    return [
+        {
+            "role": "system",
+            "content": "You answer questions about companies using only the 10-K excerpts provided. Cite excerpts by their [number]. If the excerpts do not contain the answer, say so."
+        },
+        {"role": "user", "content": f"Excerpts:\n{context}\n\nQuestion: {question}"}
+    ]
+
+# qualitative answer grounded in retrieved filing text, streamed like the SQL answers
+def answer_question_from_filings(question: str, vector_store: VectorStore, embedder, k: int = 5) -> Iterator[str]:
+    from src.sql_interface import stream_llm_answer
+
+    passages = retrieve([question], vector_store, embedder, k)[0]
+    if not passages:
+        yield "No filing text has been indexed yet."
+        return
+    yield from stream_llm_answer(build_rag_messages(question, passages))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ask qualitative questions about stored 10-K filings")
+    parser.add_argument("questions", nargs="+", help="Questions to answer")
+    parser.add_argument("--ticker", type=str, default=None, help="Only index filings of this ticker")
+    parser.add_argument("--k", type=int, default=5, help="Passages retrieved per question")
+    parser.add_argument("--embedder", choices=sorted(EMBEDDERS), default="hashing", help="Embedding function")
+    args = parser.parse_args()
+
+    configure_logging()
+    embedder = get_embedder(args.embedder)
+    doc_store = connect_or_create_doc_store()
+    vector_store = open_vector_store(embedder)
+    index_filings(doc_store, vector_store, embedder, args.ticker)
+    for question in args.questions:
+        print(f"\nQ: {question}\nA: ", end="", flush=True)
+        for chunk in answer_question_from_filings(question, vector_store, embedder, args.k):
+            print(chunk, end="", flush=True)
+        print()
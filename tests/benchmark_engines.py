@@ -0,0 +1,96 @@
+# tests/benchmark_engines.py
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# a warm page cache would turn the pdf timings into a json read, so it stays off here
+os.environ["PAGE_CACHE"] = "0"
+
+from src.utils.extract_and_normalize import as_of_date_from_filename, fetch_10k_documents, get_10k_filings, parse_and_normalize_filing
+from src.utils.path_helpers import project_root
+
+
+# downloads the 10-K html of every pdf fixture that has none yet, so a fresh checkout can compare the engines;
+# the files are kept in html_dir and later runs reuse them. returns how many were fetched
+def fetch_missing_html(pdf_dir: str, html_dir: str, ticker: str) -> int:
+    pdf_names = {os.path.splitext(f)[0] for f in os.listdir(pdf_dir) if f.endswith(".pdf")} if os.path.isdir(pdf_dir) else set()
+    html_names = {os.path.splitext(f)[0] for f in os.listdir(html_dir) if f.endswith(".htm")} if os.path.isdir(html_dir) else set()
+    # fixture names end in the period they report on, e.g. goog-20241231
+    missing = {as_of_date_from_filename(name): name for name in pdf_names - html_names if as_of_date_from_filename(name)}
+    if not missing:
+        return 0
+
+    years_back = datetime.now().year - min(int(date[:4]) for date in missing) + 1
+    by_index_url = {filing["index_url"]: missing[filing["report_date"]] for filing in get_10k_filings(ticker, years_back) if filing["report_date"] in missing}
+    os.makedirs(html_dir, exist_ok=True)
+    fetched = 0
+    for index_url, _, html in fetch_10k_documents(list(by_index_url)):
+        path = os.path.join(html_dir, f"{by_index_url[index_url]}.htm")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(f"{path}.tmp", path)
+        fetched += 1
+    return fetched
+
+# pairs up saved filings by name, e.g. data/pdfs/goog-20241231.pdf with data/cache/html/goog-20241231.htm
+def find_fixture_pairs(pdf_dir: str, html_dir: str) -> List[Tuple[str, str]]:
+    pdfs = {os.path.splitext(f)[0]: os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir) if f.endswith(".pdf")} if os.path.isdir(pdf_dir) else {}
+    htmls = {os.path.splitext(f)[0]: os.path.join(html_dir, f) for f in os.listdir(html_dir) if f.endswith(".htm")} if os.path.isdir(html_dir) else {}
+    return [(pdfs[name], htmls[name]) for name in sorted(pdfs.keys() & htmls.keys())]
+
+# best-of-n wall time for one engine on one file, plus the rows it produced
+def time_engine(path: str, ticker: str, engine: str, repeats: int) -> Tuple[float, int]:
+    best = float("inf")
+    rows = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        df = parse_and_normalize_filing(path, ticker, engine=engine).df
+        best = min(best, time.perf_counter() - start)
+        rows = 0 if df is None else len(df)
+    return best, rows
+
+def run_benchmark(pdf_dir: str, html_dir: str, ticker: str, repeats: int) -> List[Dict]:
+    results = []
+    for pdf_path, html_path in find_fixture_pairs(pdf_dir, html_dir):
+        pdf_time, pdf_rows = time_engine(pdf_path, ticker, "pdf", repeats)
+        html_time, html_rows = time_engine(html_path, ticker, "html", repeats)
+        results.append({
+            "filing": os.path.basename(html_path),
+            "pdf_seconds": pdf_time,
+            "pdf_rows": pdf_rows,
+            "html_seconds": html_time,
+            "html_rows": html_rows,
+        })
+    return results
+
+
+
+if __name__ == "__main__":
+    # compares the pdf and html extraction engines on saved fixtures
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf_dir", default=os.path.join(project_root(), "data", "pdfs"))
+    parser.add_argument("--html_dir", default=os.path.join(project_root(), "data", "cache", "html"), help="Saved 10-K html; missing filings are downloaded into it once")
+    parser.add_argument("--ticker", default="GOOG")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        fetched = fetch_missing_html(args.pdf_dir, args.html_dir, args.ticker.upper())
+        if fetched:
+            print(f" Downloaded {fetched} html fixtures into {args.html_dir}")
+    except Exception as e:
+        print(f" Could not download the missing html fixtures: {e}")
+
+    results = run_benchmark(args.pdf_dir, args.html_dir, args.ticker.upper(), args.repeats)
+    if not results:
+        print(f" No matching .pdf/.htm fixture pairs found in {args.pdf_dir} and {args.html_dir}")
+        sys.exit(1)
+
+    print(f"\n{'filing':<28}{'pdf (s)':>10}{'rows':>6}{'html (s)':>10}{'rows':>6}{'speedup':>9}")
+    for r in results:
+        speedup = r["pdf_seconds"] / r["html_seconds"] if r["html_seconds"] else float("inf")
+        print(f"{r['filing']:<28}{r['pdf_seconds']:>10.3f}{r['pdf_rows']:>6}{r['html_seconds']:>10.3f}{r['html_rows']:>6}{speedup:>8.1f}x")
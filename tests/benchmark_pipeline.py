@@ -0,0 +1,369 @@
+# tests/benchmark_pipeline.py
+import io
+import os
+import sys
+import json
+import time
+import types
+import random
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import statistics
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# the pdf stages time the layout itself, so the shared page cache stays off; pdf.page_cache_hit passes its own
+os.environ["PAGE_CACHE"] = "0"
+
+from src import sql_interface
+from src.scripts.connect_or_create_sql_db import connect_or_create_sql_db
+from src.utils import extract_and_normalize
+from src.utils.columnar_export import export_balance_sheet
+from src.utils.page_cache import PageCache
+from src.utils.page_index import PageIndex
+from src.utils.path_helpers import project_root
+from src.utils.query_cache import PersistentCache
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(TESTS_DIR, "benchmark_baseline.json")
+RESULTS_PATH = os.path.join(TESTS_DIR, "benchmark_results.json")
+
+# a stage is flagged when its median is this much slower than the baseline's
+REGRESSION_THRESHOLD = 0.25
+# medians this small are mostly timer and scheduler noise, so they are never flagged
+NOISE_FLOOR_SECONDS = 0.005
+
+# (name, sql) shaped like what the few-shot prompt makes the model write; SYN0001 always exists in the scaled db
+QUERY_WORKLOADS = [
+    ("point_lookup", "SELECT value FROM balance_sheet WHERE company = 'SYN0001' AND label = 'Retained earnings' AND as_of_date LIKE '2021%'"),
+    ("company_history", "SELECT as_of_date, value FROM balance_sheet WHERE company = 'SYN0001' AND label = 'Total liabilities' ORDER BY as_of_date"),
+    ("cross_company_filter", "SELECT DISTINCT company FROM balance_sheet WHERE label = 'Total liabilities' AND CAST(substr(as_of_date, 1, 4) AS INTEGER) = 2024 AND value > 100000"),
+    ("label_average", "SELECT AVG(value) FROM balance_sheet WHERE label = 'Total liabilities' AND CAST(substr(as_of_date, 1, 4) AS INTEGER) >= CAST(strftime('%Y', 'now', '-5 years') AS INTEGER)"),
+    ("top_n", "SELECT company, value FROM balance_sheet WHERE label = 'Total current assets' AND year = 2023 ORDER BY value DESC LIMIT 10"),
+    ("label_like_scan", "SELECT company, label, value FROM balance_sheet WHERE label LIKE '%marketable%' AND year = 2022"),
+    ("section_totals", "SELECT section, SUM(value) FROM balance_sheet WHERE company = 'SYN0001' AND as_of_date LIKE '2024%' GROUP BY section"),
+    # the same trend and comparison questions answered from the wide table
+    ("wide_company_history", "SELECT year, total_liabilities, total_liabilities_yoy FROM balance_sheet_wide WHERE company = 'SYN0001' ORDER BY year"),
+    ("wide_cross_company_filter", "SELECT company FROM balance_sheet_wide WHERE year = 2024 AND total_liabilities > 100000"),
+    ("wide_top_n", "SELECT company, total_current_assets FROM balance_sheet_wide WHERE year = 2023 ORDER BY total_current_assets DESC LIMIT 10"),
+]
+
+# question -> canned SQL for the stubbed model; one scalar question (answered without the LLM) and one that needs phrasing
+STUB_QUESTIONS = {
+    "What were SYN0001's retained earnings in 2021?": QUERY_WORKLOADS[0][1],
+    "How have SYN0001's total liabilities changed over time?": QUERY_WORKLOADS[1][1],
+}
+
+class StubCompletions:
+    def create(self, model: str, messages: List[dict], temperature: float = 0, stream: bool = False, **kwargs):
+        prompt = messages[-1]["content"]
+        sql = next((sql for question, sql in STUB_QUESTIONS.items() if question in prompt), None)
+        text = sql if sql is not None else "The figures rose steadily over the period shown in the results."
+        if stream:
+            return iter([types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=word + " "))]) for word in text.split()])
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=text))])
+
+# stands in for the OpenAI client so the answer pipeline is timed without the network
+class StubClient:
+    def __init__(self):
+        self.chat = types.SimpleNamespace(completions=StubCompletions())
+
+# runs fn(*setup()) repeatedly; setup is excluded from the timing, and the pipeline's prints are swallowed
+def measure(fn: Callable, repeats: int, setup: Optional[Callable[[], tuple]] = None) -> Dict:
+    runs = []
+    for _ in range(repeats):
+        args = setup() if setup else ()
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn(*args)
+            runs.append(time.perf_counter() - start)
+    return {"median": statistics.median(runs), "min": min(runs), "max": max(runs), "runs": len(runs)}
+
+def find_pdf_fixtures(pdf_dir: str, limit: Optional[int] = None) -> List[str]:
+    paths = sorted(os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir) if f.endswith(".pdf")) if os.path.isdir(pdf_dir) else []
+    return paths[:limit] if limit else paths
+
+# one untimed pass that finds each fixture's statement page and intermediate frames, so every stage can be timed on its own
+def prepare_fixtures(pdf_paths: List[str], ticker: str, page_cache: PageCache) -> List[Dict]:
+    fixtures = []
+    for path in pdf_paths:
+        with redirect_stdout(io.StringIO()), extract_and_normalize.PdfDocument(path, page_cache) as doc:
+            raw = extract_and_normalize.extract_table_from_page_index(doc)
+            if raw is None:
+                raw = extract_and_normalize.extract_table_near_page(doc, extract_and_normalize.find_balance_sheet_page_by_toc(doc))
+            page = doc.statement_pages.get("balance_sheet")
+        if raw is None:
+            print(f" Skipping {os.path.basename(path)}: no balance sheet found")
+            continue
+        cleaned = extract_and_normalize.clean_balance_sheet(raw)
+        as_of_date = extract_and_normalize.as_of_date_from_filename(os.path.basename(path))
+        fixtures.append({
+            "path": path,
+            "page": page,
+            "raw": raw,
+            "cleaned": cleaned,
+            "as_of_date": as_of_date,
+            "normalized": extract_and_normalize.normalize_balance_sheet(cleaned, ticker, as_of_date),
+        })
+    return fixtures
+
+def fresh_documents(fixtures: List[Dict], page_cache: Optional[PageCache] = None) -> Tuple[List[extract_and_normalize.PdfDocument]]:
+    return ([extract_and_normalize.PdfDocument(f["path"], page_cache) for f in fixtures],)
+
+def close_all(docs: List[extract_and_normalize.PdfDocument]) -> None:
+    for doc in docs:
+        doc.close()
+
+# pdf stages run without the page cache so they keep measuring extraction; pdf.page_cache_hit does the toc walk and
+# table extraction again from a warm cache, as when cleaning heuristics are iterated on already processed filings
+def bench_extraction(fixtures: List[Dict], ticker: str, repeats: int, warm_cache: PageCache) -> Dict[str, Dict]:
+    def build_page_indexes(_):
+        for f in fixtures:
+            PageIndex.build(f["path"])
+
+    def toc_lookup(docs):
+        for doc in docs:
+            extract_and_normalize.find_balance_sheet_page_by_toc(doc)
+        close_all(docs)
+
+    def table_extraction(docs):
+        for doc, f in zip(docs, fixtures):
+            extract_and_normalize.extract_table_near_page(doc, f["page"], max_offset=0)
+        close_all(docs)
+
+    def cached_extraction(docs):
+        for doc, f in zip(docs, fixtures):
+            extract_and_normalize.find_balance_sheet_page_by_toc(doc)
+            extract_and_normalize.extract_table_near_page(doc, f["page"], max_offset=0)
+        close_all(docs)
+
+    def clean():
+        for f in fixtures:
+            extract_and_normalize.clean_balance_sheet(f["raw"])
+
+    def normalize():
+        for f in fixtures:
+            extract_and_normalize.normalize_balance_sheet(f["cleaned"], ticker, f["as_of_date"])
+
+    # fills the warm cache with the pages the toc walk reads, which preparing the fixtures may not have needed
+    with redirect_stdout(io.StringIO()):
+        toc_lookup(*fresh_documents(fixtures, warm_cache))
+
+    return {
+        "pdf.page_index_build": measure(build_page_indexes, repeats, lambda: (None,)),
+        "pdf.toc_lookup": measure(toc_lookup, repeats, lambda: fresh_documents(fixtures)),
+        "pdf.table_extraction": measure(table_extraction, repeats, lambda: fresh_documents(fixtures)),
+        "pdf.page_cache_hit": measure(cached_extraction, repeats, lambda: fresh_documents(fixtures, warm_cache)),
+        "normalize.clean_balance_sheet": measure(clean, repeats),
+        "normalize.normalize_balance_sheet": measure(normalize, repeats),
+    }
+
+def bench_inserts(fixtures: List[Dict], work_dir: str, repeats: int) -> Dict[str, Dict]:
+    frames = [f["normalized"] for f in fixtures]
+    counter = iter(range(1_000_000))
+
+    def empty_db():
+        with redirect_stdout(io.StringIO()):
+            return (connect_or_create_sql_db(os.path.join(work_dir, f"insert_{next(counter)}.db")),)
+
+    def populated_db():
+        (conn,) = empty_db()
+        with redirect_stdout(io.StringIO()):
+            insert_all(conn)
+        return (conn,)
+
+    def insert_all(conn):
+        for df in frames:
+            sql_interface.insert_balance_sheet(df, conn)
+
+    def insert_and_close(conn):
+        insert_all(conn)
+        conn.close()
+
+    return {
+        "db.insert_balance_sheet": measure(insert_and_close, repeats, empty_db),
+        "db.insert_balance_sheet_duplicates": measure(insert_and_close, repeats, populated_db),
+    }
+
+# copies the fixture statements onto synthetic companies and shifted years with jittered values
+def synthetic_frames(fixtures: List[Dict], companies: int, year_blocks: int, seed: int = 0) -> List[pd.DataFrame]:
+    rng = random.Random(seed)
+    span = max(1, len({f["as_of_date"][:4] for f in fixtures}))
+    frames = []
+    for c in range(companies):
+        ticker = f"SYN{c:04d}"
+        for block in range(year_blocks):
+            shift = block * span
+            for f in fixtures:
+                df = f["normalized"]
+                year = int(f["as_of_date"][:4]) - shift
+                frames.append(df.assign(
+                    company=ticker,
+                    as_of_date=f"{year}{f['as_of_date'][4:]}",
+                    year=year,
+                    value=df["value"] * rng.uniform(0.5, 1.5),
+                ))
+    return frames
+
+def build_scaled_db(fixtures: List[Dict], path: str, companies: int, year_blocks: int) -> Tuple[sqlite3.Connection, Dict, int]:
+    # one frame per synthetic company; bulk_insert_balance_sheets pays a fixed cost per frame, so thousands of tiny frames would dominate
+    per_company = year_blocks * len(fixtures)
+    frames = synthetic_frames(fixtures, companies, year_blocks)
+    frames = [pd.concat(frames[i:i + per_company], ignore_index=True) for i in range(0, len(frames), per_company)]
+    with redirect_stdout(io.StringIO()):
+        conn = connect_or_create_sql_db(path)
+    start = time.perf_counter()
+    report = sql_interface.bulk_insert_balance_sheets(frames, conn)
+    elapsed = time.perf_counter() - start
+    return conn, {"median": elapsed, "min": elapsed, "max": elapsed, "runs": 1}, report.inserted
+
+def bench_queries(conn: sqlite3.Connection, repeats: int) -> Dict[str, Dict]:
+    return {f"query.{name}": measure(sql_interface.execute_sql_query, repeats, lambda sql=sql: (sql, conn)) for name, sql in QUERY_WORKLOADS}
+
+# end-to-end question answering with the stubbed model: cold caches each run, then the same questions warm
+def bench_answers(conn: sqlite3.Connection, work_dir: str, repeats: int) -> Dict[str, Dict]:
+    counter = iter(range(1_000_000))
+
+    def fresh_caches():
+        path = os.path.join(work_dir, f"cache_{next(counter)}.db")
+        return tuple(PersistentCache(namespace, db_path=path) for namespace in ("nl_to_sql", "sql_results", "answers"))
+
+    def ask_all(*caches):
+        for question in STUB_QUESTIONS:
+            sql_interface.answer_question_from_db(sql_interface.BALANCE_SHEET_SCHEMA, question, conn, *caches)
+
+    original_client = sql_interface.client
+    sql_interface.client = StubClient()
+    try:
+        warm = fresh_caches()
+        with redirect_stdout(io.StringIO()):
+            ask_all(*warm)
+        return {
+            "answer.cold_cache": measure(ask_all, repeats, fresh_caches),
+            "answer.warm_cache": measure(ask_all, repeats, lambda: warm),
+        }
+    finally:
+        sql_interface.client = original_client
+
+# a full export of the scaled database into an empty directory, then an incremental export with nothing new to write
+def bench_exports(db_path: str, work_dir: str, repeats: int) -> Dict[str, Dict]:
+    out_dir = os.path.join(work_dir, "export")
+    start = time.perf_counter()
+    export_balance_sheet(out_dir, db_path)
+    elapsed = time.perf_counter() - start
+    return {
+        "export.full_scaled": {"median": elapsed, "min": elapsed, "max": elapsed, "runs": 1},
+        "export.incremental_noop": measure(export_balance_sheet, repeats, lambda: (out_dir, db_path)),
+    }
+
+def run_benchmarks(pdf_dir: str, ticker: str, repeats: int, companies: int, year_blocks: int, max_pdfs: Optional[int] = None) -> Dict:
+    pdf_paths = find_pdf_fixtures(pdf_dir, max_pdfs)
+    if not pdf_paths:
+        raise FileNotFoundError(f"No .pdf fixtures found in {pdf_dir}")
+
+    stages: Dict[str, Dict] = {}
+    work_dir = tempfile.mkdtemp(prefix="fra_bench_")
+    try:
+        # a private page cache, so neither the timings nor data/cache depend on earlier runs
+        warm_cache = PageCache(os.path.join(work_dir, "pages_warm"))
+        fixtures = prepare_fixtures(pdf_paths, ticker, warm_cache)
+        if not fixtures:
+            raise ValueError(f"No balance sheet could be extracted from the fixtures in {pdf_dir}")
+
+        print(f" Timing extraction on {len(fixtures)} filings...")
+        stages.update(bench_extraction(fixtures, ticker, repeats, warm_cache))
+        print(" Timing inserts...")
+        stages.update(bench_inserts(fixtures, work_dir, repeats))
+
+        print(f" Building scaled database ({companies} companies x {year_blocks * len(fixtures)} filings)...")
+        conn, load_timing, rows = build_scaled_db(fixtures, os.path.join(work_dir, "scaled.db"), companies, year_blocks)
+        stages["db.bulk_load_scaled"] = load_timing
+        print(" Timing queries...")
+        stages.update(bench_queries(conn, repeats))
+        stages.update(bench_answers(conn, work_dir, repeats))
+        conn.close()
+        print(" Timing exports...")
+        stages.update(bench_exports(os.path.join(work_dir, "scaled.db"), work_dir, repeats))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fixtures": [os.path.basename(f["path"]) for f in fixtures],
+            "repeats": repeats,
+            "scaled_companies": companies,
+            "scaled_rows": rows,
+        },
+        "stages": stages,
+    }
+
+# (stage, current median, baseline median, ratio, regressed) for every stage present in both runs
+def compare_to_baseline(results: Dict, baseline: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[Tuple[str, float, float, float, bool]]:
+    rows = []
+    for stage, timing in results["stages"].items():
+        if stage not in baseline.get("stages", {}):
+            continue
+        current, previous = timing["median"], baseline["stages"][stage]["median"]
+        ratio = current / previous if previous else float("inf")
+        regressed = current > NOISE_FLOOR_SECONDS and ratio > 1 + threshold
+        rows.append((stage, current, previous, ratio, regressed))
+    return rows
+
+def write_json(data: Dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+
+if __name__ == "__main__":
+    # times each ingest and query stage on the bundled filings and flags regressions against a stored baseline
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf_dir", default=os.path.join(project_root(), "data", "pdfs"))
+    parser.add_argument("--ticker", default="GOOG")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max_pdfs", type=int, default=None, help="Only use the first N fixtures")
+    parser.add_argument("--companies", type=int, default=500, help="Synthetic companies in the scaled query database")
+    parser.add_argument("--year_blocks", type=int, default=5, help="Copies of the fixture years per synthetic company")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write this run's results as JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Allowed slowdown before a stage is flagged (0.25 = 25%%)")
+    parser.add_argument("--save_baseline", action="store_true", help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.pdf_dir, args.ticker.upper(), args.repeats, args.companies, args.year_blocks, args.max_pdfs)
+    write_json(results, args.output)
+    print(f"\n Results written to {args.output}")
+
+    if args.save_baseline:
+        write_json(results, args.baseline)
+        print(f" Baseline saved to {args.baseline}")
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if baseline is None:
+        print(f"\n{'stage':<38}{'median (s)':>12}{'min (s)':>12}")
+        for stage, timing in results["stages"].items():
+            print(f"{stage:<38}{timing['median']:>12.4f}{timing['min']:>12.4f}")
+    else:
+        comparison = compare_to_baseline(results, baseline, args.threshold)
+        print(f"\n{'stage':<38}{'median (s)':>12}{'baseline':>12}{'ratio':>8}")
+        for stage, current, previous, ratio, regressed in comparison:
+            print(f"{stage:<38}{current:>12.4f}{previous:>12.4f}{ratio:>7.2f}x{'  REGRESSION' if regressed else ''}")
+        regressions = [row[0] for row in comparison if row[4]]
+        if regressions:
+            print(f"\n {len(regressions)} stage(s) slower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n No regressions against the baseline.")
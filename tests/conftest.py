@@ -0,0 +1,46 @@
+# tests/conftest.py
+import os
+import sys
+import shutil
+import sqlite3
+
+import pytest
+
+# lets plain `pytest` import the src package from the project root, like the benchmark scripts do
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.scripts.connect_or_create_sql_db import DB_PATH, connect_or_create_sql_db
+
+FACT_COLUMNS = ["as_of_date", "company", "statement_type", "section", "label", "year", "value"]
+
+# the bundled GOOG database, still in the v1 layout: one flat balance_sheet table with text years
+@pytest.fixture(scope="session")
+def bundled_rows():
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    try:
+        return conn.execute(f"SELECT uid, {', '.join(FACT_COLUMNS)} FROM balance_sheet ORDER BY uid").fetchall()
+    finally:
+        conn.close()
+
+# the bundled facts as the normalized frames the loader takes, one per filing
+@pytest.fixture(scope="session")
+def goog_frames(bundled_rows):
+    import pandas as pd
+
+    df = pd.DataFrame([row[1:] for row in bundled_rows], columns=FACT_COLUMNS).astype({"year": int})
+    return [frame.reset_index(drop=True) for _, frame in df.groupby("as_of_date")]
+
+# a private copy of the bundled database, so tests can migrate and write to it
+@pytest.fixture
+def db_copy(tmp_path):
+    path = str(tmp_path / "financials.db")
+    shutil.copy(DB_PATH, path)
+    return path
+
+# the same copy, already migrated to the current schema
+@pytest.fixture
+def migrated_db(db_copy):
+    connect_or_create_sql_db(db_copy).close()
+    return db_copy
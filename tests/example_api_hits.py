@@ -1,2 +1,35 @@
-#To do:
-#provide a script that shows example usage of hitting the api (which has yet to be made)
\ No newline at end of file
+#tests/example_api_hits.py
+#example usage of the api; start it first with: uvicorn src.FastAPI_code:app --port 8000
+import time
+import requests
+
+API_URL = "http://localhost:8000"
+
+# asks one question and prints the whole answer
+def ask(question: str) -> None:
+    response = requests.post(f"{API_URL}/ask", json={"question": question}, timeout=120)
+    response.raise_for_status()
+    print(response.json()["answer"])
+
+# asks one question and prints the answer as it streams in
+def ask_streaming(question: str) -> None:
+    with requests.post(f"{API_URL}/ask", json={"question": question, "stream": True}, stream=True, timeout=120) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+            print(chunk, end="", flush=True)
+    print()
+
+# queues an ingest job on the server's single writer and polls until it finishes
+def ingest(ticker: str, years_back: int = 5) -> None:
+    job = requests.post(f"{API_URL}/ingest", json={"ticker": ticker, "years_back": years_back}, timeout=30).json()
+    while job["status"] in ("queued", "running"):
+        time.sleep(5)
+        job = requests.get(f"{API_URL}/ingest/{job['job_id']}", timeout=30).json()
+    print(job)
+
+
+if __name__ == "__main__":
+    print(requests.get(f"{API_URL}/health", timeout=30).json())
+    ingest("GOOG", 3)
+    ask("What was GOOG's total liabilities in 2024?")
+    ask_streaming("How did GOOG's current assets change over time?")
@@ -0,0 +1,73 @@
+# tests/import_budget.py
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# entry point -> import time budget in milliseconds; the query path should never pay for the ingest stack
+IMPORT_BUDGETS_MS = {
+    "main": 400,
+    "src.sql_interface": 400,
+    "src.FastAPI_code": 1500,
+}
+
+# modules that are only needed to ingest filings or to call the LLM, and must stay out of a plain import
+HEAVY_MODULES = ("pandas", "openai", "pdfplumber", "pypdfium2", "bs4", "pdfkit", "requests", "lxml", "dotenv")
+ALLOWED_HEAVY = {
+    # the API loads .env at startup so READ_POOL_SIZE and LOG_LEVEL can come from it
+    "src.FastAPI_code": {"dotenv"},
+}
+
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+# imports the module in a fresh interpreter, so nothing is already cached in sys.modules
+def probe_import(module: str) -> Dict:
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure(module: str, repeats: int) -> Dict:
+    runs = [probe_import(module) for _ in range(repeats)]
+    return {"median_ms": statistics.median(run["ms"] for run in runs), "loaded": runs[-1]["loaded"]}
+
+# one line per entry point; returns the problems found
+def check_budgets(budgets: Dict[str, float], repeats: int) -> List[str]:
+    problems = []
+    print(f"{'module':<24}{'median (ms)':>13}{'budget (ms)':>13}  heavy modules loaded")
+    for module, budget in budgets.items():
+        result = measure(module, repeats)
+        unexpected = [name for name in result["loaded"] if name not in ALLOWED_HEAVY.get(module, set())]
+        print(f"{module:<24}{result['median_ms']:>13.1f}{budget:>13.0f}  {', '.join(result['loaded']) or '-'}")
+        if result["median_ms"] > budget:
+            problems.append(f"{module} took {result['median_ms']:.0f} ms to import (budget {budget} ms)")
+        if unexpected:
+            problems.append(f"{module} pulled in {', '.join(unexpected)} at import time")
+    return problems
+
+if __name__ == "__main__":
+    # guards CLI and API startup time: fails when an entry point goes over budget or imports a heavy dependency eagerly
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget, e.g. 2 on a slow CI runner")
+    args = parser.parse_args()
+
+    problems = check_budgets({module: budget * args.scale for module, budget in IMPORT_BUDGETS_MS.items()}, args.repeats)
+    if problems:
+        print()
+        for problem in problems:
+            print(f" {problem}")
+        sys.exit(1)
@@ -0,0 +1,113 @@
+# tests/test_balance_sheet_wide.py
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from src import sql_interface
+from src.scripts.connect_or_create_sql_db import connect_or_create_sql_db, get_data_version
+from src.utils.balance_sheet_wide import WIDE_TABLE, WIDE_TABLE_DDL, describe_wide_table
+
+# one normalized balance sheet: label -> value, all in one section
+def statement(company: str, as_of_date: str, **values) -> pd.DataFrame:
+    return pd.DataFrame([
+        {"as_of_date": as_of_date, "company": company, "statement_type": "balance_sheet", "section": "Totals",
+         "label": label, "year": int(as_of_date[:4]), "value": value}
+        for label, value in values.items()
+    ])
+
+def facts(company: str, as_of_date: str, assets: float, liabilities: float) -> pd.DataFrame:
+    return statement(company, as_of_date, **{"Total assets": assets, "Total liabilities": liabilities})
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect_or_create_sql_db(str(tmp_path / "financials.db"))
+    yield conn
+    conn.close()
+
+def wide_rows(conn, company: str) -> list:
+    return conn.execute(
+        f"SELECT year, as_of_date, total_assets, total_assets_yoy, total_assets_yoy_pct, total_liabilities_yoy FROM {WIDE_TABLE} "
+        "WHERE company = ? ORDER BY year", (company,)
+    ).fetchall()
+
+# every column the prompt describes is declared with that type, and every declared column is described
+def test_description_matches_the_created_table():
+    conn = sqlite3.connect(":memory:")
+    for statement in WIDE_TABLE_DDL:
+        conn.execute(statement)
+    declared = [f"{name} {declared_type}" for _, name, declared_type, *_ in conn.execute(f"PRAGMA table_info({WIDE_TABLE})")]
+
+    # the column list sits between "balance_sheet_wide(" and the closing parenthesis, several columns to a line
+    body = describe_wide_table().split("(\n", 1)[1].split("\n    )", 1)[0]
+    described = [column.strip() for column in body.replace("\n", ",").split(",") if column.strip()]
+    described.remove("PRIMARY KEY (company")
+    described.remove("year)")
+
+    assert "as_of_date DATE" in declared
+    assert described == declared
+
+def test_yoy_deltas_come_from_the_previous_fiscal_year_only(conn):
+    sql_interface.bulk_insert_balance_sheets([
+        facts("AAA", "2021-12-31", 100.0, 50.0),
+        facts("AAA", "2022-12-31", 120.0, 45.0),
+        # no 2023 statement, so 2024 has nothing to compare against
+        facts("AAA", "2024-12-31", 150.0, 60.0),
+        facts("AAA", "2025-12-31", 135.0, 60.0),
+    ], conn)
+    assert wide_rows(conn, "AAA") == [
+        (2021, "2021-12-31", 100.0, None, None, None),
+        (2022, "2022-12-31", 120.0, 20.0, 20.0, -5.0),
+        (2024, "2024-12-31", 150.0, None, None, None),
+        (2025, "2025-12-31", 135.0, -15.0, -10.0, 0.0),
+    ]
+
+# a company that changed its fiscal year end has two statements in one year; the later one is that year's row
+def test_latest_statement_of_a_year_is_kept(conn):
+    sql_interface.bulk_insert_balance_sheets([
+        facts("AAA", "2022-12-31", 100.0, 50.0),
+        facts("AAA", "2023-12-31", 130.0, 55.0),
+        facts("AAA", "2023-06-30", 110.0, 52.0),
+    ], conn)
+    assert wide_rows(conn, "AAA") == [
+        (2022, "2022-12-31", 100.0, None, None, None),
+        (2023, "2023-12-31", 130.0, 30.0, 30.0, 5.0),
+    ]
+
+# spellings are matched after normalizing case, apostrophes and colons, and the most preferred spelling wins
+def test_label_spellings_map_to_one_column(conn):
+    sql_interface.bulk_insert_balance_sheets([statement("AAA", "2024-12-31", **{
+        "TOTAL ASSETS:": 10.0, "Total equity": 3.0, "Total stockholders’ equity": 4.0,
+    })], conn)
+    row = conn.execute(f"SELECT total_assets, total_stockholders_equity, goodwill FROM {WIDE_TABLE} WHERE company = 'AAA'").fetchone()
+    assert row == (10.0, 4.0, None)
+
+def test_a_load_rebuilds_only_the_companies_it_changed(conn, monkeypatch):
+    sql_interface.bulk_insert_balance_sheets([facts("AAA", "2023-12-31", 100.0, 50.0), facts("BBB", "2023-12-31", 10.0, 5.0)], conn)
+    # a value no refresh would produce, to tell rebuilt rows from untouched ones
+    conn.execute(f"UPDATE {WIDE_TABLE} SET goodwill = -1")
+    conn.commit()
+    version = get_data_version(conn)
+
+    refreshed = []
+    refresh_wide_table = sql_interface.refresh_wide_table
+    def recording(conn, companies=None):
+        refreshed.append(sorted(companies))
+        refresh_wide_table(conn, companies)
+    monkeypatch.setattr(sql_interface, "refresh_wide_table", recording)
+
+    # AAA's statement is already stored, so only BBB changes
+    sql_interface.bulk_insert_balance_sheets([facts("AAA", "2023-12-31", 100.0, 50.0), facts("BBB", "2024-12-31", 12.0, 5.0)], conn)
+    assert refreshed == [["BBB"]]
+    assert get_data_version(conn) != version
+    # AAA's row was left in place; BBB's rows were deleted and rebuilt, with the new year's delta
+    assert conn.execute(f"SELECT company, year, goodwill FROM {WIDE_TABLE} ORDER BY company, year").fetchall() == [
+        ("AAA", 2023, -1.0), ("BBB", 2023, None), ("BBB", 2024, None),
+    ]
+    assert wide_rows(conn, "BBB")[-1] == (2024, "2024-12-31", 12.0, 2.0, 20.0, 0.0)
+
+    # a load that adds nothing rebuilds nothing and keeps the version
+    version = get_data_version(conn)
+    sql_interface.bulk_insert_balance_sheets([facts("BBB", "2024-12-31", 12.0, 5.0)], conn)
+    assert refreshed == [["BBB"]]
+    assert get_data_version(conn) == version
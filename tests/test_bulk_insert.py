@@ -0,0 +1,75 @@
+# tests/test_bulk_insert.py
+import pandas as pd
+import pytest
+
+from src.scripts.connect_or_create_sql_db import connect_or_create_sql_db, get_data_version
+from src.sql_interface import bulk_insert_balance_sheets
+
+@pytest.fixture
+def empty_db(tmp_path):
+    conn = connect_or_create_sql_db(str(tmp_path / "empty.db"))
+    yield conn
+    conn.close()
+
+def fact_count(conn) -> int:
+    return conn.execute("SELECT count(*) FROM balance_sheet_facts").fetchone()[0]
+
+def test_reinsert_counts_every_row_as_skipped(empty_db, goog_frames):
+    total = sum(len(frame) for frame in goog_frames)
+
+    first = bulk_insert_balance_sheets(goog_frames, empty_db)
+    assert (first.inserted, first.skipped) == (total, 0)
+    assert first.per_statement == [len(frame) for frame in goog_frames]
+
+    version = get_data_version(empty_db)
+    again = bulk_insert_balance_sheets(goog_frames, empty_db)
+    assert (again.inserted, again.skipped) == (0, total)
+    assert again.per_statement == [0] * len(goog_frames)
+    assert fact_count(empty_db) == total
+    # nothing new, so cached results stay valid
+    assert get_data_version(empty_db) == version
+
+def test_partial_overlap(empty_db, goog_frames):
+    bulk_insert_balance_sheets(goog_frames[:2], empty_db)
+    report = bulk_insert_balance_sheets(goog_frames[1:3], empty_db)
+    assert report.per_statement == [0, len(goog_frames[2])]
+    assert (report.inserted, report.skipped) == (len(goog_frames[2]), len(goog_frames[1]))
+
+def test_reinsert_into_the_bundled_database(db_copy, goog_frames):
+    conn = connect_or_create_sql_db(db_copy)
+    try:
+        report = bulk_insert_balance_sheets(goog_frames, conn)
+    finally:
+        conn.close()
+    assert report.inserted == 0
+    assert report.skipped == sum(len(frame) for frame in goog_frames)
+
+# inside the caller's transaction the load is a savepoint: the caller's rollback undoes it, its commit keeps it
+def test_open_transaction_is_left_to_the_caller(empty_db, goog_frames):
+    empty_db.execute("CREATE TABLE notes (note TEXT)")
+    empty_db.execute("INSERT INTO notes VALUES ('pending')")
+    assert empty_db.in_transaction
+
+    bulk_insert_balance_sheets(goog_frames[:1], empty_db)
+    assert empty_db.in_transaction
+    empty_db.rollback()
+    assert fact_count(empty_db) == 0
+    assert empty_db.execute("SELECT count(*) FROM notes").fetchone()[0] == 0
+
+    empty_db.execute("INSERT INTO notes VALUES ('kept')")
+    bulk_insert_balance_sheets(goog_frames[:1], empty_db)
+    empty_db.commit()
+    assert fact_count(empty_db) == len(goog_frames[0])
+    assert empty_db.execute("SELECT count(*) FROM notes").fetchone()[0] == 1
+
+def test_failed_load_inside_a_transaction_only_undoes_itself(empty_db, goog_frames):
+    empty_db.execute("CREATE TABLE notes (note TEXT)")
+    empty_db.execute("INSERT INTO notes VALUES ('pending')")
+    unbindable = goog_frames[1].assign(value=[object()] * len(goog_frames[1]))
+
+    with pytest.raises(Exception):
+        bulk_insert_balance_sheets([goog_frames[0], unbindable], empty_db)
+    assert empty_db.in_transaction
+    assert fact_count(empty_db) == 0
+    empty_db.commit()
+    assert empty_db.execute("SELECT count(*) FROM notes").fetchone()[0] == 1
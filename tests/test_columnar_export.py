@@ -0,0 +1,106 @@
+# tests/test_columnar_export.py
+import os
+import glob
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from src.scripts.connect_or_create_sql_db import connect_or_create_sql_db
+from src.sql_interface import bulk_insert_balance_sheets, generate_uids
+from src.utils import columnar_export
+from src.utils.columnar_export import export_balance_sheet
+
+# part file -> (size, mtime_ns), to tell rewritten files from untouched ones
+def part_files(out_dir: str):
+    return {path: (os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in glob.glob(os.path.join(out_dir, "company=*", "year=*", "part-*"))}
+
+def exported_uids(paths):
+    return sorted(uid for path in paths for uid in pq.read_table(path, columns=["uid"]).column("uid").to_pylist())
+
+def test_incremental_export_writes_only_the_new_rows(migrated_db, goog_frames, tmp_path):
+    out_dir = str(tmp_path / "export")
+    conn = connect_or_create_sql_db(migrated_db)
+    try:
+        stored = [row[0] for row in conn.execute("SELECT uid FROM balance_sheet_facts")]
+
+        first = export_balance_sheet(out_dir, migrated_db)
+        assert first.full and first.rows == len(stored)
+        assert first.partitions == len(goog_frames)
+        before = part_files(out_dir)
+        assert exported_uids(before) == sorted(stored)
+
+        # nothing new: nothing written
+        noop = export_balance_sheet(out_dir, migrated_db)
+        assert (noop.full, noop.rows, noop.partitions, noop.watermark) == (False, 0, 0, first.watermark)
+        assert part_files(out_dir) == before
+
+        frame = goog_frames[-1].assign(as_of_date="2025-12-31", year=2025)
+        assert bulk_insert_balance_sheets([frame], conn).inserted == len(frame)
+        new_rowids = [row[0] for row in conn.execute("SELECT rowid FROM balance_sheet_facts WHERE rowid > ? ORDER BY rowid", (first.watermark,))]
+    finally:
+        conn.close()
+
+    second = export_balance_sheet(out_dir, migrated_db)
+    assert not second.full
+    assert second.rows == len(new_rowids) == len(frame)
+    assert second.watermark == new_rowids[-1]
+
+    after = part_files(out_dir)
+    # every earlier file is untouched, and the one new file holds exactly the rows past the old watermark
+    assert {path: after[path] for path in before} == before
+    added = sorted(set(after) - set(before))
+    assert [os.path.relpath(path, out_dir) for path in added] == [
+        os.path.join("company=GOOG", "year=2025", f"part-{first.watermark + 1:012d}-{second.watermark:012d}.parquet")
+    ]
+    assert exported_uids(added) == sorted(generate_uids(frame))
+
+def test_full_export_replaces_the_incremental_parts(migrated_db, goog_frames, tmp_path):
+    out_dir = str(tmp_path / "export")
+    export_balance_sheet(out_dir, migrated_db)
+    conn = connect_or_create_sql_db(migrated_db)
+    try:
+        bulk_insert_balance_sheets([goog_frames[-1].assign(as_of_date="2025-12-31", year=2025)], conn)
+        total = conn.execute("SELECT count(*) FROM balance_sheet_facts").fetchone()[0]
+    finally:
+        conn.close()
+    export_balance_sheet(out_dir, migrated_db)
+
+    report = export_balance_sheet(out_dir, migrated_db, incremental=False)
+    assert report.full and report.rows == total
+    files = part_files(out_dir)
+    assert len(files) == report.partitions
+    assert len(exported_uids(files)) == total
+
+# a run that dies after writing some partitions, then more inserts, then a rerun: every row ends up in exactly one file
+def test_rerun_after_a_failed_export_exports_each_row_once(migrated_db, goog_frames, tmp_path, monkeypatch):
+    out_dir = str(tmp_path / "export")
+    first = export_balance_sheet(out_dir, migrated_db)
+    conn = connect_or_create_sql_db(migrated_db)
+    try:
+        bulk_insert_balance_sheets([goog_frames[-1].assign(as_of_date=f"{year}-12-31", year=year) for year in (2025, 2026)], conn)
+
+        # the 2025 partition is written and moved into place, then the export fails in 2026
+        write = columnar_export.PartitionWriter.write
+        def failing_write(self, batch):
+            if "year=2026" in self.path:
+                raise OSError("disk full")
+            write(self, batch)
+        with monkeypatch.context() as patch:
+            patch.setattr(columnar_export.PartitionWriter, "write", failing_write)
+            with pytest.raises(OSError, match="disk full"):
+                export_balance_sheet(out_dir, migrated_db)
+        left = [path for path in part_files(out_dir) if "year=2025" in path]
+        assert len(left) == 1 and os.path.basename(left[0]).startswith(f"part-{first.watermark + 1:012d}-")
+
+        # more rows arrive before the rerun, so its part files end at a different rowid than the failed run's
+        bulk_insert_balance_sheets([goog_frames[-1].assign(as_of_date="2025-06-30", year=2025)], conn)
+        stored = [row[0] for row in conn.execute("SELECT uid FROM balance_sheet_facts")]
+    finally:
+        conn.close()
+
+    rerun = export_balance_sheet(out_dir, migrated_db)
+    assert not rerun.full and rerun.watermark > first.watermark
+    assert not os.path.exists(left[0])
+    assert exported_uids(part_files(out_dir)) == sorted(stored)
+    assert not glob.glob(os.path.join(out_dir, "**", "*.tmp"), recursive=True)
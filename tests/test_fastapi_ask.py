@@ -0,0 +1,105 @@
+# tests/test_fastapi_ask.py
+import time
+import types
+import shutil
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import FastAPI_code, ingest
+from src.scripts.connect_or_create_sql_db import DB_PATH
+from src.utils.query_cache import PersistentCache
+
+# answers the NL -> SQL call with a canned query and streams a canned answer, or fails part way through it
+class FakeCompletions:
+    def __init__(self, sql: str, answer_chunks=("Total ", "liabilities ", "grew."), fail_after: int = None):
+        self.sql = sql
+        self.answer_chunks = answer_chunks
+        self.fail_after = fail_after
+
+    async def create(self, model, messages, temperature=0, stream=False, **kwargs):
+        if not stream:
+            message = types.SimpleNamespace(content=self.sql)
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+        async def chunks():
+            for i, text in enumerate(self.answer_chunks):
+                if self.fail_after is not None and i == self.fail_after:
+                    raise RuntimeError("model connection reset")
+                delta = types.SimpleNamespace(content=text)
+                yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)], usage=None)
+        return chunks()
+
+@pytest.fixture
+def make_client(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "financials.db")
+    shutil.copy(DB_PATH, db_path)
+    caches = {namespace: PersistentCache(namespace, db_path=str(tmp_path / "cache.db")) for namespace in ("nl_to_sql", "answers")}
+    monkeypatch.setattr(FastAPI_code, "get_sql_cache", lambda: caches["nl_to_sql"])
+    monkeypatch.setattr(FastAPI_code, "get_answer_cache", lambda: caches["answers"])
+    monkeypatch.setattr(FastAPI_code, "connect_or_create_doc_store", lambda: types.SimpleNamespace(close=lambda: None))
+
+    def make(completions: FakeCompletions) -> TestClient:
+        monkeypatch.setattr(FastAPI_code, "_async_client", types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions)))
+        return TestClient(FastAPI_code.create_app(db_path, pool_size=2))
+    return make
+
+HISTORY_SQL = "SELECT as_of_date, value FROM balance_sheet WHERE company = 'GOOG' AND label = 'Total liabilities' ORDER BY as_of_date"
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM balance_sheet_facts",
+    "SELECT value FROM no_such_table",
+])
+def test_rejected_or_failing_sql_is_a_400_in_both_modes(make_client, stream, sql):
+    with make_client(FakeCompletions(sql)) as client:
+        response = client.post("/ask", json={"question": "What happened?", "stream": stream})
+    assert response.status_code == 400
+
+def test_streamed_answer(make_client):
+    with make_client(FakeCompletions(HISTORY_SQL)) as client:
+        response = client.post("/ask", json={"question": "How did GOOG's liabilities change?", "stream": True})
+    assert response.status_code == 200
+    assert response.text == "Total liabilities grew."
+
+def test_phrasing_failure_ends_the_stream_with_an_error_chunk(make_client):
+    with make_client(FakeCompletions(HISTORY_SQL, fail_after=1)) as client:
+        response = client.post("/ask", json={"question": "How did GOOG's liabilities change?", "stream": True})
+    assert response.status_code == 200
+    assert response.text.startswith("Total ")
+    assert "[error]" in response.text and "model connection reset" in response.text
+
+@pytest.mark.parametrize("workers", [0, -1, FastAPI_code.MAX_INGEST_WORKERS + 1])
+def test_ingest_workers_are_bounded(make_client, workers):
+    with make_client(FakeCompletions(HISTORY_SQL)) as client:
+        response = client.post("/ingest", json={"ticker": "GOOG", "workers": workers})
+    assert response.status_code == 422
+
+def wait_for_job(client, job_id: str) -> dict:
+    deadline = time.monotonic() + 10
+    while True:
+        job = client.get(f"/ingest/{job_id}").json()
+        if job["status"] in ("done", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.01)
+
+# finished jobs are forgotten after the TTL or beyond the cap, oldest first, when the next job is submitted
+def test_finished_ingest_jobs_are_evicted(make_client, monkeypatch):
+    monkeypatch.setattr(ingest, "ingest_ticker", lambda ticker, *args: {"ticker": ticker, "found": 0})
+    monkeypatch.setattr(FastAPI_code, "MAX_FINISHED_INGEST_JOBS", 2)
+    with make_client(FakeCompletions(HISTORY_SQL)) as client:
+        job_ids = []
+        for ticker in ("AAA", "BBB", "CCC"):
+            job_ids.append(client.post("/ingest", json={"ticker": ticker}).json()["job_id"])
+            assert wait_for_job(client, job_ids[-1])["summary"] == {"ticker": ticker, "found": 0}
+        # submitting the third left two finished jobs, so nothing was dropped yet
+        assert [client.get(f"/ingest/{job_id}").status_code for job_id in job_ids] == [200, 200, 200]
+
+        job_ids.append(client.post("/ingest", json={"ticker": "DDD"}).json()["job_id"])
+        assert [client.get(f"/ingest/{job_id}").status_code for job_id in job_ids[:3]] == [404, 200, 200]
+        wait_for_job(client, job_ids[-1])
+
+        monkeypatch.setattr(FastAPI_code, "INGEST_JOB_TTL_SECONDS", 0)
+        last = client.post("/ingest", json={"ticker": "EEE"}).json()["job_id"]
+        assert [client.get(f"/ingest/{job_id}").status_code for job_id in job_ids] == [404, 404, 404, 404]
+        assert wait_for_job(client, last)["status"] == "done"
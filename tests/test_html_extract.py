@@ -0,0 +1,88 @@
+# tests/test_html_extract.py
+import logging
+
+from src.utils import extract_and_normalize
+from src.utils.html_extract import extract_balance_sheet_table_from_html
+
+# trimmed from a 10-K's iXBRL document: a table of contents and a selected-data table that both mention the
+# totals, then the balance sheet itself with "$" and ")" in cells of their own and the amounts inside ix tags
+BALANCE_SHEET_ROWS = [
+    ("Cash and cash equivalents", "$", "24,048", "$", "23,466"),
+    ("Marketable securities", "", "86,868", "", "72,191"),
+    ("Accounts receivable, net", "", "47,964", "", "52,340"),
+    ("Total current assets", "", "171,530", "", "163,711"),
+    ("Property and equipment, net", "", "134,345", "", "171,036"),
+    ("Total assets", "$", "402,392", "$", "450,256"),
+    ("Accounts payable", "$", "7,493", "$", "7,987"),
+    ("Total current liabilities", "", "81,814", "", "89,122"),
+    ("Long-term debt", "", "13,253", "", "10,883"),
+    ("Total liabilities", "", "119,013", "", "125,172"),
+    ("Accumulated other comprehensive income (loss)", "", "(4,402", "", "(4,800"),
+    ("Retained earnings", "", "211,247", "", "245,084"),
+    ("Preferred stock", "", "—", "", "—"),
+    ("Total stockholders’ equity", "", "283,379", "", "325,084"),
+]
+
+def cell_html(cell: str) -> str:
+    if not cell[:1].isdigit() and cell[:1] != "(":
+        return f"<td>{cell}</td>"
+    amount = f'<td><ix:nonFraction name="us-gaap:X">{cell}</ix:nonFraction></td>'
+    return amount + "<td>)</td>" if cell.startswith("(") else amount
+
+def row_html(label: str, *cells: str) -> str:
+    return f"<tr><td>{label}</td>{''.join(cell_html(cell) for cell in cells)}</tr>"
+
+FILING_HTML = f"""<html><head><meta charset="utf-8"></head><body>
+<table>
+  <tr><td>Item 8.</td><td>Financial Statements and Supplementary Data</td><td>45</td></tr>
+  <tr><td>Consolidated Balance Sheets</td><td>48</td></tr>
+</table>
+<table>
+  <tr><td>Total assets</td><td>402,392</td><td>450,256</td></tr>
+  <tr><td>Total liabilities</td><td>119,013</td><td>125,172</td></tr>
+</table>
+<p>CONSOLIDATED BALANCE SHEETS</p>
+<table>
+  <tr><th></th><th colspan="2">As of December 31,</th></tr>
+  <tr><td></td><td>2023</td><td></td><td>2024</td></tr>
+  <tr><td>Assets</td></tr>
+  {"".join(row_html(*row) for row in BALANCE_SHEET_ROWS)}
+</table>
+</body></html>"""
+
+def test_the_balance_sheet_is_picked_over_tables_that_only_mention_totals():
+    df = extract_balance_sheet_table_from_html(FILING_HTML.encode("utf-8"))
+    assert df is not None
+    rows = df.values.tolist()
+    # an empty header row first, like the pdf extraction; the row of years is dropped, the headings stay without values
+    assert rows[:3] == [["", None, None], ["As of December 31,", None, None], ["Assets", None, None]]
+    by_label = {row[0]: row[1:] for row in rows[3:]}
+    assert by_label["Cash and cash equivalents"] == ["24,048", "23,466"]
+    assert by_label["Accumulated other comprehensive income (loss)"] == ["(4,402)", "(4,800)"]
+    assert by_label["Preferred stock"] == ["—", "—"]
+    assert list(by_label) == [row[0] for row in BALANCE_SHEET_ROWS]
+
+# the html engine end to end: cleaned to numbers, then normalized with the date from the filename
+def test_a_saved_filing_parses_and_normalizes(tmp_path):
+    path = tmp_path / "goog-20241231.htm"
+    path.write_text(FILING_HTML, encoding="utf-8")
+    cleaned = extract_and_normalize.parse_balance_sheet_from_html(str(path)).set_index("label")
+    assert cleaned.loc["Total liabilities"].tolist() == [119013.0, 125172.0]
+    assert cleaned.loc["Preferred stock"].isna().all()
+
+    result = extract_and_normalize.parse_and_normalize_filing(str(path), "GOOG", engine="html")
+    assert result.skip_reason is None
+    facts = result.df.set_index("label")
+    assert set(facts["as_of_date"]) == {"2024-12-31"} and set(facts["company"]) == {"GOOG"}
+    assert facts.loc["Total assets", "value"] == 402392.0
+
+def test_a_filing_without_a_balance_sheet_is_skipped(tmp_path, caplog):
+    html = FILING_HTML.split("<p>CONSOLIDATED")[0] + "</body></html>"
+    with caplog.at_level(logging.WARNING, logger="src.utils.html_extract"):
+        assert extract_balance_sheet_table_from_html(html.encode("utf-8")) is None
+    assert "No balance sheet-like table found in HTML." in caplog.messages
+
+    path = tmp_path / "goog-20241231.htm"
+    path.write_text(html, encoding="utf-8")
+    result = extract_and_normalize.parse_and_normalize_filing(str(path), "GOOG", engine="html")
+    assert (result.df, result.skip_reason) == (None, "Empty or invalid balance sheet.")
@@ -0,0 +1,134 @@
+# tests/test_ingest.py
+import os
+import json
+import logging
+
+import pytest
+
+from src import ingest
+from src.scripts.connect_or_create_document_db import BATCH_DONE, BATCH_PARTIAL, PARSE_FAILED, PARSE_OK, PARSE_PENDING, DocumentStore
+from src.scripts.connect_or_create_sql_db import connect_or_create_sql_db
+
+FILINGS = [
+    {"ticker": "TEST", "cik": "1", "accession": accession, "filing_date": "2025-02-01", "report_date": "2024-12-31",
+     "index_url": f"https://example.invalid/{accession}-index.htm"}
+    for accession in ("0001-24-000001", "0001-24-000002", "0001-24-000003")
+]
+
+# the first filing downloads and stores (and then fails to parse: its html has no tables), the second fails on the
+# download thread, the third in the store
+def test_download_and_store_failures_only_skip_their_filing(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(ingest.extract_and_normalize, "get_10k_filings", lambda ticker, years_back, client=None: FILINGS)
+
+    def fake_download(filing, tmp_dir, render_pdf, client=None):
+        if filing["accession"].endswith("2"):
+            raise ConnectionError("connection reset")
+        return f"https://example.invalid/{filing['accession']}.htm", "<html><body>no tables</body></html>", None
+    monkeypatch.setattr(ingest, "download_filing", fake_download)
+
+    store_downloaded_filing = ingest.store_downloaded_filing
+    def flaky_store(filing, store, *downloaded):
+        if filing["accession"].endswith("3"):
+            raise OSError("No space left on device")
+        store_downloaded_filing(filing, store, *downloaded)
+    monkeypatch.setattr(ingest, "store_downloaded_filing", flaky_store)
+
+    store = DocumentStore(str(tmp_path / "documents"))
+    conn = connect_or_create_sql_db(str(tmp_path / "financials.db"))
+    try:
+        with caplog.at_level(logging.WARNING, logger="src.ingest"):
+            summaries = ingest.ingest_tickers(["TEST"], 1, conn, store, engine="html", download_workers=2, discovery_workers=1)
+
+        summary = summaries["TEST"]
+        assert summary == {"found": 3, "processed": 0, "failed": 3, "rows_inserted": 0}
+        skipped = sorted(record.getMessage() for record in caplog.records if record.getMessage().startswith("Skipping "))
+        assert skipped == [
+            "Skipping 0001-24-000001: Empty or invalid balance sheet.",
+            "Skipping 0001-24-000002: download failed: connection reset",
+            "Skipping 0001-24-000003: storing the download failed: No space left on device",
+        ]
+
+        # the batch finished and recorded the ticker, rather than stopping with its progress half written
+        row = store.conn.execute("SELECT status, summary FROM batch_progress WHERE ticker = 'TEST'").fetchone()
+        assert row["status"] == BATCH_PARTIAL
+        assert json.loads(row["summary"]) == summary
+        # only the stored filing has a manifest row to record its parse failure in
+        stored = store.get(FILINGS[0]["accession"])
+        assert (stored["parse_status"], stored["error"]) == (PARSE_FAILED, "Empty or invalid balance sheet.")
+        assert store.get(FILINGS[1]["accession"]) is None
+        assert store.get(FILINGS[2]["accession"]) is None
+        assert os.listdir(os.path.join(store.root, "tmp")) == []
+    finally:
+        conn.close()
+        store.close()
+
+# the first run stores all three filings but is interrupted while parsing the second; the rerun downloads nothing,
+# parses only the two still pending and leaves the first filing's rows alone
+def test_an_interrupted_run_resumes_with_the_pending_filings(tmp_path, monkeypatch, goog_frames):
+    monkeypatch.setattr(ingest.extract_and_normalize, "get_10k_filings", lambda ticker, years_back, client=None: FILINGS)
+    downloaded = []
+    def fake_documents(index_urls, client=None):
+        for index_url in index_urls:
+            downloaded.append(index_url)
+            yield index_url, index_url.replace("-index", ""), f"<html><body>{index_url}</body></html>"
+    monkeypatch.setattr(ingest.extract_and_normalize, "fetch_10k_documents", fake_documents)
+
+    frames = {filing["accession"]: frame for filing, frame in zip(FILINGS, goog_frames)}
+    parsed, interrupt_at = [], [FILINGS[1]["accession"]]
+    def fake_parse(path, ticker, engine="pdf", as_of_date=None):
+        accession = next(filing["accession"] for filing in FILINGS if store.document_path(filing["accession"], "html") == path)
+        if accession in interrupt_at:
+            raise KeyboardInterrupt
+        parsed.append(accession)
+        return ingest.extract_and_normalize.ParsedFiling(path, frames[accession], None)
+
+    store = DocumentStore(str(tmp_path / "documents"))
+    conn = connect_or_create_sql_db(str(tmp_path / "financials.db"))
+    try:
+        monkeypatch.setattr(ingest.extract_and_normalize, "parse_and_normalize_filing", fake_parse)
+        with pytest.raises(KeyboardInterrupt):
+            ingest.ingest_ticker("TEST", 1, conn, store, engine="html", batch_size=1)
+        assert len(downloaded) == 3 and parsed == [FILINGS[0]["accession"]]
+        assert [store.get(filing["accession"])["parse_status"] for filing in FILINGS] == [PARSE_OK, PARSE_PENDING, PARSE_PENDING]
+        assert store.pending(FILINGS) == FILINGS[1:]
+        first_rows = conn.execute("SELECT COUNT(*) FROM balance_sheet").fetchone()[0]
+        assert first_rows == len(frames[FILINGS[0]["accession"]])
+
+        interrupt_at.clear()
+        summary = ingest.ingest_ticker("TEST", 1, conn, store, engine="html", batch_size=1)
+        assert len(downloaded) == 3
+        assert parsed == [filing["accession"] for filing in FILINGS]
+        assert summary == {"found": 3, "processed": 2, "failed": 0, "rows_inserted": len(frames[FILINGS[1]["accession"]]) + len(frames[FILINGS[2]["accession"]])}
+        assert store.pending(FILINGS) == []
+        assert conn.execute("SELECT COUNT(*) FROM balance_sheet").fetchone()[0] == first_rows + summary["rows_inserted"]
+
+        # nothing is left to do on a third run
+        assert ingest.ingest_ticker("TEST", 1, conn, store, engine="html")["processed"] == 0
+        assert len(parsed) == 3
+    finally:
+        conn.close()
+        store.close()
+
+# a multi-ticker rerun skips the tickers the same batch already finished, and only discovers the rest
+def test_a_batch_rerun_skips_completed_tickers(tmp_path, monkeypatch):
+    discovered = []
+    def fake_filings(ticker, years_back, client=None):
+        discovered.append(ticker)
+        return []
+    monkeypatch.setattr(ingest.extract_and_normalize, "get_10k_filings", fake_filings)
+
+    store = DocumentStore(str(tmp_path / "documents"))
+    conn = connect_or_create_sql_db(str(tmp_path / "financials.db"))
+    try:
+        store.record_ticker_progress(ingest.batch_id_for(["AAA", "BBB"], 1, "html"), "AAA", BATCH_DONE, {})
+        summaries = ingest.ingest_tickers(["aaa", "BBB"], 1, conn, store, engine="html", discovery_workers=1)
+        assert list(summaries) == ["BBB"] and discovered == ["BBB"]
+        assert sorted(store.completed_tickers(ingest.batch_id_for(["BBB", "AAA"], 1, "html"))) == ["AAA", "BBB"]
+
+        # without resume, or as another batch, every ticker runs again
+        ingest.ingest_tickers(["AAA", "BBB"], 1, conn, store, engine="html", discovery_workers=1, resume=False)
+        ingest.ingest_tickers(["AAA"], 1, conn, store, engine="html", discovery_workers=1)
+        assert sorted(discovered[1:3]) == ["AAA", "BBB"] and discovered[3:] == ["AAA"]
+    finally:
+        conn.close()
+        store.close()
@@ -0,0 +1,81 @@
+# tests/test_metadata_cache.py
+import json
+import types
+
+import pytest
+
+from src.utils.metadata_cache import COMPANY_TICKERS_URL, MetadataCache
+from src.utils.telemetry import TELEMETRY
+
+URL = "https://data.sec.gov/submissions/CIK0001652044.json"
+ETAG = '"abc123"'
+LAST_MODIFIED = "Fri, 14 Feb 2025 10:00:00 GMT"
+
+def counter(name: str) -> int:
+    return TELEMETRY.snapshot()["counters"].get(name, 0)
+
+# stands in for the SEC session: answers 304 when the request carries the current validators, else the body
+class FakeClient:
+    def __init__(self, body: bytes, etag: str = ETAG, last_modified: str = LAST_MODIFIED):
+        self.body, self.etag, self.last_modified = body, etag, last_modified
+        self.requests = []
+
+    def get(self, url, headers=None):
+        headers = dict(headers or {})
+        self.requests.append((url, headers))
+        if headers.get("If-None-Match") == self.etag:
+            return types.SimpleNamespace(status_code=304, content=b"", headers={})
+        return types.SimpleNamespace(status_code=200, content=self.body, headers={"ETag": self.etag, "Last-Modified": self.last_modified})
+
+@pytest.fixture
+def client():
+    return FakeClient(json.dumps({"cik": "0001652044", "name": "Alphabet Inc."}).encode())
+
+# a new MetadataCache over the same directory is a new process: it revalidates once, and a 304 keeps the stored body
+def test_not_modified_reuses_the_stored_body(tmp_path, client):
+    first = MetadataCache(str(tmp_path), client=client)
+    body_path, changed = first.fetch(URL)
+    assert changed and client.requests == [(URL, {})]
+
+    not_modified = counter("cache.sec_metadata.not_modified")
+    second = MetadataCache(str(tmp_path), client=client)
+    assert second.fetch(URL) == (body_path, False)
+    assert client.requests[-1] == (URL, {"If-None-Match": ETAG, "If-Modified-Since": LAST_MODIFIED})
+    assert second.get_json(URL) == {"cik": "0001652044", "name": "Alphabet Inc."}
+    assert counter("cache.sec_metadata.not_modified") - not_modified == 1
+    # revalidated once per process; the get_json above did not ask again
+    assert len(client.requests) == 2
+
+# a changed document comes back as a 200 with new validators, which replace the body and the stored ones
+def test_a_changed_document_replaces_the_body(tmp_path, client):
+    MetadataCache(str(tmp_path), client=client).fetch(URL)
+    client.body, client.etag = b'{"cik": "0001652044", "name": "Alphabet"}', '"def456"'
+
+    cache = MetadataCache(str(tmp_path), client=client)
+    assert cache.fetch(URL)[1]
+    assert client.requests[-1][1]["If-None-Match"] == ETAG
+    assert cache.get_json(URL)["name"] == "Alphabet"
+
+    MetadataCache(str(tmp_path), client=client).fetch(URL)
+    assert client.requests[-1][1]["If-None-Match"] == '"def456"'
+
+# a response younger than max_age is served without a request, whatever the process
+def test_fresh_responses_skip_revalidation(tmp_path, client):
+    MetadataCache(str(tmp_path), client=client).fetch(URL)
+    assert MetadataCache(str(tmp_path), client=client, max_age=3600).fetch(URL)[1] is False
+    assert len(client.requests) == 1
+
+# the ticker index is rebuilt from company_tickers.json only when SEC reports a change
+def test_ticker_index_is_rebuilt_only_on_change(tmp_path):
+    tickers = {"0": {"cik_str": 1652044, "ticker": "goog", "title": "Alphabet Inc."}, "1": {"cik_str": 1, "ticker": "GOOG", "title": "dup"}}
+    client = FakeClient(json.dumps(tickers).encode())
+    assert MetadataCache(str(tmp_path), client=client).lookup_cik("GOOG") == "0001652044"
+
+    # on a 304 the persisted index is loaded as it is, without re-reading the body
+    (tmp_path / "ticker_cik_index.json").write_text(json.dumps({"GOOG": "0001652044", "MSFT": "0000789019"}))
+    cache = MetadataCache(str(tmp_path), client=client)
+    assert cache.lookup_cik("MSFT") == "0000789019"
+    assert client.requests[-1][0] == COMPANY_TICKERS_URL and client.requests[-1][1]["If-None-Match"] == ETAG
+
+    client.body, client.etag = json.dumps({"0": {"cik_str": 789019, "ticker": "MSFT", "title": "Microsoft"}}).encode(), '"v2"'
+    assert MetadataCache(str(tmp_path), client=client).ticker_index() == {"MSFT": "0000789019"}
@@ -0,0 +1,83 @@
+# tests/test_normalize.py
+import os
+import glob
+
+import pandas as pd
+import pytest
+
+from src.sql_interface import generate_uid, generate_uids
+from src.utils import extract_and_normalize
+from src.utils.page_cache import PageCache
+from src.utils.path_helpers import project_root
+
+PDF_PATHS = sorted(glob.glob(os.path.join(project_root(), "data", "pdfs", "goog-*.pdf")))
+
+# the row-wise normalize_balance_sheet the vectorized version replaced, kept as the reference
+def normalize_rowwise(df: pd.DataFrame, company: str, as_of_date: str, statement_type: str = "balance_sheet") -> pd.DataFrame:
+    rows = []
+    current_section = None
+    filing_year = pd.to_datetime(as_of_date).year
+    for _, row in df.iterrows():
+        label = row["label"]
+        if label.endswith(":"):
+            current_section = label.rstrip(":")
+            continue
+        value = row.get("current_year")
+        if pd.notna(value):
+            rows.append({
+                "as_of_date": as_of_date,
+                "company": company,
+                "statement_type": statement_type,
+                "section": current_section,
+                "label": label,
+                "year": filing_year,
+                "value": value,
+            })
+    return pd.DataFrame(rows)
+
+# (as_of_date, cleaned balance sheet) of each bundled filing, laid out once through a private page cache
+@pytest.fixture(scope="module")
+def cleaned_filings(tmp_path_factory):
+    page_cache = PageCache(str(tmp_path_factory.mktemp("pages")))
+    filings = []
+    for path in PDF_PATHS:
+        with extract_and_normalize.PdfDocument(path, page_cache) as doc:
+            raw = extract_and_normalize.extract_table_from_page_index(doc)
+        assert raw is not None, f"no balance sheet found in {path}"
+        filings.append((extract_and_normalize.as_of_date_from_filename(os.path.basename(path)), extract_and_normalize.clean_balance_sheet(raw)))
+    return filings
+
+@pytest.mark.skipif(not PDF_PATHS, reason="bundled GOOG pdfs are missing")
+def test_vectorized_normalize_matches_rowwise(cleaned_filings):
+    for as_of_date, cleaned in cleaned_filings:
+        expected = normalize_rowwise(cleaned, "GOOG", as_of_date)
+        assert len(expected) > 20
+        pd.testing.assert_frame_equal(extract_and_normalize.normalize_balance_sheet(cleaned, "GOOG", as_of_date), expected)
+
+@pytest.mark.skipif(not PDF_PATHS, reason="bundled GOOG pdfs are missing")
+def test_vectorized_uids_match_rowwise(cleaned_filings):
+    for as_of_date, cleaned in cleaned_filings:
+        df = extract_and_normalize.normalize_balance_sheet(cleaned, "GOOG", as_of_date)
+        assert generate_uids(df).tolist() == df.apply(generate_uid, axis=1).tolist()
+
+# a table with no section headers, and one whose first rows come before any header, match too and warn about nothing
+@pytest.mark.filterwarnings("error")
+@pytest.mark.parametrize("labels", [["Cash", "Goodwill", "Total assets"], ["Cash", "Current assets:", "Goodwill", "Total assets"]])
+def test_rows_outside_any_section(labels):
+    cleaned = pd.DataFrame({"label": labels, "current_year": [1.0, None, 3.0, 4.0][:len(labels)], "previous_year": None})
+    normalized = extract_and_normalize.normalize_balance_sheet(cleaned, "GOOG", "2024-12-31")
+    pd.testing.assert_frame_equal(normalized, normalize_rowwise(cleaned, "GOOG", "2024-12-31"))
+
+# the stored uids were made by the row-wise version, so the vectorized one must reproduce them exactly
+def test_uids_match_the_bundled_database(bundled_rows, goog_frames):
+    stored = {row[0] for row in bundled_rows}
+    assert {uid for frame in goog_frames for uid in generate_uids(frame)} == stored
+
+def test_rows_before_the_first_header_and_missing_values():
+    cleaned = pd.DataFrame({
+        "label": ["Cash", "Current assets:", "Receivables", "Inventory", "Liabilities:", "Debt"],
+        "current_year": [1.0, None, 2.0, None, None, 3.0],
+        "previous_year": [0.5, None, 1.5, 1.0, None, 2.5],
+    })
+    pd.testing.assert_frame_equal(extract_and_normalize.normalize_balance_sheet(cleaned, "TEST", "2024-06-30"),
+                                  normalize_rowwise(cleaned, "TEST", "2024-06-30"))
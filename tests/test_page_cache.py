@@ -0,0 +1,104 @@
+# tests/test_page_cache.py
+import os
+import glob
+import gzip
+import json
+import shutil
+
+import pytest
+
+from src.utils import extract_and_normalize
+from src.utils.page_cache import PAGE_CACHE_SUFFIX, PAGE_CACHE_VERSION, PageCache, file_sha256, settings_key
+from src.utils.path_helpers import project_root
+from src.utils.telemetry import TELEMETRY
+
+PDF_PATHS = sorted(glob.glob(os.path.join(project_root(), "data", "pdfs", "goog-*.pdf")))
+needs_pdfs = pytest.mark.skipif(len(PDF_PATHS) < 2, reason="bundled GOOG pdfs are missing")
+
+ENTRY = {"n_pages": 2, "text": {"0": "Balance Sheets", "1": None}, "tables": {"0": [[["Cash", "1,234"], [None, "5"]]]}}
+
+def counter(name: str) -> int:
+    return TELEMETRY.snapshot()["counters"].get(name, 0)
+
+def entries(cache: PageCache) -> list:
+    return sorted(os.path.basename(path) for path in glob.glob(os.path.join(cache.cache_dir, f"*{PAGE_CACHE_SUFFIX}")))
+
+@pytest.fixture
+def cache(tmp_path):
+    return PageCache(str(tmp_path / "pages"))
+
+# a private copy of a bundled pdf, so the test can swap its bytes under the same name
+@pytest.fixture
+def pdf_copy(tmp_path):
+    path = str(tmp_path / "goog-20211231.pdf")
+    shutil.copy(PDF_PATHS[0], path)
+    return path
+
+def first_page(path: str, cache: PageCache):
+    with extract_and_normalize.PdfDocument(path, cache) as doc:
+        return doc.page_text(0), doc._pdf is not None
+
+def test_entries_round_trip_through_gzip(cache):
+    cache.save("abc", "s1", ENTRY)
+    path = cache.entry_path("abc", "s1")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        assert json.load(f) == {**ENTRY, "version": PAGE_CACHE_VERSION}
+    assert cache.load("abc", "s1") == {**ENTRY, "version": PAGE_CACHE_VERSION}
+    assert cache.load("abc", "s2") is None
+
+@pytest.mark.parametrize("content", [b"not gzip at all", gzip.compress(b"{\"n_pages\": ")[:-6], gzip.compress(b"[1, 2")])
+def test_a_corrupt_entry_is_a_miss(cache, content):
+    with open(cache.entry_path("abc", "s1"), "wb") as f:
+        f.write(content)
+    misses = counter("cache.pages.misses")
+    assert cache.load("abc", "s1") is None
+    assert counter("cache.pages.misses") - misses == 1
+
+    # and is simply replaced by the next save
+    cache.save("abc", "s1", ENTRY)
+    assert cache.load("abc", "s1")["text"] == ENTRY["text"]
+
+def test_an_entry_from_another_version_is_a_miss(cache):
+    with gzip.open(cache.entry_path("abc", "s1"), "wt", encoding="utf-8") as f:
+        json.dump({**ENTRY, "version": PAGE_CACHE_VERSION + 1}, f)
+    assert cache.load("abc", "s1") is None
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = PageCache(str(tmp_path / "pages"), max_bytes=10 ** 9)
+    for i, doc_hash in enumerate(("a", "b", "c")):
+        cache.save(doc_hash, "s", ENTRY)
+        os.utime(cache.entry_path(doc_hash, "s"), (1000 + i, 1000 + i))
+    cache.load("a", "s")
+    cache.max_bytes = 2 * os.path.getsize(cache.entry_path("a", "s"))
+    assert cache.evict() == 1
+    assert entries(cache) == [f"a-s{PAGE_CACHE_SUFFIX}", f"c-s{PAGE_CACHE_SUFFIX}"]
+
+# the second open of the same bytes reads its pages from the cache without opening pdfplumber
+@needs_pdfs
+def test_pages_are_reused_for_the_same_pdf_bytes(cache, pdf_copy):
+    text, opened = first_page(pdf_copy, cache)
+    assert opened and text
+    key = f"{file_sha256(pdf_copy)}-{settings_key(extract_and_normalize.extractor_settings())}{PAGE_CACHE_SUFFIX}"
+    assert entries(cache) == [key]
+
+    # a renamed copy has the same bytes and so the same entry
+    renamed = pdf_copy.replace("goog-20211231", "renamed")
+    shutil.copy(pdf_copy, renamed)
+    assert first_page(renamed, cache) == (text, False)
+    assert entries(cache) == [key]
+
+# different bytes under the same path, or different extraction settings, start a new entry instead of reusing the old
+@needs_pdfs
+def test_key_follows_the_pdf_hash_and_the_extraction_settings(cache, pdf_copy, monkeypatch):
+    text, _ = first_page(pdf_copy, cache)
+    [original] = entries(cache)
+
+    shutil.copy(PDF_PATHS[1], pdf_copy)
+    other_text, opened = first_page(pdf_copy, cache)
+    assert opened and other_text != text
+    assert len(entries(cache)) == 2 and original in entries(cache)
+
+    settings = extract_and_normalize.extractor_settings()
+    monkeypatch.setattr(extract_and_normalize, "extractor_settings", lambda: {**settings, "text": {**settings["text"], "x_tolerance": 5}})
+    assert first_page(pdf_copy, cache)[1]
+    assert len(entries(cache)) == 3
@@ -0,0 +1,97 @@
+# tests/test_page_index.py
+import os
+import glob
+import json
+
+import pytest
+
+from src.utils import page_index
+from src.utils.page_cache import file_sha256
+from src.utils.page_index import PAGE_INDEX_VERSION, PageIndex, load_or_build_page_index, page_index_path
+from src.utils.path_helpers import project_root
+from src.utils.telemetry import TELEMETRY
+
+PDF_PATHS = sorted(glob.glob(os.path.join(project_root(), "data", "pdfs", "goog-*.pdf")))
+needs_pdfs = pytest.mark.skipif(not PDF_PATHS, reason="bundled GOOG pdfs are missing")
+
+def counter(name: str) -> int:
+    return TELEMETRY.snapshot()["counters"].get(name, 0)
+
+# any file will do as the "pdf" once the build itself is stubbed; the sidecar is keyed on its bytes
+@pytest.fixture
+def pdf_file(tmp_path):
+    path = str(tmp_path / "filing.pdf")
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4 not really a pdf")
+    return path
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+
+    def fake_build(pdf_path, source_hash=None, stop_early=False):
+        calls.append(pdf_path)
+        return PageIndex(3, {"total assets": [2]}, {"consolidated balance sheets": [2]}, [0.0, 0.1, 0.9], source_hash)
+
+    monkeypatch.setattr(PageIndex, "build", staticmethod(fake_build))
+    return calls
+
+def test_sidecar_is_written_once_and_reused(pdf_file, builds):
+    hits, misses = counter("cache.page_index.hits"), counter("cache.page_index.misses")
+    first = load_or_build_page_index(pdf_file)
+    with open(page_index_path(pdf_file), "r", encoding="utf-8") as f:
+        assert json.load(f) == first.to_dict()
+    assert first.source_hash == file_sha256(pdf_file)
+
+    again = load_or_build_page_index(pdf_file, first.source_hash)
+    assert builds == [pdf_file]
+    assert again.to_dict() == first.to_dict()
+    assert counter("cache.page_index.hits") - hits == 1 and counter("cache.page_index.misses") - misses == 1
+
+# a sidecar for other bytes, from another version or that cannot be parsed is rebuilt and overwritten
+@pytest.mark.parametrize("stale", [
+    lambda data: json.dumps({**data, "source_hash": "0" * 64}),
+    lambda data: json.dumps({**data, "version": PAGE_INDEX_VERSION - 1}),
+    lambda data: json.dumps(data)[:-20],
+    lambda data: json.dumps({"version": PAGE_INDEX_VERSION}),
+])
+def test_stale_or_broken_sidecars_are_rebuilt(pdf_file, builds, stale):
+    data = load_or_build_page_index(pdf_file).to_dict()
+    with open(page_index_path(pdf_file), "w", encoding="utf-8") as f:
+        f.write(stale(data))
+
+    assert load_or_build_page_index(pdf_file).to_dict() == data
+    assert len(builds) == 2
+    with open(page_index_path(pdf_file), "r", encoding="utf-8") as f:
+        assert json.load(f) == data
+
+def test_new_bytes_under_the_same_name_rebuild(pdf_file, builds):
+    load_or_build_page_index(pdf_file)
+    with open(pdf_file, "ab") as f:
+        f.write(b" amended")
+    assert load_or_build_page_index(pdf_file).source_hash == file_sha256(pdf_file)
+    assert len(builds) == 2
+
+# the page with the title and every line item outranks an earlier one that only mentions a few totals
+def test_rank_pages_orders_by_title_terms_and_numeric_share():
+    index = PageIndex(
+        60,
+        {"total assets": [4, 50], "total liabilities": [4, 50], "total current assets": [50], "retained earnings": [50]},
+        {"consolidated balance sheets": [50]},
+        [0.0] * 4 + [0.8] + [0.0] * 45 + [0.9] + [0.0] * 9,
+    )
+    assert index.rank_pages() == [(50, 22.5)]
+    assert index.rank_pages("income_statement") == []
+    assert PageIndex.from_dict(json.loads(json.dumps(index.to_dict()))).rank_pages() == [(50, 22.5)]
+
+# a full build covers every page; stopping early reads less of the filing and still lands on the statement here
+@needs_pdfs
+def test_full_and_early_builds_agree_on_the_balance_sheet_page():
+    full = PageIndex.build(PDF_PATHS[0])
+    assert len(full.numeric) == full.n_pages
+    best, score = full.rank_pages()[0]
+    assert score >= page_index.CONCLUSIVE_SCORE
+
+    early = PageIndex.build(PDF_PATHS[0], stop_early=True)
+    assert len(early.numeric) == best + 1 < early.n_pages
+    assert early.rank_pages()[0] == (best, score)
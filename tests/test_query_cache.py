@@ -0,0 +1,71 @@
+# tests/test_query_cache.py
+import pytest
+
+from src import sql_interface
+from src.scripts.connect_or_create_sql_db import bump_data_version, connect_or_create_sql_db, get_data_version
+from src.utils.query_cache import PersistentCache
+
+LIABILITIES_SQL = "SELECT as_of_date, value FROM balance_sheet WHERE company = 'GOOG' AND label = 'Total liabilities' ORDER BY as_of_date"
+
+@pytest.fixture
+def conn(db_copy):
+    conn = connect_or_create_sql_db(db_copy)
+    yield conn
+    conn.close()
+
+# counts the queries that actually reach sqlite
+@pytest.fixture
+def executions(monkeypatch):
+    calls = []
+    execute_sql_query = sql_interface.execute_sql_query
+    def counting(query, conn, *args, **kwargs):
+        calls.append(query)
+        return execute_sql_query(query, conn, *args, **kwargs)
+    monkeypatch.setattr(sql_interface, "execute_sql_query", counting)
+    return calls
+
+def test_results_are_reused_until_the_data_version_bumps(conn, executions, goog_frames, tmp_path):
+    cache = PersistentCache("sql_results", db_path=str(tmp_path / "cache.db"))
+
+    first = sql_interface.execute_sql_query_cached(LIABILITIES_SQL, conn, cache)
+    assert len(first.rows) == len(goog_frames)
+    assert sql_interface.execute_sql_query_cached(LIABILITIES_SQL, conn, cache) == first
+    assert len(executions) == 1
+
+    # a load that adds nothing leaves the version, and the cached result, alone
+    version = get_data_version(conn)
+    sql_interface.bulk_insert_balance_sheets(goog_frames, conn)
+    assert get_data_version(conn) == version
+    sql_interface.execute_sql_query_cached(LIABILITIES_SQL, conn, cache)
+    assert len(executions) == 1
+
+    # a new filing bumps it, and the next lookup runs the query against the new data
+    frame = goog_frames[-1].assign(as_of_date="2025-12-31", year=2025, value=goog_frames[-1]["value"] * 2)
+    assert sql_interface.bulk_insert_balance_sheets([frame], conn).inserted == len(frame)
+    assert get_data_version(conn) != version
+    refreshed = sql_interface.execute_sql_query_cached(LIABILITIES_SQL, conn, cache)
+    assert len(executions) == 2
+    assert len(refreshed.rows) == len(first.rows) + 1
+    assert refreshed.rows[-1][0] == "2025-12-31"
+
+def test_bump_changes_the_version_and_misses(conn, executions, tmp_path):
+    cache = PersistentCache("sql_results", db_path=str(tmp_path / "cache.db"))
+    sql_interface.execute_sql_query_cached(LIABILITIES_SQL, conn, cache)
+
+    database_id, version = get_data_version(conn).split(":")
+    bump_data_version(conn)
+    conn.commit()
+    assert get_data_version(conn) == f"{database_id}:{int(version) + 1}"
+
+    sql_interface.execute_sql_query_cached(LIABILITIES_SQL, conn, cache)
+    assert len(executions) == 2
+
+# two databases never share cached results, even at the same data version
+def test_versions_of_different_databases_differ(tmp_path):
+    first = connect_or_create_sql_db(str(tmp_path / "a.db"))
+    second = connect_or_create_sql_db(str(tmp_path / "b.db"))
+    try:
+        assert get_data_version(first) != get_data_version(second)
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,58 @@
+# tests/test_result_compaction.py
+import pytest
+
+from src.utils.result_compaction import SUMMARY_EDGE_ROWS, compact_results, estimate_tokens, format_cell, render_table
+
+COLUMNS = ["company", "year", "label", "value"]
+
+# one row per company, year and label; long enough that the whole table is far over any budget used here
+def fact_rows(n: int) -> list:
+    labels = ["Total assets", "Total liabilities", "Goodwill", "Retained earnings"]
+    return [(f"C{i // 20:03d}", 2000 + i % 20, labels[i % len(labels)], 1000.0 + i * 12.5) for i in range(n)]
+
+def test_small_results_are_the_whole_table():
+    rows = fact_rows(5)
+    assert compact_results(COLUMNS, rows) == render_table(COLUMNS, rows)
+    assert compact_results(COLUMNS, rows, truncated=True).endswith("(cut off at the row cap; the query matched more rows)")
+    assert compact_results(COLUMNS, []) == "(no rows)"
+
+def test_cells_are_written_compactly():
+    assert [format_cell(value) for value in (119013.0, 2.5, 1 / 3, None, "GOOG", 7)] == ["119013", "2.5", "0.3333", "NULL", "GOOG", "7"]
+
+@pytest.mark.parametrize("budget", [120, 200, 250, 500, 2000])
+def test_summary_stays_within_the_token_budget(budget):
+    rows = fact_rows(1000)
+    assert estimate_tokens(render_table(COLUMNS, rows)) > budget
+
+    text = compact_results(COLUMNS, rows, token_budget=budget)
+    assert estimate_tokens(text) <= budget
+    assert text.startswith("1000 rows, summarized:")
+
+# the summary keeps the column header and the first rows in order, and says how many rows it left out
+def test_summary_keeps_the_header_and_first_rows_and_marks_the_elision():
+    rows = fact_rows(1000)
+    lines = compact_results(COLUMNS, rows, token_budget=2000).splitlines()
+
+    first = lines.index(f"First {SUMMARY_EDGE_ROWS} rows:")
+    assert lines[first + 1] == " | ".join(COLUMNS)
+    assert lines[first + 2:first + 2 + SUMMARY_EDGE_ROWS] == render_table([], rows[:SUMMARY_EDGE_ROWS]).splitlines()
+    assert lines[first + 2 + SUMMARY_EDGE_ROWS] == f"... {1000 - 2 * SUMMARY_EDGE_ROWS} rows not shown ..."
+    last = lines.index(f"Last {SUMMARY_EDGE_ROWS} rows:")
+    assert lines[last + 2:] == render_table([], rows[-SUMMARY_EDGE_ROWS:]).splitlines()
+
+    # per-column statistics cover every row, not just the ones shown
+    assert "- value: min 1000, max 13487.5, mean 7243.75, sum 7243750" in lines
+    assert "- company: 50 distinct, from C000 to C049; most common: C000 (20), C001 (20), C002 (20), C003 (20), C004 (20)" in lines
+
+# a tighter budget shows fewer edge rows, down to none, and the marker still accounts for every row
+def test_edge_rows_shrink_with_the_budget():
+    rows = fact_rows(1000)
+    for budget, edge in ((2000, SUMMARY_EDGE_ROWS), (250, 5), (200, 2)):
+        text = compact_results(COLUMNS, rows, token_budget=budget)
+        assert f"First {edge} rows:" in text and f"... {1000 - 2 * edge} rows not shown ..." in text
+    # only the statistics fit
+    tight = compact_results(COLUMNS, rows, token_budget=120)
+    assert "First" not in tight and tight.endswith("... all 1000 rows not shown ...")
+
+    truncated = compact_results(COLUMNS, rows, truncated=True, token_budget=2000)
+    assert truncated.startswith("1000 rows (cut off at the row cap; the query matched more), summarized:")
@@ -0,0 +1,57 @@
+# tests/test_schema_migration.py
+import sqlite3
+
+import pytest
+
+from src.scripts.connect_or_create_sql_db import SCHEMA_VERSION, MigrationError, connect_or_create_sql_db, get_schema_version
+
+# the v1 columns, declared without the uid key so a test table can hold rows that conflict on uid
+V1_DDL = "CREATE TABLE balance_sheet (uid TEXT, as_of_date TEXT, company TEXT, statement_type TEXT, section TEXT, label TEXT, year TEXT, value REAL)"
+
+def v1_database(path: str, rows) -> str:
+    conn = sqlite3.connect(path)
+    conn.execute(V1_DDL)
+    conn.executemany("INSERT INTO balance_sheet VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return path
+
+# every fact of the bundled v1 table comes back through the v2 view, with the year now an integer
+def test_bundled_database_migrates_row_for_row(db_copy, bundled_rows):
+    conn = connect_or_create_sql_db(db_copy)
+    try:
+        assert get_schema_version(conn) == SCHEMA_VERSION
+        assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'balance_sheet'").fetchone()[0] == "view"
+        migrated = conn.execute("SELECT uid, as_of_date, company, statement_type, section, label, year, value FROM balance_sheet ORDER BY uid").fetchall()
+    finally:
+        conn.close()
+
+    assert len(migrated) == len(bundled_rows)
+    assert migrated == [row[:6] + (int(row[6]),) + row[7:] for row in bundled_rows]
+
+def test_exact_duplicates_are_stored_once(tmp_path, bundled_rows):
+    path = v1_database(str(tmp_path / "v1.db"), bundled_rows[:10] + bundled_rows[:3])
+    conn = connect_or_create_sql_db(path)
+    try:
+        assert conn.execute("SELECT count(*) FROM balance_sheet_facts").fetchone()[0] == 10
+    finally:
+        conn.close()
+
+# a row without a company and a uid reused for a different value cannot be moved; the v1 table is kept as it was
+def test_rows_that_cannot_be_moved_abort_the_migration(tmp_path, bundled_rows, caplog):
+    orphan = (bundled_rows[0][0][:-4] + "beef",) + bundled_rows[0][1:2] + (None,) + bundled_rows[0][3:]
+    conflicting = bundled_rows[1][:-1] + (bundled_rows[1][-1] + 1,)
+    rows = bundled_rows[:10] + [orphan, conflicting]
+    path = v1_database(str(tmp_path / "v1.db"), rows)
+
+    with pytest.raises(MigrationError, match="10 of 12"):
+        connect_or_create_sql_db(path)
+    assert orphan[0] in caplog.text and conflicting[0] in caplog.text
+
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'balance_sheet'").fetchone()[0] == "table"
+        assert conn.execute("SELECT count(*) FROM balance_sheet").fetchone()[0] == len(rows)
+        assert conn.execute("SELECT count(*) FROM sqlite_master WHERE name IN ('balance_sheet_v1', 'balance_sheet_facts')").fetchone()[0] == 0
+    finally:
+        conn.close()
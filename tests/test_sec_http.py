@@ -0,0 +1,143 @@
+# tests/test_sec_http.py
+import os
+import sys
+import time
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils import sec_http
+from src.utils.telemetry import TELEMETRY
+
+# path -> list of (status, headers) served in turn; the last one repeats once the list runs out
+SCRIPTS = {
+    "/flaky": [(429, {}), (503, {"Retry-After": "1"}), (200, {})],
+    "/broken": [(404, {})],
+}
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            script = SCRIPTS.get(self.path, [(200, {})])
+            status, headers = script[min(server.hits[self.path], len(script)) - 1]
+        body = self.path.encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+# a local stub server with the module's base URLs pointed at it; monkeypatch puts them back afterwards
+@pytest.fixture
+def stub_sec(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.hits = {}
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(sec_http, "SEC_WWW_URL", base_url)
+    monkeypatch.setattr(sec_http, "SEC_DATA_URL", base_url)
+    try:
+        yield sec_http, server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+# a limiter that never makes a test wait
+def unlimited(module):
+    return module.TokenBucket(rate=1e6, capacity=1e6)
+
+# read once at import, so checked in a fresh interpreter rather than by reloading the module under other importers
+def test_base_urls_follow_the_environment():
+    script = "from src.utils import sec_http; print(sec_http.SEC_WWW_URL, sec_http.SEC_DATA_URL)"
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    env = {**os.environ, "SEC_WWW_URL": "http://127.0.0.1:8123/", "SEC_DATA_URL": "http://127.0.0.1:8124"}
+    output = subprocess.run([sys.executable, "-c", script], cwd=root, env=env, capture_output=True, text=True, check=True).stdout
+    assert output.split() == ["http://127.0.0.1:8123", "http://127.0.0.1:8124"]
+
+def test_retries_429_then_503_with_retry_after(stub_sec, monkeypatch):
+    module, server = stub_sec
+    sleeps = []
+    monkeypatch.setattr(module.time, "sleep", sleeps.append)
+    retries_before = TELEMETRY.snapshot()["counters"].get("http.retries", 0)
+
+    client = module.SecClient(limiter=unlimited(module), backoff=0.25)
+    response = client.get(f"{module.SEC_WWW_URL}/flaky")
+
+    assert response.status_code == 200
+    assert server.hits["/flaky"] == 3
+    # exponential backoff for the bare 429, then the server's Retry-After for the 503
+    assert sleeps == [0.25, 1.0]
+    assert TELEMETRY.snapshot()["counters"]["http.retries"] - retries_before == 2
+
+def test_gives_up_after_max_retries(stub_sec, monkeypatch):
+    module, server = stub_sec
+    monkeypatch.setattr(module.time, "sleep", lambda seconds: None)
+    client = module.SecClient(limiter=unlimited(module), max_retries=1)
+
+    with pytest.raises(Exception) as excinfo:
+        client.get(f"{module.SEC_WWW_URL}/flaky")
+    # the 503 is the last attempt and comes back as an HTTP error, not another retry
+    assert "503" in str(excinfo.value)
+    assert server.hits["/flaky"] == 2
+
+def test_token_bucket_paces_requests_past_the_burst(stub_sec):
+    module, _ = stub_sec
+    rate, burst, n = 20.0, 5, 25
+    limiter = module.TokenBucket(rate=rate, capacity=burst)
+    client = module.SecClient(limiter=limiter)
+
+    start = time.monotonic()
+    for i in range(n):
+        client.get(f"{module.SEC_DATA_URL}/paced/{i}")
+    elapsed = time.monotonic() - start
+
+    assert elapsed >= (n - burst) / rate * 0.95
+
+# acquisitions in the first second from several threads: the SEC limiter's settings stay within the fair-access limit,
+# where a bucket that starts with a full second's worth of tokens lets through about twice that
+@pytest.mark.parametrize("capacity, most", [(None, sec_http.SEC_MAX_REQUESTS_PER_SECOND), (sec_http.SEC_MAX_REQUESTS_PER_SECOND, 2 * sec_http.SEC_MAX_REQUESTS_PER_SECOND)])
+def test_first_second_stays_within_the_limit(capacity, most):
+    start = time.monotonic()
+    limiter = sec_http.TokenBucket(sec_http.SEC_RATE_LIMITER.rate, sec_http.SEC_RATE_LIMITER.capacity if capacity is None else capacity)
+    times = []
+
+    def worker():
+        while time.monotonic() - start < 1.0:
+            limiter.acquire()
+            times.append(time.monotonic() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    first_second = sum(1 for t in times if t < 1.0)
+    assert most - 2 <= first_second <= most
+
+def test_get_many_keeps_order_and_captures_failures(stub_sec):
+    module, _ = stub_sec
+    client = module.SecClient(limiter=unlimited(module), max_retries=0)
+    urls = [f"{module.SEC_WWW_URL}/doc/{i}" for i in range(8)]
+    urls.insert(3, f"{module.SEC_WWW_URL}/broken")
+
+    results = client.get_many(urls, max_workers=4)
+
+    assert [url for url, _ in results] == urls
+    for url, result in results:
+        if url.endswith("/broken"):
+            assert isinstance(result, Exception)
+        else:
+            assert result.status_code == 200
+            assert result.text == url[len(module.SEC_WWW_URL):]
@@ -0,0 +1,113 @@
+# tests/test_sql_guard.py
+import gc
+import sqlite3
+
+import pytest
+
+from src.scripts.connect_or_create_sql_db import connect_or_create_sql_db, connect_read_only
+from src.sql_interface import execute_sql_query
+from src.utils import sql_guard
+from src.utils.sql_guard import QueryRejected, QueryTimeout, run_guarded_query
+from src.utils.telemetry import TELEMETRY
+
+CROSS_JOIN_SQL = "SELECT count(*) FROM balance_sheet_facts a, balance_sheet_facts b, balance_sheet_facts c"
+ENDLESS_SQL = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT max(x) FROM n"
+
+# the project's read-only connection, its writable one, and a plain sqlite3 connection without the subclass
+@pytest.fixture(params=["read_only", "writable", "plain"])
+def conn(request, migrated_db):
+    if request.param == "read_only":
+        conn = connect_read_only(migrated_db)
+    elif request.param == "writable":
+        conn = connect_or_create_sql_db(migrated_db)
+    else:
+        conn = sqlite3.connect(migrated_db)
+    yield conn
+    conn.close()
+
+def counter(name: str) -> int:
+    return TELEMETRY.snapshot()["counters"].get(name, 0)
+
+def fact_count(conn) -> int:
+    return conn.execute("SELECT count(*) FROM balance_sheet_facts").fetchone()[0]
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM balance_sheet_facts",
+    "UPDATE balance_sheet_facts SET value = 0",
+    "DROP TABLE balance_sheet_facts",
+    "ATTACH DATABASE ':memory:' AS other",
+    "PRAGMA writable_schema = ON",
+])
+def test_anything_but_reading_is_rejected(conn, sql):
+    before = fact_count(conn)
+    # twice, so a plan or statement cached by the first attempt cannot let the second through
+    for _ in range(2):
+        with pytest.raises(QueryRejected, match="other than reading"):
+            run_guarded_query(conn, sql)
+    assert fact_count(conn) == before
+
+# a write behind a WITH passes the SELECT/WITH prefix check and is stopped by the authorizer
+def test_write_hidden_in_a_cte_is_rejected(conn):
+    with pytest.raises(QueryRejected):
+        execute_sql_query("WITH x AS (SELECT 1) DELETE FROM balance_sheet_facts", conn)
+    with pytest.raises(QueryRejected, match="Only SELECT or WITH"):
+        execute_sql_query("DELETE FROM balance_sheet_facts", conn)
+
+def test_plan_over_the_row_limit_is_rejected(conn):
+    rejected = counter("sql.rejected")
+    for _ in range(2):
+        with pytest.raises(QueryRejected, match="would visit about"):
+            run_guarded_query(conn, CROSS_JOIN_SQL, max_plan_rows=100_000)
+    assert counter("sql.rejected") - rejected == 2
+    # one scan of the same table is well under the limit
+    assert run_guarded_query(conn, "SELECT count(*) FROM balance_sheet_facts a", max_plan_rows=100_000).rows == [(fact_count(conn),)]
+
+def test_time_budget_stops_a_runaway_query(conn):
+    with pytest.raises(QueryTimeout):
+        run_guarded_query(conn, ENDLESS_SQL, time_budget=0.2, max_plan_rows=10 ** 12)
+    # the budget only applied to that query
+    assert run_guarded_query(conn, "SELECT 1").rows == [(1,)]
+
+def test_results_are_cut_off_at_max_rows(conn):
+    result = run_guarded_query(conn, "SELECT uid FROM balance_sheet_facts", max_rows=5)
+    assert result.truncated and len(result.rows) == 5
+    result = run_guarded_query(conn, "SELECT uid FROM balance_sheet_facts", max_rows=fact_count(conn))
+    assert not result.truncated
+
+# the guard stays installed on the connection, but only acts while a guarded query runs
+def test_connection_writes_normally_between_guarded_queries(migrated_db):
+    conn = connect_or_create_sql_db(migrated_db)
+    try:
+        run_guarded_query(conn, "SELECT count(*) FROM labels")
+        conn.execute("INSERT INTO labels (name) VALUES ('Guard test')")
+        conn.commit()
+        assert run_guarded_query(conn, "SELECT count(*) FROM labels WHERE name = 'Guard test'").rows == [(1,)]
+    finally:
+        conn.close()
+
+def test_plan_estimates_are_reused_until_a_write(migrated_db):
+    conn = connect_or_create_sql_db(migrated_db)
+    try:
+        query = "SELECT value FROM balance_sheet WHERE company = 'GOOG' AND label = 'Total liabilities'"
+        hits = counter("sql.plan_cache_hits")
+        run_guarded_query(conn, query)
+        run_guarded_query(conn, query)
+        assert counter("sql.plan_cache_hits") - hits == 1
+
+        conn.execute("INSERT INTO labels (name) VALUES ('Guard test')")
+        conn.commit()
+        run_guarded_query(conn, query)
+        assert counter("sql.plan_cache_hits") - hits == 1
+    finally:
+        conn.close()
+
+# the per-connection state goes away with its connection instead of piling up under reused ids
+def test_guard_state_is_dropped_with_the_connection(migrated_db):
+    conn = connect_read_only(migrated_db)
+    run_guarded_query(conn, "SELECT 1")
+    assert conn in sql_guard._guard_states
+    before = len(sql_guard._guard_states)
+    conn.close()
+    del conn
+    gc.collect()
+    assert len(sql_guard._guard_states) == before - 1
@@ -0,0 +1,109 @@
+# tests/test_stream_answer.py
+import types
+
+import pytest
+
+from src import sql_interface
+from src.scripts.connect_or_create_sql_db import connect_or_create_sql_db
+from src.utils.query_cache import PersistentCache
+
+SCALAR_SQL = "SELECT value FROM balance_sheet WHERE company = 'GOOG' AND label = 'Total liabilities' AND as_of_date = '2024-12-31'"
+HISTORY_SQL = "SELECT as_of_date, value FROM balance_sheet WHERE company = 'GOOG' AND label = 'Total liabilities' ORDER BY as_of_date"
+
+# the synchronous OpenAI client: the NL -> SQL call gets canned SQL, the answer call a canned stream, unless
+# answering is not allowed at all
+class FakeClient:
+    def __init__(self, sql: str, answer_chunks=("Total liabilities ", "rose ", "each year."), allow_answer: bool = True):
+        self.sql = sql
+        self.answer_chunks = answer_chunks
+        self.allow_answer = allow_answer
+        self.calls = []
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, model, messages, temperature=0, stream=False, **kwargs):
+        self.calls.append("answer" if stream else "sql")
+        if not stream:
+            message = types.SimpleNamespace(content=f"```sql\n{self.sql}\n```")
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+        assert self.allow_answer, "the answer model was called for a result that needs no phrasing"
+        chunks = [types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=text))], usage=None)
+                  for text in self.answer_chunks]
+        # the usage-only chunk the API sends last
+        return iter(chunks + [types.SimpleNamespace(choices=[], usage=types.SimpleNamespace(prompt_tokens=50, completion_tokens=5))])
+
+@pytest.fixture
+def conn(migrated_db):
+    conn = connect_or_create_sql_db(migrated_db)
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def caches(tmp_path):
+    return {namespace: PersistentCache(namespace, db_path=str(tmp_path / "cache.db")) for namespace in ("nl_to_sql", "sql_results", "answers")}
+
+def ask(question: str, conn, caches) -> list:
+    return list(sql_interface.stream_answer_from_db(
+        sql_interface.BALANCE_SHEET_SCHEMA, question, conn, caches["nl_to_sql"], caches["sql_results"], caches["answers"]
+    ))
+
+@pytest.mark.parametrize("rows, expected", [
+    ([], "No matching data was found in the database."),
+    ([(119013.0,)], "119,013"),
+    ([(2.5,)], "2.5"),
+    ([("GOOG",), ("MSFT",), (None,)], "GOOG, MSFT, NULL"),
+    ([(2021,), (True,)], "2,021, True"),
+])
+def test_direct_answers(rows, expected):
+    assert sql_interface.format_direct_answer(rows) == expected
+
+# several columns or too many rows are left for the model to phrase
+def test_no_direct_answer_for_tables():
+    assert sql_interface.format_direct_answer([("GOOG", 1.0)]) is None
+    assert sql_interface.format_direct_answer([(i,) for i in range(sql_interface.DIRECT_ANSWER_MAX_ROWS + 1)]) is None
+    assert sql_interface.format_direct_answer([(i,) for i in range(sql_interface.DIRECT_ANSWER_MAX_ROWS)]) is not None
+
+def test_scalar_result_never_reaches_the_answer_model(conn, caches, monkeypatch):
+    client = FakeClient(SCALAR_SQL, allow_answer=False)
+    monkeypatch.setattr(sql_interface, "get_client", lambda: client)
+    (value,) = conn.execute(SCALAR_SQL).fetchone()
+
+    assert ask("What were GOOG's total liabilities at the end of 2024?", conn, caches) == [sql_interface.format_value(value)]
+    assert client.calls == ["sql"]
+
+# the streamed chunks arrive one by one, and their join is what a repeat of the question gets from the answer cache
+def test_streamed_chunks_join_into_the_cached_answer(conn, caches, monkeypatch):
+    client = FakeClient(HISTORY_SQL)
+    monkeypatch.setattr(sql_interface, "get_client", lambda: client)
+    question = "How did GOOG's total liabilities change?"
+
+    chunks = ask(question, conn, caches)
+    assert chunks == ["Total liabilities ", "rose ", "each year."]
+    assert client.calls == ["sql", "answer"]
+
+    again = ask(question, conn, caches)
+    assert again == ["".join(chunks).strip()]
+    assert client.calls == ["sql", "answer"]
+    assert sql_interface.answer_question_from_db(sql_interface.BALANCE_SHEET_SCHEMA, question, conn, caches["nl_to_sql"],
+                                                 caches["sql_results"], caches["answers"]) == "Total liabilities rose each year."
+
+# an answer stream that breaks part way caches nothing, so the next ask phrases the answer again
+def test_a_broken_stream_is_not_cached(conn, caches, monkeypatch):
+    class BrokenStream(FakeClient):
+        def create(self, *args, stream=False, **kwargs):
+            response = super().create(*args, stream=stream, **kwargs)
+            if not stream:
+                return response
+            def chunks():
+                yield next(response)
+                raise ConnectionError("stream reset")
+            return chunks()
+
+    monkeypatch.setattr(sql_interface, "get_client", lambda: BrokenStream(HISTORY_SQL))
+    with pytest.raises(ConnectionError):
+        ask("How did GOOG's total liabilities change?", conn, caches)
+
+    client = FakeClient(HISTORY_SQL)
+    monkeypatch.setattr(sql_interface, "get_client", lambda: client)
+    assert ask("How did GOOG's total liabilities change?", conn, caches) == ["Total liabilities ", "rose ", "each year."]
+    # the SQL was cached by the first attempt; only the phrasing runs again
+    assert client.calls == ["answer"]
@@ -0,0 +1,128 @@
+# tests/test_vector_store.py
+import os
+import sys
+import subprocess
+
+import numpy as np
+import pytest
+
+from src import ingest, vector_RAG
+from src.scripts.connect_or_create_document_db import DocumentStore
+from src.scripts.connect_or_create_vector_db import VectorStore
+from src.vector_RAG import HashingEmbedder, chunk_text
+
+TOPICS = ["cash and cash equivalents", "marketable securities", "accounts receivable", "property and equipment", "goodwill",
+          "operating lease liabilities", "long-term debt", "retained earnings", "deferred revenue", "income taxes payable"]
+
+def random_rows(rng, n: int, dim: int) -> np.ndarray:
+    rows = rng.standard_normal((n, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+# a small corpus of distinct passages, one document per topic
+def passages():
+    return {f"A-{i:02d}": [f"{topic} at year end {year} totaled {i * 10 + year % 7} million dollars" for year in range(2015, 2025)]
+            for i, topic in enumerate(TOPICS)}
+
+@pytest.fixture
+def store(tmp_path):
+    store = VectorStore(str(tmp_path / "vectors"), dim=HashingEmbedder().dim, embedder="hashing")
+    yield store
+    store.close()
+
+def test_matrix_grows_past_its_initial_capacity_and_reopens(tmp_path):
+    root = str(tmp_path / "vectors")
+    rng = np.random.default_rng(0)
+    first, second = random_rows(rng, 1000, 16), random_rows(rng, 500, 16)
+
+    store = VectorStore(root, dim=16)
+    store.add_document("A-1", "TEST", [(0, f"row {i}") for i in range(len(first))], first)
+    assert os.path.getsize(store.matrix_path) == 1024 * 16 * 4
+    store.add_document("A-2", "TEST", [(1, f"row {i}") for i in range(len(second))], second)
+    # doubled, and the rows written before the remap are still there
+    assert os.path.getsize(store.matrix_path) == 2048 * 16 * 4
+    assert os.path.getsize(store.assignments_path) == 2048 * 4
+    np.testing.assert_array_equal(store.vectors, np.concatenate([first, second]))
+    store.close()
+
+    reopened = VectorStore(root, dim=16)
+    try:
+        assert reopened.count == 1500
+        np.testing.assert_array_equal(reopened.vectors[1000:], second)
+        assert reopened.get_chunks([1000])[1000]["accession"] == "A-2"
+    finally:
+        reopened.close()
+
+    with pytest.raises(ValueError, match="clear it to switch embedders"):
+        VectorStore(root, dim=32)
+
+# an exact passage finds itself first, by brute force and through the cluster index
+def test_search_with_and_without_the_cluster_index(store):
+    embedder = HashingEmbedder()
+    corpus = passages()
+    for accession, texts in corpus.items():
+        store.add_document(accession, "TEST", [(None, text) for text in texts], embedder.embed(texts))
+    queries = [corpus["A-03"][4], corpus["A-07"][9], corpus["A-00"][0]]
+    expected = [3 * 10 + 4, 7 * 10 + 9, 0]
+
+    brute = store.search(embedder.embed(queries), k=3)
+    assert [hits[0][0] for hits in brute] == expected
+    assert all(hits[0][1] == pytest.approx(1.0, abs=1e-5) for hits in brute)
+
+    store.build_cluster_index(n_clusters=8)
+    clustered = store.search(embedder.embed(queries), k=3, n_probe=2)
+    assert [hits[0][0] for hits in clustered] == expected
+
+    # rows added after the build are assigned to a cluster and found the same way
+    late = ["goodwill impairment testing occurs annually in the fourth quarter"]
+    store.add_document("A-late", "TEST", [(None, late[0])], embedder.embed(late))
+    assert store.search(embedder.embed(late), k=1, n_probe=2)[0][0][0] == store.count - 1
+
+def test_index_filings_skips_documents_already_embedded(tmp_path, store):
+    doc_store = DocumentStore(str(tmp_path / "documents"))
+    embedded = []
+
+    class CountingEmbedder(HashingEmbedder):
+        def embed(self, texts):
+            embedded.extend(texts)
+            return super().embed(texts)
+
+    try:
+        for i, accession in enumerate(("0001-24-000001", "0001-24-000002")):
+            filing = {"ticker": "TEST", "cik": "1", "accession": accession, "filing_date": "2025-02-01", "report_date": "2024-12-31",
+                      "index_url": f"https://example.invalid/{accession}-index.htm"}
+            html = f"<html><body><p>{' '.join(TOPICS[i].split() * 150)}</p></body></html>"
+            ingest.store_downloaded_filing(filing, doc_store, f"https://example.invalid/{accession}.htm", html)
+
+        embedder = CountingEmbedder()
+        added = vector_RAG.index_filings(doc_store, store, embedder)
+        assert added == store.count > 2 and len(embedded) == added
+        assert store.has_document("0001-24-000001") and store.has_document("0001-24-000002")
+
+        # a second run embeds nothing, and a repeated add_document is a no-op
+        assert vector_RAG.index_filings(doc_store, store, embedder) == 0
+        assert len(embedded) == added
+        store.add_document("0001-24-000001", "TEST", [(None, "again")], embedder.embed(["again"]))
+        assert store.count == added
+    finally:
+        doc_store.close()
+
+def test_chunk_text_windows_overlap_and_cover_every_word():
+    words = [f"w{i}" for i in range(450)]
+    chunks = chunk_text(" ".join(words), max_words=200, overlap=40)
+    assert [chunk.split() for chunk in chunks] == [words[0:200], words[160:360], words[320:450]]
+    assert chunk_text("just a few words") == ["just a few words"]
+    assert chunk_text("") == [] and chunk_text("   \n ") == []
+
+# the same text embeds to the same bytes in another process with another hash seed, so stored vectors stay valid
+def test_hashing_embedder_is_deterministic():
+    texts = ["Total current assets 2024", "Goodwill and intangible assets, net", ""]
+    vectors = HashingEmbedder().embed(texts)
+    np.testing.assert_array_equal(vectors, HashingEmbedder().embed(texts))
+    assert vectors.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(vectors[:2], axis=1), 1.0, rtol=1e-6)
+    assert not vectors[2].any()
+
+    script = f"from src.vector_RAG import HashingEmbedder; import sys; sys.stdout.buffer.write(HashingEmbedder().embed({texts!r}).tobytes())"
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    other = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, check=True, env={**os.environ, "PYTHONHASHSEED": "12345"})
+    assert other.stdout == vectors.tobytes()
@@ -0,0 +1,135 @@
+# tests/test_xbrl_facts.py
+import io
+import zipfile
+
+import orjson
+import pandas as pd
+import pytest
+
+from src import ingest
+from src.scripts.connect_or_create_sql_db import connect_or_create_sql_db
+from src.sql_interface import bulk_insert_balance_sheets
+from src.utils import xbrl_facts
+
+CIKS = {"0000000001": "AAA", "0000000002": "BBB"}
+
+def fact(end: str, val: float, accn: str, filed: str, form: str = "10-K", **extra) -> dict:
+    return {"end": end, "val": val, "accn": accn, "filed": filed, "form": form, **extra}
+
+# two 10-Ks of one company, each repeating the prior year's balances, and a later filing restating 2023's total assets
+AAA_FACTS = {"facts": {"us-gaap": {
+    "Assets": {"units": {"USD": [
+        fact("2022-12-31", 90e6, "a-23", "2023-02-01"),
+        fact("2023-12-31", 100e6, "a-23", "2023-02-01"),
+        fact("2023-12-31", 100e6, "a-24", "2024-02-01"),
+        fact("2023-12-31", 101e6, "a-23r", "2023-06-01"),
+        fact("2024-12-31", 120e6, "a-24", "2024-02-01"),
+        fact("2024-06-30", 110e6, "q-24", "2024-08-01", form="10-Q"),
+    ]}},
+    "LiabilitiesCurrent": {"units": {"USD": [
+        fact("2023-12-31", 40e6, "a-23", "2023-02-01"),
+        fact("2024-12-31", 45e6, "a-24", "2024-02-01"),
+    ]}},
+    # income statement flows have a start date, and unmapped concepts are ignored
+    "Revenues": {"units": {"USD": [fact("2024-12-31", 500e6, "a-24", "2024-02-01", start="2024-01-01")]}},
+    "SomethingElse": {"units": {"USD": [fact("2024-12-31", 1e6, "a-24", "2024-02-01")]}},
+}}}
+
+# a company whose filings carry no balance sheet concepts
+BBB_FACTS = {"facts": {"dei": {"EntityCommonStockSharesOutstanding": {"units": {"shares": [fact("2024-12-31", 1, "b-24", "2024-02-01")]}}}}}
+
+class FakeCache:
+    def __init__(self, ticker_index=None, companyfacts=None):
+        self.ticker_index = ticker_index or {}
+        self.companyfacts = companyfacts or {}
+
+    def cached_ticker_index(self):
+        return self.ticker_index
+
+    def lookup_cik(self, ticker):
+        return self.ticker_index.get(ticker)
+
+    def get_companyfacts(self, cik):
+        if cik not in self.companyfacts:
+            raise ConnectionError("companyfacts unavailable")
+        return self.companyfacts[cik]
+
+# a bulk zip with AAA, BBB, one member that isn't valid json and one file that isn't a company
+@pytest.fixture
+def companyfacts_zip(tmp_path):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("CIK0000000001.json", orjson.dumps(AAA_FACTS))
+        archive.writestr("CIK0000000002.json", orjson.dumps(BBB_FACTS))
+        archive.writestr("CIK0000000003.json", b"{not json")
+        archive.writestr("README.txt", b"bulk companyfacts")
+    path = tmp_path / "companyfacts.zip"
+    path.write_bytes(buffer.getvalue())
+    return str(path)
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect_or_create_sql_db(str(tmp_path / "financials.db"))
+    yield conn
+    conn.close()
+
+def stored(conn) -> list:
+    return conn.execute("SELECT company, as_of_date, label, value FROM balance_sheet ORDER BY company, as_of_date, label").fetchall()
+
+def test_concepts_map_to_the_pdf_labels_at_each_10k_period_end():
+    df = xbrl_facts.companyfacts_to_balance_sheet(AAA_FACTS, "AAA")
+    assert list(df.columns) == ["as_of_date", "company", "statement_type", "section", "label", "year", "value"]
+    # the prior-year columns and the 10-Q are dropped, and the restated 2023 value wins over the original
+    assert list(df[["as_of_date", "section", "label", "year", "value"]].itertuples(index=False, name=None)) == [
+        ("2023-12-31", "Current liabilities", "Total current liabilities", 2023, 40.0),
+        ("2023-12-31", "Non-current assets", "Total assets", 2023, 101.0),
+        ("2024-12-31", "Current liabilities", "Total current liabilities", 2024, 45.0),
+        ("2024-12-31", "Non-current assets", "Total assets", 2024, 120.0),
+    ]
+    assert set(df["company"]) == {"AAA"} and set(df["statement_type"]) == {"balance_sheet"}
+
+def test_min_year_drops_older_periods():
+    df = xbrl_facts.companyfacts_to_balance_sheet(AAA_FACTS, "AAA", min_year=2024)
+    assert set(df["as_of_date"]) == {"2024-12-31"} and len(df) == 2
+    assert xbrl_facts.companyfacts_to_balance_sheet(AAA_FACTS, "AAA", min_year=2025).empty
+    assert xbrl_facts.companyfacts_to_balance_sheet(BBB_FACTS, "BBB").empty
+
+# a broken member is reported in place instead of ending the stream
+def test_zip_frames_stream_one_company_at_a_time(companyfacts_zip):
+    members = xbrl_facts.list_companyfacts_members(companyfacts_zip)
+    assert members == ["CIK0000000001.json", "CIK0000000002.json", "CIK0000000003.json"]
+    frames = xbrl_facts.iter_companyfacts_frames(companyfacts_zip, members, CIKS)
+    cik, df = next(frames)
+    assert cik == "0000000001" and set(df["company"]) == {"AAA"}
+    assert [(cik, None if df is None else len(df)) for cik, df in frames] == [("0000000002", 0), ("0000000003", None)]
+    assert xbrl_facts.list_companyfacts_members(companyfacts_zip, ["0000000002"]) == ["CIK0000000002.json"]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_path_summary_counts(companyfacts_zip, conn, workers):
+    summary = ingest.ingest_companyfacts_path(companyfacts_zip, conn, workers=workers, batch_size=1, cache=FakeCache({"AAA": "0000000001", "BBB": "0000000002"}))
+    assert summary == {"companies": 2, "empty": 1, "failed": 1, "rows_inserted": 4, "duplicates_skipped": 0}
+    assert [row[:3] for row in stored(conn)] == [
+        ("AAA", "2023-12-31", "Total assets"), ("AAA", "2023-12-31", "Total current liabilities"),
+        ("AAA", "2024-12-31", "Total assets"), ("AAA", "2024-12-31", "Total current liabilities"),
+    ]
+
+    again = ingest.ingest_companyfacts_path(companyfacts_zip, conn, workers=workers, batch_size=1, cache=FakeCache({"AAA": "0000000001"}))
+    assert (again["companies"], again["rows_inserted"]) == (2, 0)
+
+# a line item the pdf path already stored keeps its value, and the rest of the company's facts still load
+def test_facts_already_in_the_database_are_skipped(companyfacts_zip, conn):
+    from_pdf = pd.DataFrame([{"as_of_date": "2024-12-31", "company": "AAA", "statement_type": "balance_sheet", "section": "Total assets",
+                              "label": "Total assets", "year": 2024, "value": 119.5}])
+    bulk_insert_balance_sheets([from_pdf], conn)
+
+    summary = ingest.ingest_companyfacts_path(companyfacts_zip, conn, tickers=["AAA"], cache=FakeCache({"AAA": "0000000001"}))
+    assert (summary["companies"], summary["failed"], summary["rows_inserted"]) == (1, 0, 3)
+    assert ("AAA", "2024-12-31", "Total assets", 119.5) in stored(conn)
+    assert len(stored(conn)) == 4
+    # the key lookup's temp table leaves no transaction behind
+    assert not conn.in_transaction
+
+def test_ingest_companyfacts_counts_each_failed_ticker(conn):
+    cache = FakeCache({"AAA": "0000000001", "BBB": "0000000002"}, {"0000000001": AAA_FACTS})
+    summary = ingest.ingest_companyfacts(["aaa", "BBB", "ZZZ", "AAA"], conn, cache=cache, batch_size=1)
+    assert summary == {"companies": 1, "empty": 0, "failed": 2, "rows_inserted": 4, "duplicates_skipped": 0}